@@ -1,5 +1,7 @@
+import hashlib
 import os
-from flask import Flask, render_template, request
+import re
+from flask import Flask, make_response, render_template, request
 from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_compress import Compress
@@ -10,13 +12,37 @@ from routes.today import today_bp
 from routes.progress import progress_bp
 from dotenv import load_dotenv
 from flask_jwt_extended import JWTManager
+from utils.jobs import job_runner
+from utils.revocation import is_revoked
+from utils.cache import get_cache
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import timedelta
 
 load_dotenv()
 
+# Precached by the service worker (templates/sw.js)
+SHELL_PAGES = [
+    '/', '/login', '/signup', '/dashboard', '/workout-session', '/exercise',
+    '/splits', '/progress', '/muscle-selection', '/exercise-list',
+]
+SHELL_ASSETS = ['https://cdn.tailwindcss.com', 'https://unpkg.com/alpinejs@3.13.3/dist/cdn.min.js']
+
+# Flask-Compress appends the encoding to the ETag of compressed responses ("abc:gzip")
+ENCODED_ETAG = re.compile(r':(?:gzip|br|deflate|zstd)"')
+
+
+def _templates_version(app):
+    """Changes whenever a template does, so each deploy gets fresh service worker caches"""
+    digest = hashlib.md5()
+    for name in sorted(app.jinja_loader.list_templates()):
+        digest.update(name.encode())
+        digest.update(app.jinja_loader.get_source(app.jinja_env, name)[0].encode())
+    return digest.hexdigest()[:12]
+
 
 def create_app():
     app = Flask(__name__)
+    login_attempts = int(os.getenv('LOGIN_ATTEMPTS_PER_MINUTE', 10))
     app.config.from_mapping({
         'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL'),
         'SQLALCHEMY_TRACK_MODIFICATIONS': False,
@@ -27,17 +53,41 @@ def create_app():
         },
         'SECRET_KEY': os.getenv('SECRET_KEY') or 'dev',
         'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY') or 'jwt-dev',
-        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(days=7),  # Token expires in 7 days
+        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(minutes=15),  # Renewed through /api/auth/refresh
+        'JWT_REFRESH_TOKEN_EXPIRES': timedelta(days=30),
+        'REVOCATION_SYNC_SECONDS': int(os.getenv('REVOCATION_SYNC_SECONDS', 30)),  # see utils/revocation.py
         'COMPRESS_MIMETYPES': ['text/html', 'text/css', 'text/xml', 'application/json', 'application/javascript'],
         'COMPRESS_LEVEL': 6,
-        'COMPRESS_MIN_SIZE': 500
+        'COMPRESS_MIN_SIZE': 500,
+        'COMPRESS_STREAMS': False,  # Streamed responses compress themselves
+        'REPLICA_STALENESS_WINDOW': int(os.getenv('REPLICA_STALENESS_WINDOW', 10)),  # seconds
+        'ARCHIVE_AFTER_MONTHS': int(os.getenv('ARCHIVE_AFTER_MONTHS', 12)),  # see utils/archive.py
+        'SNAPSHOT_DIR': os.getenv('SNAPSHOT_DIR'),  # see utils/snapshots.py, unset disables snapshots
+        'PASSWORD_HASH_METHOD': os.getenv('PASSWORD_HASH_METHOD', 'scrypt'),  # see utils/passwords.py
+        'PASSWORD_VERIFY_WORKERS': int(os.getenv('PASSWORD_VERIFY_WORKERS', 2)),
+        'RATE_LIMITS': {  # (burst, per second), see utils/ratelimit.py
+            'login': (login_attempts, login_attempts / 60),  # per email
+            'reads': (int(os.getenv('READ_RATE_BURST', 30)), float(os.getenv('READ_RATE_PER_SECOND', 5))),  # per user
+        },
+        'RATE_LIMIT_STORE': os.getenv('RATE_LIMIT_STORE'),  # shared bucket store class, default in-process
+        'CACHE_SHARED_TIER': os.getenv('CACHE_SHARED_TIER'),  # see utils/cache.py, default in-process only
+        'CACHE_MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 1024)),
+        'CACHE_DEFAULT_TTL': int(os.getenv('CACHE_DEFAULT_TTL', 60)),  # seconds
+        'LIVE_EVENTS_BACKEND': os.getenv('LIVE_EVENTS_BACKEND'),  # 'memory' or 'postgres', default by database, see utils/live.py
+        'LIVE_STREAMS_PER_USER': int(os.getenv('LIVE_STREAMS_PER_USER', 2)),  # open SSE streams, per process
+        'LIVE_STREAMS_MAX': int(os.getenv('LIVE_STREAMS_MAX', 8)),  # keep below the Procfile's --threads 16
     })
+    if os.getenv('DATABASE_REPLICA_URL'):
+        # Read-only analytics endpoints are routed here, see utils/replica.py
+        app.config['SQLALCHEMY_BINDS'] = {'replica': os.getenv('DATABASE_REPLICA_URL')}
 
     db.init_app(app)
     Migrate(app, db)
-    JWTManager(app)
+    jwt = JWTManager(app)
+    jwt.token_in_blocklist_loader(is_revoked)
     CORS(app)
     Compress(app)  # Enable Gzip compression
+    job_runner.init_app(app)  # In-process background jobs
 
     # Add caching headers for better Vercel performance
     @app.after_request
@@ -46,10 +96,25 @@ def create_app():
         if request.path.startswith('/static'):
             response.cache_control.max_age = 31536000
             response.cache_control.public = True
+        # The service worker script is checked for updates on every navigation
+        elif request.path == '/sw.js':
+            response.cache_control.no_cache = True
         # Cache HTML pages for 5 minutes
         elif request.method == 'GET' and not request.path.startswith('/api'):
             response.cache_control.max_age = 300
             response.cache_control.public = True
+
+        # ETags let the browser and the service worker revalidate with a bodiless 304
+        if request.method == 'GET' and response.status_code == 200 and not response.is_streamed:
+            if request.path.startswith('/api'):
+                # Per-user data: only the browser may keep it, and must revalidate before reuse
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            response.add_etag()
+            environ = request.environ
+            if 'HTTP_IF_NONE_MATCH' in environ:
+                environ = {**environ, 'HTTP_IF_NONE_MATCH': ENCODED_ETAG.sub('"', environ['HTTP_IF_NONE_MATCH'])}
+            response.make_conditional(environ)
         return response
 
     # register blueprints
@@ -61,9 +126,22 @@ def create_app():
     from routes.exercises import exercises_bp
     app.register_blueprint(exercises_bp)
 
+    from routes.imports import import_bp
+    app.register_blueprint(import_bp)
+    from routes.bootstrap import bootstrap_bp
+    app.register_blueprint(bootstrap_bp)
+    from routes.sync import sync_bp
+    app.register_blueprint(sync_bp)
+
+    # A versioned row (UserSplitAssignment) was changed by a concurrent request
+    @app.errorhandler(StaleDataError)
+    def stale_data(error):
+        db.session.rollback()
+        return {'message': 'Your workout plan was updated by another request. Please retry.'}, 409
+
     @app.route('/health', methods=['GET'])
     def health():
-        return {'status': 'ok'}
+        return {'status': 'ok', 'cache': get_cache().metrics()}
 
     # Frontend routes
     @app.route('/')
@@ -106,6 +184,16 @@ def create_app():
     def exercise_list():
         return render_template('exercise_list.html')
 
+    shell_version = _templates_version(app)
+
+    @app.route('/sw.js')
+    def service_worker():
+        response = make_response(render_template(
+            'sw.js', version=shell_version, shells=SHELL_PAGES, assets=SHELL_ASSETS
+        ))
+        response.mimetype = 'application/javascript'
+        return response
+
     return app
 
 
@@ -0,0 +1,43 @@
+"""
+Move old workout history into the per-user yearly archive
+python archive_history.py              # archive sessions that ended more than ARCHIVE_AFTER_MONTHS ago
+python archive_history.py --enqueue    # queue one archive_history job per user for the workers instead
+python archive_history.py --restore    # move every archived set back into workout_sets
+"""
+import argparse
+
+from app import create_app
+from models import db, User
+from utils.archive import archive_history, archive_user, restore_user
+
+app = create_app()
+
+
+def run(enqueue=False, restore=False):
+    with app.app_context():
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        total = 0
+        for user_id in user_ids:
+            if enqueue:
+                archive_history.enqueue(user_id=user_id)
+            elif restore:
+                total += restore_user(user_id)
+            else:
+                total += archive_user(user_id)
+            db.session.commit()
+
+        if enqueue:
+            print(f"✅ Queued archiving for {len(user_ids)} users")
+        else:
+            print(f"✅ {'Restored' if restore else 'Archived'} {total} sets for {len(user_ids)} users")
+        return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archive old workout history')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--enqueue', action='store_true', help='queue jobs instead of archiving inline')
+    group.add_argument('--restore', action='store_true', help='move archived sets back into workout_sets')
+    args = parser.parse_args()
+
+    run(enqueue=args.enqueue, restore=args.restore)
@@ -0,0 +1,124 @@
+"""
+Benchmark the vectorized analytics module against a SQL + Python loop version
+Builds a synthetic history in a throwaway SQLite database:
+python bench_analytics.py [--sets 100000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+from app import create_app
+from models import db, User, Exercise, Split, SplitDay, UserSplitAssignment, WorkoutSession, WorkoutSet
+from utils.analytics import load_history, compute_analytics
+from utils.records import estimate_1rm
+
+app = create_app()
+
+
+def seed(n_sets):
+    db.create_all()
+    user = User(email='bench@example.com', password_hash='x', name='Bench', mobile='0')
+    db.session.add(user)
+    exercises = [
+        Exercise(name=f'Exercise {i}', muscle_group=group, specific_muscle=group)
+        for i, group in enumerate(['chest', 'back', 'legs', 'shoulders', 'biceps', 'triceps'] * 4)
+    ]
+    db.session.add_all(exercises)
+    split = Split(owner=user, name='Bench', day_count=1)
+    split.days = [SplitDay(position=0, name='Day')]
+    db.session.add(split)
+    db.session.flush()
+    assignment = UserSplitAssignment(user_id=user.id, split_id=split.id)
+    db.session.add(assignment)
+    db.session.flush()
+
+    start = datetime.utcnow() - timedelta(days=n_sets // 20)
+    sessions = []
+    for i in range(n_sets // 20):
+        started = start + timedelta(days=i)
+        sessions.append({'user_id': user.id, 'assignment_id': assignment.id, 'split_day_id': split.days[0].id,
+                         'started_at': started, 'ended_at': started + timedelta(hours=1), 'completed': True})
+    session_ids = db.session.execute(
+        db.insert(WorkoutSession).returning(WorkoutSession.id, sort_by_parameter_order=True), sessions
+    ).scalars().all()
+
+    sets = []
+    for i in range(n_sets):
+        exercise = random.choice(exercises)
+        sets.append({'session_id': session_ids[i // 20], 'user_id': user.id,
+                     'exercise_id': exercise.id, 'exercise_name': exercise.name,
+                     'set_number': i % 20 + 1, 'reps': random.randint(1, 15), 'weight': random.randint(10, 200),
+                     'timestamp': sessions[i // 20]['started_at'] + timedelta(minutes=i % 20)})
+    db.session.execute(db.insert(WorkoutSet), sets)
+    db.session.commit()
+    return user.id
+
+
+def loop_analytics(user_id, days=180):
+    """The same metrics computed with per-chart SQL aggregates and Python loops"""
+    today = date.today()
+    start = today - timedelta(days=days - 1)
+
+    daily = dict(
+        db.session.query(db.func.date(WorkoutSet.timestamp), db.func.sum(WorkoutSet.reps * WorkoutSet.weight))
+        .join(WorkoutSession).filter(WorkoutSession.user_id == user_id, WorkoutSession.completed == True)
+        .group_by(db.func.date(WorkoutSet.timestamp)).all()
+    )
+    rolling = []
+    for offset in range(days):
+        d = start + timedelta(days=offset)
+        acute = sum(daily.get(str(d - timedelta(days=k)), 0) for k in range(7))
+        chronic = sum(daily.get(str(d - timedelta(days=k)), 0) for k in range(28))
+        rolling.append((d, acute, chronic, (acute / 7) / (chronic / 28) if chronic else 0))
+
+    curves = {}
+    rows = (
+        db.session.query(WorkoutSet.exercise_name, WorkoutSet.timestamp, WorkoutSet.reps, WorkoutSet.weight)
+        .join(WorkoutSession).filter(WorkoutSession.user_id == user_id, WorkoutSession.completed == True).all()
+    )
+    for name, timestamp, reps, weight in rows:
+        key = (name, timestamp.date())
+        curves[key] = max(curves.get(key, 0), estimate_1rm(weight, reps))
+
+    weekly = {}
+    for _, timestamp, group in (
+        db.session.query(WorkoutSet.id, WorkoutSet.timestamp, Exercise.muscle_group)
+        .join(WorkoutSession).join(Exercise, Exercise.id == WorkoutSet.exercise_id)
+        .filter(WorkoutSession.user_id == user_id, WorkoutSession.completed == True).all()
+    ):
+        week = timestamp.date() - timedelta(days=timestamp.weekday())
+        if week >= start - timedelta(days=start.weekday()):
+            weekly[(week, group)] = weekly.get((week, group), 0) + 1
+    return rolling, curves, weekly
+
+
+def timed(label, func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best * 1000:8.1f} ms")
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark progress analytics')
+    parser.add_argument('--sets', type=int, default=100000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f"🌱 Seeding {args.sets} sets...")
+        user_id = seed(args.sets)
+        history = load_history(user_id)
+
+        loop = timed('SQL + Python loops', lambda: loop_analytics(user_id))
+        vectorized = timed('NumPy (load + compute)', lambda: compute_analytics(load_history(user_id)))
+        timed('NumPy (compute only)', lambda: compute_analytics(history))
+        print(f"⚡ {loop / vectorized:.1f}x faster end to end")
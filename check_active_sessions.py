@@ -0,0 +1,68 @@
+"""
+Check that every assignment's active_session_id points at the user's unfinished session
+python check_active_sessions.py          # report drift
+python check_active_sessions.py --fix    # repoint assignments at the latest unfinished session
+"""
+import argparse
+
+from app import create_app
+from models import db, UserSplitAssignment, WorkoutSession
+
+app = create_app()
+
+
+def find_drift():
+    """(assignment_id, user_id, active_session_id, expected_session_id) for every mismatch"""
+    expected = dict(
+        db.session.query(WorkoutSession.user_id, db.func.max(WorkoutSession.id))
+        .filter(WorkoutSession.completed == False)
+        .group_by(WorkoutSession.user_id)
+    )
+    assignments = db.session.query(
+        UserSplitAssignment.id, UserSplitAssignment.user_id, UserSplitAssignment.active_session_id
+    )
+    return [
+        (assignment_id, user_id, active_session_id, expected.get(user_id))
+        for assignment_id, user_id, active_session_id in assignments
+        if active_session_id != expected.get(user_id)
+    ]
+
+
+def count_duplicates():
+    """Users with more than one unfinished session; only the latest one is reachable"""
+    return db.session.query(WorkoutSession.user_id).filter(
+        WorkoutSession.completed == False
+    ).group_by(WorkoutSession.user_id).having(db.func.count(WorkoutSession.id) > 1).count()
+
+
+def check(fix=False):
+    with app.app_context():
+        drift = find_drift()
+        for assignment_id, user_id, active_session_id, expected_id in drift:
+            print(f"⚠️  user {user_id}: active_session_id={active_session_id}, expected {expected_id}")
+            if fix:
+                db.session.execute(
+                    db.update(UserSplitAssignment)
+                    .where(UserSplitAssignment.id == assignment_id)
+                    .values(active_session_id=expected_id, version=UserSplitAssignment.version + 1)
+                )
+
+        duplicates = count_duplicates()
+        if duplicates:
+            print(f"⚠️  {duplicates} users have more than one unfinished session")
+
+        if fix:
+            db.session.commit()
+            print(f"✅ Repaired {len(drift)} assignments")
+        else:
+            print(f"{'✅' if not drift else '❌'} {len(drift)} assignments out of sync")
+        return len(drift)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check active session pointers')
+    parser.add_argument('--fix', action='store_true', help='repair drifted pointers')
+    args = parser.parse_args()
+
+    drifted = check(fix=args.fix)
+    raise SystemExit(1 if drifted and not args.fix else 0)
@@ -0,0 +1,58 @@
+"""
+Import workout history for a user from a CSV, NDJSON or JSON file
+Usage: python import_history.py user@example.com history.csv
+"""
+import argparse
+import sys
+import time
+
+from app import create_app
+from models import db, User
+from utils.importer import HistoryImporter, HistoryImportError, detect_format, iter_records
+
+app = create_app()
+
+
+def print_progress(stage, done, total):
+    if total:
+        print(f"\r{stage}: {done}/{total}", end='', flush=True)
+    else:
+        print(f"\r{stage}: {done}", end='', flush=True)
+
+
+def import_history(email, path, file_format=None):
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            print(f"❌ No user with email {email}")
+            return 1
+
+        started = time.perf_counter()
+        importer = HistoryImporter(user.id, on_progress=print_progress)
+        try:
+            with open(path, 'rb') as f:
+                summary = importer.run(iter_records(f, detect_format(path, None, file_format)))
+            db.session.commit()
+        except HistoryImportError as e:
+            db.session.rollback()
+            print(f"\n❌ {e}")
+            return 1
+
+        elapsed = time.perf_counter() - started
+        print(f"\n✅ Imported {summary['sets']} sets in {summary['sessions']} sessions ({elapsed:.1f}s)")
+        if summary['skipped']:
+            print(f"⚠️  Skipped {summary['skipped']} invalid rows")
+            for error in summary['errors']:
+                print(f"   row {error['row']}: {error['error']}")
+        if summary['unmatched_exercises']:
+            print(f"⚠️  Not in catalog (kept by name): {', '.join(summary['unmatched_exercises'])}")
+        return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import workout history')
+    parser.add_argument('email')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'json'])
+    args = parser.parse_args()
+    sys.exit(import_history(args.email, args.path, args.format))
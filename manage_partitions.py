@@ -0,0 +1,38 @@
+"""
+Create the monthly partitions of workout_sets (Postgres only): upcoming months
+for new sets, and past months for imported history
+Run daily, e.g. from a scheduler: python manage_partitions.py [--months-ahead 3] [--months-back 240]
+"""
+import argparse
+
+from app import create_app
+from models import db
+from utils.importer import IMPORT_MAX_AGE_YEARS
+from utils.partitions import PARTITION_MONTHS_AHEAD, ensure_partitions, is_partitioned
+
+app = create_app()
+
+
+def create_partitions(months_ahead=PARTITION_MONTHS_AHEAD, months_back=IMPORT_MAX_AGE_YEARS * 12):
+    with app.app_context():
+        connection = db.session.connection()
+        if not is_partitioned(connection):
+            print("ℹ️  workout_sets is not partitioned on this database, nothing to do")
+            return []
+        created = ensure_partitions(connection, months_ahead=months_ahead, months_back=months_back)
+        db.session.commit()
+        for name in created:
+            print(f"➕ {name}")
+        print(f"✅ {len(created)} partitions created")
+        return created
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create workout_sets partitions')
+    parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD,
+                        help='months after the current one to create')
+    parser.add_argument('--months-back', type=int, default=IMPORT_MAX_AGE_YEARS * 12,
+                        help='months before the current one to create, for imported history')
+    args = parser.parse_args()
+
+    create_partitions(args.months_ahead, args.months_back)
@@ -0,0 +1,90 @@
+"""add aggregate columns to workout_sessions
+
+Revision ID: 0b7e4d2a9c58
+Revises: f3a9c5e7d201
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e4d2a9c58'
+down_revision = 'f3a9c5e7d201'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_sets', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('total_volume', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('exercise_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('duration_seconds', sa.Integer(), nullable=True))
+
+    sessions = sa.table('workout_sessions',
+        sa.column('id', sa.Integer), sa.column('started_at', sa.DateTime), sa.column('ended_at', sa.DateTime),
+        sa.column('total_sets', sa.Integer), sa.column('total_volume', sa.Float),
+        sa.column('exercise_count', sa.Integer), sa.column('duration_seconds', sa.Integer))
+    workout_sets = sa.table('workout_sets',
+        sa.column('session_id', sa.Integer), sa.column('exercise_id', sa.Integer),
+        sa.column('exercise_name', sa.String), sa.column('reps', sa.Integer), sa.column('weight', sa.Float))
+
+    # Sets are grouped by exercise_id, falling back to the name for legacy sets
+    exercise_key = sa.func.coalesce(sa.cast(workout_sets.c.exercise_id, sa.String), workout_sets.c.exercise_name)
+
+    # Backfill sessions in id order, one aggregate query and one executemany per batch
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(sessions.c.id, sessions.c.started_at, sessions.c.ended_at)
+            .where(sessions.c.id > last_id)
+            .order_by(sessions.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        totals = {
+            session_id: (total_sets, total_volume, exercise_count)
+            for session_id, total_sets, total_volume, exercise_count in bind.execute(
+                sa.select(
+                    workout_sets.c.session_id,
+                    sa.func.count(),
+                    sa.func.coalesce(sa.func.sum(workout_sets.c.reps * workout_sets.c.weight), 0),
+                    sa.func.count(sa.distinct(exercise_key))
+                )
+                .where(workout_sets.c.session_id.between(rows[0][0], rows[-1][0]))
+                .group_by(workout_sets.c.session_id)
+            )
+        }
+        bind.execute(
+            sessions.update()
+            .where(sessions.c.id == sa.bindparam('session_id'))
+            .values(total_sets=sa.bindparam('s_total_sets'), total_volume=sa.bindparam('s_total_volume'),
+                    exercise_count=sa.bindparam('s_exercise_count'),
+                    duration_seconds=sa.bindparam('s_duration_seconds')),
+            [
+                {
+                    'session_id': session_id,
+                    's_total_sets': totals.get(session_id, (0, 0, 0))[0],
+                    's_total_volume': totals.get(session_id, (0, 0, 0))[1],
+                    's_exercise_count': totals.get(session_id, (0, 0, 0))[2],
+                    's_duration_seconds': int((ended_at - started_at).total_seconds())
+                    if started_at and ended_at else None
+                }
+                for session_id, started_at, ended_at in rows
+            ]
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.drop_column('duration_seconds')
+        batch_op.drop_column('exercise_count')
+        batch_op.drop_column('total_volume')
+        batch_op.drop_column('total_sets')
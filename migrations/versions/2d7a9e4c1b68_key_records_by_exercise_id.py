@@ -0,0 +1,109 @@
+"""key personal_records and rep_records by exercise id
+
+Revision ID: 2d7a9e4c1b68
+Revises: 8f2c6d1e4a37
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7a9e4c1b68'
+down_revision = '8f2c6d1e4a37'
+branch_labels = None
+depends_on = None
+
+NO_EXERCISE_ID = sa.text('exercise_id IS NULL')
+
+jobs = sa.table('jobs',
+    sa.column('name', sa.String), sa.column('payload', sa.JSON), sa.column('status', sa.String),
+    sa.column('attempts', sa.Integer), sa.column('max_attempts', sa.Integer),
+    sa.column('run_at', sa.DateTime), sa.column('created_at', sa.DateTime))
+
+
+def _enqueue_rebuilds():
+    """Queue a rebuild_personal_records job for every user with records.
+
+    The records stay readable meanwhile; the jobs recompute them from
+    finished workouts only (the old ones also counted unfinished and
+    cancelled sessions).
+    """
+    bind = op.get_bind()
+    user_ids = [user_id for (user_id,) in bind.execute(sa.text('SELECT DISTINCT user_id FROM personal_records'))]
+    now = datetime.utcnow()
+    if user_ids:
+        op.bulk_insert(jobs, [
+            {'name': 'rebuild_personal_records', 'payload': {'user_id': user_id}, 'status': 'pending',
+             'attempts': 0, 'max_attempts': 5, 'run_at': now, 'created_at': now}
+            for user_id in user_ids
+        ])
+
+
+def upgrade():
+    # rep_records learn their exercise id from the personal record of the same name
+    op.add_column('rep_records', sa.Column('exercise_id', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE rep_records SET exercise_id = (
+            SELECT personal_records.exercise_id FROM personal_records
+            WHERE personal_records.user_id = rep_records.user_id
+              AND personal_records.exercise_name = rep_records.exercise_name
+        )
+    """)
+    # An exercise renamed since it was logged has a row per name; keep one, the rebuild fixes its values
+    op.execute("""
+        DELETE FROM personal_records WHERE exercise_id IS NOT NULL AND id NOT IN (
+            SELECT MAX(id) FROM personal_records WHERE exercise_id IS NOT NULL GROUP BY user_id, exercise_id
+        )
+    """)
+    op.execute("""
+        DELETE FROM rep_records WHERE exercise_id IS NOT NULL AND id NOT IN (
+            SELECT MAX(id) FROM rep_records WHERE exercise_id IS NOT NULL GROUP BY user_id, exercise_id, weight
+        )
+    """)
+
+    with op.batch_alter_table('personal_records', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_personal_records_user_exercise', type_='unique')
+        batch_op.create_unique_constraint('uq_personal_records_user_exercise', ['user_id', 'exercise_id'])
+    op.create_index('uq_personal_records_user_exercise_name', 'personal_records', ['user_id', 'exercise_name'],
+                    unique=True, postgresql_where=NO_EXERCISE_ID, sqlite_where=NO_EXERCISE_ID)
+
+    with op.batch_alter_table('rep_records', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_rep_records_exercise_id', 'exercises', ['exercise_id'], ['id'])
+        batch_op.drop_constraint('uq_rep_records_user_exercise_weight', type_='unique')
+        batch_op.create_unique_constraint('uq_rep_records_user_exercise_weight', ['user_id', 'exercise_id', 'weight'])
+    op.create_index('uq_rep_records_user_exercise_name_weight', 'rep_records', ['user_id', 'exercise_name', 'weight'],
+                    unique=True, postgresql_where=NO_EXERCISE_ID, sqlite_where=NO_EXERCISE_ID)
+
+    _enqueue_rebuilds()
+
+
+def downgrade():
+    # Different exercises may share a name; keep one row per name until the rebuild
+    op.execute("""
+        DELETE FROM personal_records WHERE id NOT IN (
+            SELECT MAX(id) FROM personal_records GROUP BY user_id, exercise_name
+        )
+    """)
+    op.execute("""
+        DELETE FROM rep_records WHERE id NOT IN (
+            SELECT MAX(id) FROM rep_records GROUP BY user_id, exercise_name, weight
+        )
+    """)
+
+    op.drop_index('uq_rep_records_user_exercise_name_weight', table_name='rep_records')
+    with op.batch_alter_table('rep_records', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_rep_records_user_exercise_weight', type_='unique')
+        batch_op.create_unique_constraint('uq_rep_records_user_exercise_weight', ['user_id', 'exercise_name', 'weight'])
+        batch_op.drop_constraint('fk_rep_records_exercise_id', type_='foreignkey')
+        batch_op.drop_column('exercise_id')
+
+    op.drop_index('uq_personal_records_user_exercise_name', table_name='personal_records')
+    with op.batch_alter_table('personal_records', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_personal_records_user_exercise', type_='unique')
+        batch_op.create_unique_constraint('uq_personal_records_user_exercise', ['user_id', 'exercise_name'])
+
+    _enqueue_rebuilds()
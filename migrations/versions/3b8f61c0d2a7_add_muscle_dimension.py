@@ -0,0 +1,122 @@
+"""add muscle dimension and denormalized workout_sets columns
+
+Revision ID: 3b8f61c0d2a7
+Revises: e41c7a2d9b5f
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8f61c0d2a7'
+down_revision = 'e41c7a2d9b5f'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+# (muscle_group, specific_muscle, position) as of this revision; a frozen copy
+# of utils.muscles.MUSCLE_POSITIONS so later catalog changes don't alter it
+MUSCLES = [
+    ('chest', 'upper_chest', 0),
+    ('chest', 'middle_chest', 1),
+    ('chest', 'lower_chest', 2),
+    ('back', 'lats', 3),
+    ('back', 'upper_back', 4),
+    ('back', 'lower_back', 5),
+    ('back', 'traps', 6),
+    ('back', 'rhomboids', 7),
+    ('shoulders', 'front_delt', 8),
+    ('shoulders', 'side_delt', 9),
+    ('shoulders', 'rear_delt', 10),
+    ('biceps', 'short_head', 11),
+    ('biceps', 'long_head', 12),
+    ('biceps', 'brachialis', 13),
+    ('triceps', 'long_head', 14),
+    ('triceps', 'lateral_head', 15),
+    ('triceps', 'medial_head', 16),
+    ('forearms', 'forearms', 17),
+    ('legs', 'quads', 18),
+    ('legs', 'hamstrings', 19),
+    ('legs', 'glutes', 20),
+    ('legs', 'calves', 21),
+    ('core', 'abs', 22),
+    ('core', 'obliques', 23),
+]
+
+
+def upgrade():
+    muscles = op.create_table('muscles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('muscle_group', sa.String(length=50), nullable=False),
+    sa.Column('specific_muscle', sa.String(length=50), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('muscle_group', 'specific_muscle', name='uq_muscles_group_specific')
+    )
+    op.bulk_insert(muscles, [
+        {'muscle_group': group, 'specific_muscle': specific, 'position': position}
+        for group, specific, position in MUSCLES
+    ])
+
+    with op.batch_alter_table('workout_sets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('muscle_group', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('week', sa.Date(), nullable=True))
+        batch_op.create_foreign_key('fk_workout_sets_user_id', 'users', ['user_id'], ['id'])
+
+    # Backfill existing sets in id order, one batch per round trip
+    workout_sets = sa.table('workout_sets',
+        sa.column('id', sa.Integer), sa.column('session_id', sa.Integer),
+        sa.column('exercise_id', sa.Integer), sa.column('timestamp', sa.DateTime),
+        sa.column('user_id', sa.Integer), sa.column('muscle_group', sa.String),
+        sa.column('week', sa.Date))
+    sessions = sa.table('workout_sessions', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer))
+    exercises = sa.table('exercises', sa.column('id', sa.Integer), sa.column('muscle_group', sa.String))
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(workout_sets.c.id, sessions.c.user_id, exercises.c.muscle_group, workout_sets.c.timestamp)
+            .select_from(workout_sets)
+            .join(sessions, sessions.c.id == workout_sets.c.session_id)
+            .outerjoin(exercises, exercises.c.id == workout_sets.c.exercise_id)
+            .where(workout_sets.c.id > last_id)
+            .order_by(workout_sets.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        bind.execute(
+            workout_sets.update()
+            .where(workout_sets.c.id == sa.bindparam('set_id'))
+            .values(user_id=sa.bindparam('set_user_id'), muscle_group=sa.bindparam('set_muscle_group'),
+                    week=sa.bindparam('set_week')),
+            [
+                {
+                    'set_id': set_id,
+                    'set_user_id': user_id,
+                    'set_muscle_group': muscle_group,
+                    'set_week': (timestamp.date() - timedelta(days=timestamp.weekday())) if timestamp else None
+                }
+                for set_id, user_id, muscle_group, timestamp in rows
+            ]
+        )
+        last_id = rows[-1][0]
+
+    op.create_index('idx_workout_sets_user_muscle_week', 'workout_sets', ['user_id', 'muscle_group', 'week'])
+
+
+def downgrade():
+    op.drop_index('idx_workout_sets_user_muscle_week', 'workout_sets')
+    with op.batch_alter_table('workout_sets', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_workout_sets_user_id', type_='foreignkey')
+        batch_op.drop_column('week')
+        batch_op.drop_column('muscle_group')
+        batch_op.drop_column('user_id')
+    op.drop_table('muscles')
@@ -0,0 +1,116 @@
+"""partition workout_sets by month on timestamp
+
+On Postgres workout_sets becomes a range-partitioned table with one
+partition per month plus a default partition. The primary key becomes
+(id, timestamp), because every unique constraint on a partitioned table
+has to include the partition key. Rows are copied into the new table,
+so run this during a maintenance window on large databases. On other
+databases only the NOT NULL constraints and the (user_id, timestamp)
+index are added.
+
+Revision ID: 5d1f8a3b7e20
+Revises: 0b7e4d2a9c58
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1f8a3b7e20'
+down_revision = '0b7e4d2a9c58'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    ('idx_workout_sets_session_id', 'session_id'),
+    ('idx_workout_sets_exercise_id', 'exercise_id'),
+    ('idx_workout_sets_user_muscle_week', 'user_id, muscle_group, week'),
+]
+FOREIGN_KEYS = [
+    ('workout_sets_session_id_fkey', 'session_id', 'workout_sessions'),
+    ('workout_sets_exercise_id_fkey', 'exercise_id', 'exercises'),
+    ('fk_workout_sets_user_id', 'user_id', 'users'),
+]
+
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _add_constraints(table, primary_key):
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT workout_sets_pkey PRIMARY KEY ({primary_key})')
+    for name, column, target in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {target} (id)')
+    for name, columns in INDEXES:
+        op.execute(f'CREATE INDEX {name} ON {table} ({columns})')
+
+
+def upgrade():
+    # Legacy rows get their session's user and start time
+    op.execute(
+        'UPDATE workout_sets SET user_id = (SELECT user_id FROM workout_sessions WHERE workout_sessions.id = workout_sets.session_id) '
+        'WHERE user_id IS NULL'
+    )
+    op.execute(
+        'UPDATE workout_sets SET "timestamp" = COALESCE((SELECT started_at FROM workout_sessions '
+        'WHERE workout_sessions.id = workout_sets.session_id), CURRENT_TIMESTAMP) WHERE "timestamp" IS NULL'
+    )
+    with op.batch_alter_table('workout_sets', schema=None) as batch_op:
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.create_index('idx_workout_sets_user_timestamp', 'workout_sets', ['user_id', 'timestamp'])
+        return
+
+    # Keep the id sequence alive when the old table is dropped
+    op.execute('ALTER TABLE workout_sets RENAME TO workout_sets_heap')
+    op.execute('ALTER SEQUENCE workout_sets_id_seq OWNED BY NONE')
+    op.execute('CREATE TABLE workout_sets (LIKE workout_sets_heap INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")')
+
+    first = bind.execute(sa.text('SELECT min("timestamp") FROM workout_sets_heap')).scalar() or datetime.utcnow()
+    month = date(first.year, first.month, 1)
+    last = _add_months(date.today().replace(day=1), MONTHS_AHEAD)
+    while month <= last:
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE workout_sets_{month:%Y_%m} PARTITION OF workout_sets "
+            f"FOR VALUES FROM ('{month}') TO ('{end}')"
+        )
+        month = end
+    op.execute('CREATE TABLE workout_sets_default PARTITION OF workout_sets DEFAULT')
+
+    op.execute('INSERT INTO workout_sets SELECT * FROM workout_sets_heap')
+    op.execute('DROP TABLE workout_sets_heap')
+
+    # Constraints and indexes are built once the rows are in; each partition gets its own copy
+    _add_constraints('workout_sets', 'id, "timestamp"')
+    op.execute('CREATE INDEX idx_workout_sets_user_timestamp ON workout_sets (user_id, "timestamp")')
+    op.execute('ALTER SEQUENCE workout_sets_id_seq OWNED BY workout_sets.id')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('ALTER TABLE workout_sets RENAME TO workout_sets_partitioned')
+        op.execute('ALTER SEQUENCE workout_sets_id_seq OWNED BY NONE')
+        op.execute('CREATE TABLE workout_sets (LIKE workout_sets_partitioned INCLUDING DEFAULTS)')
+        op.execute('INSERT INTO workout_sets SELECT * FROM workout_sets_partitioned')
+        # Dropping the parent drops every partition
+        op.execute('DROP TABLE workout_sets_partitioned')
+        _add_constraints('workout_sets', 'id')
+        op.execute('ALTER SEQUENCE workout_sets_id_seq OWNED BY workout_sets.id')
+    else:
+        op.drop_index('idx_workout_sets_user_timestamp', 'workout_sets')
+
+    with op.batch_alter_table('workout_sets', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=True)
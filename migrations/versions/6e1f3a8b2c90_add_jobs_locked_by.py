@@ -0,0 +1,26 @@
+"""add jobs.locked_by
+
+Revision ID: 6e1f3a8b2c90
+Revises: 2d7a9e4c1b68
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1f3a8b2c90'
+down_revision = '2d7a9e4c1b68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('locked_by', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('locked_by')
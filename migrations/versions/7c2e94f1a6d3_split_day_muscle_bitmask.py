@@ -0,0 +1,167 @@
+"""store split day muscle groups as a bitmask
+
+Revision ID: 7c2e94f1a6d3
+Revises: 3b8f61c0d2a7
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e94f1a6d3'
+down_revision = '3b8f61c0d2a7'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the utils.muscles parser and formatter as of this revision,
+# so the data conversion doesn't change when the live taxonomy does
+MUSCLES = [
+    ('chest', 'upper_chest', 0),
+    ('chest', 'middle_chest', 1),
+    ('chest', 'lower_chest', 2),
+    ('back', 'lats', 3),
+    ('back', 'upper_back', 4),
+    ('back', 'lower_back', 5),
+    ('back', 'traps', 6),
+    ('back', 'rhomboids', 7),
+    ('shoulders', 'front_delt', 8),
+    ('shoulders', 'side_delt', 9),
+    ('shoulders', 'rear_delt', 10),
+    ('biceps', 'short_head', 11),
+    ('biceps', 'long_head', 12),
+    ('biceps', 'brachialis', 13),
+    ('triceps', 'long_head', 14),
+    ('triceps', 'lateral_head', 15),
+    ('triceps', 'medial_head', 16),
+    ('forearms', 'forearms', 17),
+    ('legs', 'quads', 18),
+    ('legs', 'hamstrings', 19),
+    ('legs', 'glutes', 20),
+    ('legs', 'calves', 21),
+    ('core', 'abs', 22),
+    ('core', 'obliques', 23),
+]
+MUSCLE_BITS = {(group, specific): 1 << position for group, specific, position in MUSCLES}
+
+GROUP_MASKS = {}
+SPECIFIC_MASKS = {}
+QUALIFIED_MASKS = {}
+for (muscle_group, specific_muscle), bit in MUSCLE_BITS.items():
+    GROUP_MASKS[muscle_group] = GROUP_MASKS.get(muscle_group, 0) | bit
+    SPECIFIC_MASKS[specific_muscle] = SPECIFIC_MASKS.get(specific_muscle, 0) | bit
+    QUALIFIED_MASKS[f'{muscle_group}_{specific_muscle}'] = bit
+AMBIGUOUS_MUSCLES = {name for name, mask in SPECIFIC_MASKS.items() if mask & (mask - 1)}
+
+MUSCLE_ALIASES = {
+    'arms': GROUP_MASKS['biceps'] | GROUP_MASKS['triceps'] | GROUP_MASKS['forearms'],
+    'delts': GROUP_MASKS['shoulders'],
+    'abdominals': GROUP_MASKS['core'],
+    'lat': SPECIFIC_MASKS['lats'],
+    'quad': SPECIFIC_MASKS['quads'],
+    'hamstring': SPECIFIC_MASKS['hamstrings'],
+    'glute': SPECIFIC_MASKS['glutes'],
+    'calf': SPECIFIC_MASKS['calves'],
+    'trap': SPECIFIC_MASKS['traps'],
+    'ab': SPECIFIC_MASKS['abs'],
+}
+
+
+def _token_mask(token):
+    key = token.strip().lower().replace('-', ' ').replace(' ', '_')
+    for candidate in (key, key.rstrip('s')):
+        mask = (
+            GROUP_MASKS.get(candidate) or SPECIFIC_MASKS.get(candidate)
+            or QUALIFIED_MASKS.get(candidate) or MUSCLE_ALIASES.get(candidate)
+        )
+        if mask:
+            return mask
+    return 0
+
+
+def parse_muscles(value):
+    mask = 0
+    extra = []
+    for token in re.split(r'[,&/+]|\band\b', value or ''):
+        if not token.strip():
+            continue
+        token_mask = _token_mask(token)
+        if token_mask:
+            mask |= token_mask
+        else:
+            extra.append(token.strip())
+    return mask, ', '.join(extra) or None
+
+
+def _title(name):
+    return name.replace('_', ' ').title()
+
+
+def format_muscles(mask, extra=None):
+    names = []
+    for muscle_group, group_mask in GROUP_MASKS.items():
+        if mask & group_mask == group_mask:
+            names.append(_title(muscle_group))
+            continue
+        for (group, specific_muscle), bit in MUSCLE_BITS.items():
+            if group == muscle_group and mask & bit:
+                if specific_muscle in AMBIGUOUS_MUSCLES:
+                    names.append(_title(f'{group}_{specific_muscle}'))
+                else:
+                    names.append(_title(specific_muscle))
+    if extra:
+        names.append(extra)
+    return ', '.join(names) or None
+
+
+split_days = sa.table('split_days',
+    sa.column('id', sa.Integer),
+    sa.column('muscle_groups', sa.String),
+    sa.column('muscle_mask', sa.Integer),
+    sa.column('muscle_groups_extra', sa.String))
+
+
+def upgrade():
+    with op.batch_alter_table('split_days', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('muscle_mask', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('muscle_groups_extra', sa.String(length=255), nullable=True))
+
+    # Split days are few; convert them all in one pass
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(split_days.c.id, split_days.c.muscle_groups)).fetchall()
+    updates = []
+    for day_id, muscle_groups in rows:
+        mask, extra = parse_muscles(muscle_groups)
+        updates.append({'day_id': day_id, 'day_mask': mask, 'day_extra': extra})
+    if updates:
+        bind.execute(
+            split_days.update().where(split_days.c.id == sa.bindparam('day_id'))
+            .values(muscle_mask=sa.bindparam('day_mask'), muscle_groups_extra=sa.bindparam('day_extra')),
+            updates
+        )
+
+    with op.batch_alter_table('split_days', schema=None) as batch_op:
+        batch_op.drop_column('muscle_groups')
+
+
+def downgrade():
+    with op.batch_alter_table('split_days', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('muscle_groups', sa.String(length=255), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(split_days.c.id, split_days.c.muscle_mask, split_days.c.muscle_groups_extra)
+    ).fetchall()
+    if rows:
+        bind.execute(
+            split_days.update().where(split_days.c.id == sa.bindparam('day_id'))
+            .values(muscle_groups=sa.bindparam('day_muscles')),
+            [{'day_id': day_id, 'day_muscles': format_muscles(mask, extra)} for day_id, mask, extra in rows]
+        )
+
+    with op.batch_alter_table('split_days', schema=None) as batch_op:
+        batch_op.drop_column('muscle_groups_extra')
+        batch_op.drop_column('muscle_mask')
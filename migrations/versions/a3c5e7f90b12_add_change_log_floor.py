@@ -0,0 +1,29 @@
+"""add users.change_log_floor
+
+Revision ID: a3c5e7f90b12
+Revises: 6e1f3a8b2c90
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f90b12'
+down_revision = '6e1f3a8b2c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_log_floor', sa.BigInteger(), server_default='0', nullable=False))
+    # prune_changes.py deletes by age; this index keeps it from scanning the whole log
+    op.create_index('idx_change_log_created_at', 'change_log', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('idx_change_log_created_at', table_name='change_log')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('change_log_floor')
@@ -0,0 +1,43 @@
+"""add exercise_suggestions
+
+Revision ID: a58d3e0b7c14
+Revises: 7c2e94f1a6d3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a58d3e0b7c14'
+down_revision = '7c2e94f1a6d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled after each finished workout; run rebuild_suggestions.py once to backfill existing users
+    op.create_table('exercise_suggestions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=True),
+    sa.Column('exercise_name', sa.String(length=120), nullable=False),
+    sa.Column('muscle_group', sa.String(length=50), nullable=True),
+    sa.Column('specific_muscle', sa.String(length=50), nullable=True),
+    sa.Column('muscle_mask', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('score', sa.Float(), server_default='0', nullable=False),
+    sa.Column('times_performed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_weight', sa.Float(), nullable=True),
+    sa.Column('last_reps', sa.Integer(), nullable=True),
+    sa.Column('last_performed_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'exercise_name', name='uq_exercise_suggestions_user_exercise')
+    )
+
+
+def downgrade():
+    op.drop_table('exercise_suggestions')
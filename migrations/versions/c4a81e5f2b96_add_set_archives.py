@@ -0,0 +1,39 @@
+"""add set_archives and workout_sessions.archived
+
+Revision ID: c4a81e5f2b96
+Revises: 5d1f8a3b7e20
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a81e5f2b96'
+down_revision = '5d1f8a3b7e20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by archive_history.py / the archive_history job, nothing to backfill
+    op.create_table('set_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('set_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'year', name='uq_set_archives_user_year')
+    )
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('archived', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.drop_column('archived')
+    op.drop_table('set_archives')
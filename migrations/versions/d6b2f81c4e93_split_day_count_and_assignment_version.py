@@ -0,0 +1,37 @@
+"""split day_count and assignment version
+
+Revision ID: d6b2f81c4e93
+Revises: a58d3e0b7c14
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6b2f81c4e93'
+down_revision = 'a58d3e0b7c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('splits', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('day_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(
+        'UPDATE splits SET day_count = '
+        '(SELECT COUNT(*) FROM split_days WHERE split_days.split_id = splits.id)'
+    )
+
+    with op.batch_alter_table('user_split_assignments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user_split_assignments', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('splits', schema=None) as batch_op:
+        batch_op.drop_column('day_count')
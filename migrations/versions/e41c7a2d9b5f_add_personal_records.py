@@ -0,0 +1,54 @@
+"""add personal_records and rep_records
+
+Revision ID: e41c7a2d9b5f
+Revises: 9767aa90b069
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41c7a2d9b5f'
+down_revision = '9767aa90b069'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('personal_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=True),
+    sa.Column('exercise_name', sa.String(length=120), nullable=False),
+    sa.Column('best_weight', sa.Float(), nullable=False),
+    sa.Column('best_weight_reps', sa.Integer(), nullable=False),
+    sa.Column('best_e1rm', sa.Float(), nullable=False),
+    sa.Column('best_e1rm_weight', sa.Float(), nullable=False),
+    sa.Column('best_e1rm_reps', sa.Integer(), nullable=False),
+    sa.Column('best_session_volume', sa.Float(), nullable=False),
+    sa.Column('best_session_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ),
+    sa.ForeignKeyConstraint(['best_session_id'], ['workout_sessions.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'exercise_name', name='uq_personal_records_user_exercise')
+    )
+    op.create_table('rep_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_name', sa.String(length=120), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.Column('reps', sa.Integer(), nullable=False),
+    sa.Column('achieved_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'exercise_name', 'weight', name='uq_rep_records_user_exercise_weight')
+    )
+
+
+def downgrade():
+    op.drop_table('rep_records')
+    op.drop_table('personal_records')
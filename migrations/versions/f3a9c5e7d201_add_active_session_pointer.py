@@ -0,0 +1,42 @@
+"""add active_session_id to user_split_assignments
+
+Revision ID: f3a9c5e7d201
+Revises: d6b2f81c4e93
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c5e7d201'
+down_revision = 'd6b2f81c4e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_split_assignments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('active_session_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_user_split_assignments_active_session', 'workout_sessions',
+            ['active_session_id'], ['id'], ondelete='SET NULL'
+        )
+
+    # Point each assignment at the user's latest unfinished session
+    assignments = sa.table('user_split_assignments', sa.column('user_id', sa.Integer), sa.column('active_session_id', sa.Integer))
+    sessions = sa.table('workout_sessions', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('completed', sa.Boolean))
+    op.execute(
+        assignments.update().values(
+            active_session_id=sa.select(sa.func.max(sessions.c.id))
+            .where(sessions.c.user_id == assignments.c.user_id, sessions.c.completed == sa.false())
+            .scalar_subquery()
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('user_split_assignments', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_user_split_assignments_active_session', type_='foreignkey')
+        batch_op.drop_column('active_session_id')
@@ -1,7 +1,9 @@
 from datetime import datetime, date
 from flask_sqlalchemy import SQLAlchemy
+from utils.muscles import format_muscles, parse_muscles
+from utils.replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 class User(db.Model):
@@ -15,6 +17,9 @@ class User(db.Model):
     height = db.Column(db.Float, nullable=True, default=None)  # in cm
     weight = db.Column(db.Float, nullable=True, default=None)  # in kg
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Last change_log sequence number; bumped once per writing transaction, see utils/changes.py
+    change_seq = db.Column(db.BigInteger, default=0, nullable=False)
+    change_log_floor = db.Column(db.BigInteger, default=0, nullable=False)  # highest seq pruned from change_log
 
     splits = db.relationship('Split', back_populates='owner', cascade='all, delete-orphan')
     assignment = db.relationship('UserSplitAssignment', back_populates='user', uselist=False)
@@ -26,6 +31,7 @@ class Split(db.Model):
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Nullable for system templates
     name = db.Column(db.String(120), nullable=False)
     is_template = db.Column(db.Boolean, default=False)  # True for public templates
+    day_count = db.Column(db.Integer, default=0, nullable=False)  # len(days), kept for position arithmetic in SQL
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     owner = db.relationship('User', back_populates='splits')
@@ -38,10 +44,20 @@ class SplitDay(db.Model):
     split_id = db.Column(db.Integer, db.ForeignKey('splits.id'), nullable=False)
     position = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(80), nullable=False)
-    muscle_groups = db.Column(db.String(255), nullable=True)
+    muscle_mask = db.Column(db.Integer, default=0, nullable=False)  # bitmask over utils.muscles taxonomy
+    muscle_groups_extra = db.Column(db.String(255), nullable=True)  # names outside the taxonomy
 
     split = db.relationship('Split', back_populates='days')
 
+    @property
+    def muscle_groups(self):
+        """Comma separated view of the bitmask, kept for API compatibility"""
+        return format_muscles(self.muscle_mask or 0, self.muscle_groups_extra)
+
+    @muscle_groups.setter
+    def muscle_groups(self, value):
+        self.muscle_mask, self.muscle_groups_extra = parse_muscles(value)
+
 
 class UserSplitAssignment(db.Model):
     __tablename__ = 'user_split_assignments'
@@ -50,10 +66,21 @@ class UserSplitAssignment(db.Model):
     split_id = db.Column(db.Integer, db.ForeignKey('splits.id'), nullable=False)
     current_position = db.Column(db.Integer, default=0, nullable=False)
     last_completed_at = db.Column(db.Date, nullable=True)
+    version = db.Column(db.Integer, nullable=False)  # bumped on every write, see __mapper_args__
+    active_session_id = db.Column(
+        db.Integer,
+        db.ForeignKey('workout_sessions.id', use_alter=True, name='fk_user_split_assignments_active_session', ondelete='SET NULL'),
+        nullable=True
+    )  # unfinished session, maintained by start/finish/cancel
+
+    __mapper_args__ = {'version_id_col': version}
 
     user = db.relationship('User', back_populates='assignment')
     split = db.relationship('Split')
-    sessions = db.relationship('WorkoutSession', back_populates='assignment', cascade='all, delete-orphan')
+    sessions = db.relationship(
+        'WorkoutSession', back_populates='assignment', cascade='all, delete-orphan',
+        foreign_keys='WorkoutSession.assignment_id'
+    )
 
 
 class WorkoutSession(db.Model):
@@ -65,14 +92,24 @@ class WorkoutSession(db.Model):
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     ended_at = db.Column(db.DateTime, nullable=True)
     completed = db.Column(db.Boolean, default=False)
+    # Aggregates over the session's sets, maintained by add_set/delete_set/finish
+    total_sets = db.Column(db.Integer, default=0, nullable=False)
+    total_volume = db.Column(db.Float, default=0, nullable=False)  # sum of reps × weight
+    exercise_count = db.Column(db.Integer, default=0, nullable=False)
+    duration_seconds = db.Column(db.Integer, nullable=True)  # set when the session is finished
+    archived = db.Column(db.Boolean, default=False, nullable=False)  # sets moved to set_archives, see utils/archive.py
 
-    assignment = db.relationship('UserSplitAssignment', back_populates='sessions')
+    assignment = db.relationship('UserSplitAssignment', back_populates='sessions', foreign_keys=[assignment_id])
     split_day = db.relationship('SplitDay')
     sets = db.relationship('WorkoutSet', back_populates='session', cascade='all, delete-orphan')
 
 
 class WorkoutSet(db.Model):
     __tablename__ = 'workout_sets'
+    __table_args__ = (
+        db.Index('idx_workout_sets_user_muscle_week', 'user_id', 'muscle_group', 'week'),
+        db.Index('idx_workout_sets_user_timestamp', 'user_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('workout_sessions.id'), nullable=False)
     exercise_id = db.Column(db.Integer, db.ForeignKey('exercises.id'), nullable=True)  # New field
@@ -80,11 +117,20 @@ class WorkoutSet(db.Model):
     set_number = db.Column(db.Integer, nullable=False)
     reps = db.Column(db.Integer, nullable=False)
     weight = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Partition key on Postgres (monthly ranges, see utils/partitions.py)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Denormalized at insert time so muscle volume queries skip the joins and can prune partitions
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    muscle_group = db.Column(db.String(50), nullable=True)  # NULL for name-only legacy sets
+    week = db.Column(db.Date, nullable=True)  # Monday of the week the set was done
 
     session = db.relationship('WorkoutSession', back_populates='sets')
     exercise = db.relationship('Exercise', backref='workout_sets')
 
+    # The partitioned table's primary key is (id, timestamp); identifying rows the
+    # same way lets updates and deletes of a set touch only its month's partition
+    __mapper_args__ = {'primary_key': [id, timestamp]}
+
 
 class Exercise(db.Model):
     __tablename__ = 'exercises'
@@ -97,3 +143,132 @@ class Exercise(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     creator = db.relationship('User', backref='custom_exercises')
+
+
+class Muscle(db.Model):
+    __tablename__ = 'muscles'
+    __table_args__ = (
+        db.UniqueConstraint('muscle_group', 'specific_muscle', name='uq_muscles_group_specific'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    muscle_group = db.Column(db.String(50), nullable=False)  # chest, back, shoulders, etc.
+    specific_muscle = db.Column(db.String(50), nullable=False)  # upper_chest, lats, etc.
+    position = db.Column(db.Integer, nullable=False)  # display order
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('idx_jobs_status_run_at', 'status', 'run_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.JSON, nullable=True)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)  # last heartbeat while running
+    locked_by = db.Column(db.String(32), nullable=True)  # lock token of the worker running it
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class PersonalRecord(db.Model):
+    __tablename__ = 'personal_records'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'exercise_id', name='uq_personal_records_user_exercise'),
+        # Sets logged by name only, without an exercise id
+        db.Index('uq_personal_records_user_exercise_name', 'user_id', 'exercise_name', unique=True,
+                 postgresql_where=db.text('exercise_id IS NULL'), sqlite_where=db.text('exercise_id IS NULL')),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercises.id'), nullable=True)
+    exercise_name = db.Column(db.String(120), nullable=False)
+    best_weight = db.Column(db.Float, default=0, nullable=False)
+    best_weight_reps = db.Column(db.Integer, default=0, nullable=False)  # reps done at best_weight
+    best_e1rm = db.Column(db.Float, default=0, nullable=False)  # estimated one rep max
+    best_e1rm_weight = db.Column(db.Float, default=0, nullable=False)
+    best_e1rm_reps = db.Column(db.Integer, default=0, nullable=False)
+    best_session_volume = db.Column(db.Float, default=0, nullable=False)  # reps × weight in one session
+    best_session_id = db.Column(db.Integer, db.ForeignKey('workout_sessions.id', ondelete='SET NULL'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RepRecord(db.Model):
+    __tablename__ = 'rep_records'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'exercise_id', 'weight', name='uq_rep_records_user_exercise_weight'),
+        db.Index('uq_rep_records_user_exercise_name_weight', 'user_id', 'exercise_name', 'weight', unique=True,
+                 postgresql_where=db.text('exercise_id IS NULL'), sqlite_where=db.text('exercise_id IS NULL')),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercises.id'), nullable=True)
+    exercise_name = db.Column(db.String(120), nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    reps = db.Column(db.Integer, nullable=False)  # most reps ever done at this weight
+    achieved_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ExerciseSuggestion(db.Model):
+    __tablename__ = 'exercise_suggestions'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'exercise_name', name='uq_exercise_suggestions_user_exercise'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercises.id'), nullable=True)
+    exercise_name = db.Column(db.String(120), nullable=False)
+    muscle_group = db.Column(db.String(50), nullable=True)
+    specific_muscle = db.Column(db.String(50), nullable=True)
+    muscle_mask = db.Column(db.Integer, default=0, nullable=False)  # bit of specific_muscle, 0 if unknown
+    score = db.Column(db.Float, default=0, nullable=False)  # recency weighted session count
+    times_performed = db.Column(db.Integer, default=0, nullable=False)  # sessions in the scoring window
+    last_weight = db.Column(db.Float, nullable=True)  # top set of the most recent session
+    last_reps = db.Column(db.Integer, nullable=True)
+    last_performed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SetArchive(db.Model):
+    """A user's archived sets for one calendar year, as compressed columnar arrays"""
+    __tablename__ = 'set_archives'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', name='uq_set_archives_user_year'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)  # year the archived sessions started in
+    set_count = db.Column(db.Integer, default=0, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)  # np.savez_compressed payload
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RevokedToken(db.Model):
+    """A JWT that must no longer be accepted: rotated refresh tokens and tokens of signed-out sessions"""
+    __tablename__ = 'revoked_tokens'
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)  # 'access' or 'refresh'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)  # rows past this can be deleted
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ChangeLog(db.Model):
+    """One change to a user's sessions or splits, read by GET /api/sync"""
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        db.Index('idx_change_log_user_seq', 'user_id', 'seq'),
+        db.Index('idx_change_log_created_at', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False)  # users.change_seq of the writing transaction
+    entity = db.Column(db.String(10), nullable=False)  # 'session' or 'split'
+    entity_id = db.Column(db.Integer, nullable=False)  # no foreign key: deleted rows are logged too
+    op = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
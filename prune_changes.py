@@ -0,0 +1,32 @@
+"""
+Prune the change log behind GET /api/sync
+Clients last synced before the cutoff get a full resync on their next sync.
+Run daily, e.g. from a scheduler: python prune_changes.py [--days 90]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from app import create_app
+from models import db
+from utils.changes import prune_changes
+
+app = create_app()
+
+DEFAULT_RETENTION_DAYS = 90
+
+
+def prune(days=DEFAULT_RETENTION_DAYS):
+    with app.app_context():
+        deleted = prune_changes(datetime.utcnow() - timedelta(days=days))
+        db.session.commit()
+        print(f"✅ Pruned {deleted} change log entries older than {days} days")
+        return deleted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prune the sync change log')
+    parser.add_argument('--days', type=int, default=DEFAULT_RETENTION_DAYS,
+                        help='keep entries from the last DAYS days')
+    args = parser.parse_args()
+
+    prune(args.days)
@@ -0,0 +1,23 @@
+"""
+Rebuild personal records from finished workouts
+Run to repair drift; the 2d7a9e4c1b68 migration queues the same rebuild as jobs
+"""
+from app import create_app
+from models import db, User
+from utils.records import rebuild_records
+
+app = create_app()
+
+
+def rebuild_all():
+    with app.app_context():
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        print(f"🔁 Rebuilding personal records for {len(user_ids)} users...")
+        for user_id in user_ids:
+            rebuild_records(user_id)
+            db.session.commit()
+        print("✅ Done!")
+
+
+if __name__ == '__main__':
+    rebuild_all()
@@ -0,0 +1,23 @@
+"""
+Rebuild every user's exercise suggestion index from their history
+Run once after deploying the exercise_suggestions table, or to repair drift
+"""
+from app import create_app
+from models import db, User
+from utils.suggestions import refresh_suggestions
+
+app = create_app()
+
+
+def rebuild_all():
+    with app.app_context():
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        print(f"🔁 Rebuilding exercise suggestions for {len(user_ids)} users...")
+        for user_id in user_ids:
+            refresh_suggestions(user_id)
+            db.session.commit()
+        print("✅ Done!")
+
+
+if __name__ == '__main__':
+    rebuild_all()
@@ -1,12 +1,26 @@
 from flask import Blueprint, request, jsonify
 from models import db, User
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, get_jwt, get_jwt_identity, jwt_required
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from sqlalchemy.exc import IntegrityError
+from utils.passwords import hash_password, needs_rehash, verify_password, VerifierBusy
+from utils.ratelimit import bucket, retry_later
+from utils.revocation import revoke
+from utils.transaction import unit_of_work
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+def _token_pair(identity, claims):
+    """A short-lived access token plus the refresh token that renews it"""
+    return {
+        'access_token': create_access_token(identity=identity, additional_claims=claims),
+        'refresh_token': create_refresh_token(identity=identity, additional_claims=claims),
+    }
+
 
 @auth_bp.route('/signup', methods=['POST'])
+@unit_of_work
 def signup():
     data = request.get_json() or {}
     email = data.get('email')
@@ -17,30 +31,95 @@ def signup():
     if not email or not password or not name or not mobile:
         return jsonify({'message': 'email, password, name, and mobile are required'}), 400
 
+    # Hash before the first query, so no transaction is open while it runs
+    try:
+        password_hash = hash_password(password)
+    except VerifierBusy:
+        return retry_later('server busy, try again', 503, 1)
     if User.query.filter_by(email=email).first():
         return jsonify({'message': 'email already taken'}), 400
 
     u = User(
         email=email, 
-        password_hash=generate_password_hash(password),
+        password_hash=password_hash,
         name=name,
         mobile=mobile
     )
     db.session.add(u)
-    db.session.commit()
+    db.session.flush()
     return jsonify({'id': u.id, 'email': u.email, 'name': u.name}), 201
 
 
 @auth_bp.route('/login', methods=['POST'])
+@unit_of_work
 def login():
     data = request.get_json() or {}
     email = data.get('email')
     password = data.get('password')
     if not email or not password:
         return jsonify({'message': 'email and password required'}), 400
-    u = User.query.filter_by(email=email).first()
-    if not u or not check_password_hash(u.password_hash, password):
+
+    wait = bucket('login').take(f'login:{email.strip().lower()}')
+    if wait:
+        return retry_later('too many login attempts', 429, wait)
+
+    # End the lookup's transaction before verifying, so the slow hash check
+    # doesn't hold a pooled connection (and an open transaction) while it waits
+    u = db.session.query(User.id, User.password_hash, User.name, User.email).filter_by(email=email).first()
+    db.session.rollback()
+    try:
+        valid = u is not None and verify_password(u.password_hash, password)
+    except VerifierBusy:
+        return retry_later('server busy, try again', 503, 1)
+    if not valid:
         return jsonify({'message': 'invalid credentials'}), 401
+
+    # Hash parameters changed since this password was stored. Hashed before the
+    # UPDATE opens a transaction; skipped if a concurrent login got there first.
+    if needs_rehash(u.password_hash):
+        try:
+            password_hash = hash_password(password)
+        except VerifierBusy:
+            return retry_later('server busy, try again', 503, 1)
+        db.session.execute(
+            db.update(User)
+            .where(User.id == u.id, User.password_hash == u.password_hash)
+            .values(password_hash=password_hash)
+        )
+
     # ensure 'sub' claim is a string, add name to additional claims
-    token = create_access_token(identity=str(u.id), additional_claims={'name': u.name, 'email': u.email})
-    return jsonify({'access_token': token})
\ No newline at end of file
+    return jsonify(_token_pair(str(u.id), {'name': u.name, 'email': u.email}))
+
+
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+@unit_of_work
+def refresh():
+    """Trade a refresh token for a new token pair. Each refresh token works once."""
+    claims = get_jwt()
+    try:
+        revoke(claims, int(get_jwt_identity()))
+    except IntegrityError:
+        # The same refresh token was used by a concurrent request
+        db.session.rollback()
+        return jsonify({'msg': 'Token has been revoked'}), 401
+    # Name and email ride along from the old token, so refreshing never touches users
+    return jsonify(_token_pair(get_jwt_identity(), {'name': claims.get('name'), 'email': claims.get('email')}))
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(refresh=True)
+@unit_of_work
+def logout():
+    """Revoke the refresh token and, if sent as access_token, the current access token"""
+    user_id = int(get_jwt_identity())
+    revoke(get_jwt(), user_id)
+    access_token = (request.get_json(silent=True) or {}).get('access_token')
+    if access_token:
+        try:
+            access_claims = decode_token(access_token)
+        except (JWTExtendedException, PyJWTError):
+            access_claims = None  # expired, malformed or already revoked
+        if access_claims and access_claims['sub'] == get_jwt_identity():
+            revoke(access_claims, user_id)
+    return jsonify({'message': 'logged out'})
@@ -0,0 +1,70 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from routes.today import today_payload, session_summary_payload
+from routes.splits import split_queries, splits_payload
+from routes.progress import stats_payload
+from utils.suggestions import suggestions_for_day
+from utils.context import user_context
+from utils.transaction import read_only
+from utils.ratelimit import rate_limited
+from utils.coalesce import coalesced
+
+bootstrap_bp = Blueprint("bootstrap", __name__, url_prefix='/api/bootstrap')
+
+
+def _today(ctx):
+    if not ctx.current_day:
+        return None
+    return today_payload(ctx.assignment, ctx.current_day, ctx.active_session)
+
+
+def _session(ctx):
+    if not ctx.active_session:
+        return None
+    return session_summary_payload(ctx.active_session)
+
+
+def _splits(ctx):
+    user_splits, template_splits = split_queries(ctx.user_id)
+    return splits_payload(user_splits.all(), template_splits.all())
+
+
+def _stats(ctx):
+    return stats_payload(ctx.user_id)
+
+
+def _suggestions(ctx):
+    if not ctx.current_day:
+        return []
+    return suggestions_for_day(ctx.user_id, ctx.current_day)
+
+
+# Section name -> builder taking the request's UserContext
+SECTIONS = {
+    "today": _today,
+    "session": _session,
+    "splits": _splits,
+    "stats": _stats,
+    "suggestions": _suggestions,
+}
+
+
+@bootstrap_bp.route("", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only
+def bootstrap():
+    """Everything a page needs on load in one round trip, e.g. ?include=today,session"""
+    include = [name.strip() for name in request.args.get("include", "today").split(",") if name.strip()]
+    unknown = [name for name in include if name not in SECTIONS]
+    if unknown:
+        return jsonify({
+            "message": f"Unknown section: {', '.join(unknown)}",
+            "sections": list(SECTIONS)
+        }), 400
+
+    # Assignment (with split and days) and active session are loaded once for all sections
+    ctx = user_context()
+
+    return jsonify({name: SECTIONS[name](ctx) for name in include}), 200
@@ -1,12 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Exercise
+from utils.transaction import unit_of_work, read_only
+from utils.cache import cached, CATALOG_SCOPE
 
 exercises_bp = Blueprint('exercises', __name__, url_prefix='/api/exercises')
 
 
 @exercises_bp.route('/<muscle_group>/<specific_muscle>', methods=['GET'])
 @jwt_required()
+@read_only
+# The default catalog is versioned under CATALOG_SCOPE, which only reaches
+# other processes through a shared tier; the short TTL bounds how long they
+# can serve an old catalog without one
+@cached('exercises', ttl=300, scope=CATALOG_SCOPE)
 def get_exercises(muscle_group, specific_muscle):
     """Get all exercises for a specific muscle"""
     user_id = int(get_jwt_identity())
@@ -32,6 +39,7 @@ def get_exercises(muscle_group, specific_muscle):
 
 @exercises_bp.route('', methods=['POST'])
 @jwt_required()
+@unit_of_work
 def create_exercise():
     """Create a custom exercise"""
     user_id = int(get_jwt_identity())
@@ -52,7 +60,7 @@ def create_exercise():
         created_by=user_id
     )
     db.session.add(exercise)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({
         'id': exercise.id,
@@ -0,0 +1,34 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from utils.importer import HistoryImporter, HistoryImportError, detect_format, iter_records
+from utils.transaction import unit_of_work
+
+import_bp = Blueprint('import', __name__, url_prefix='/api/import')
+
+
+@import_bp.route('', methods=['POST'])
+@jwt_required()
+@unit_of_work
+def import_history():
+    """Import workout history from an uploaded CSV, NDJSON or JSON file"""
+    user_id = int(get_jwt_identity())
+    
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+        file_format = detect_format(upload.filename, upload.mimetype, request.args.get('format'))
+    elif request.content_length:
+        stream = request.stream
+        file_format = detect_format(None, request.mimetype, request.args.get('format'))
+    else:
+        return jsonify({'message': 'file required'}), 400
+    
+    importer = HistoryImporter(user_id)
+    try:
+        summary = importer.run(iter_records(stream, file_format))
+    except HistoryImportError as e:
+        return jsonify({'message': str(e)}), 400
+    except ValueError as e:
+        return jsonify({'message': f'Could not parse file: {e}'}), 400
+    
+    return jsonify({'message': 'Import complete', **summary}), 201
@@ -1,39 +1,46 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, WorkoutSet, WorkoutSession
+from models import db, WorkoutSet, WorkoutSession, PersonalRecord, Muscle
+from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
+from utils.export import EXPORT_FORMATS, export_rows, gzip_chunks
+from utils.analytics import user_analytics
+from utils.archive import archive_horizon, archived_sets
+from utils.muscles import MUSCLE_GROUPS, week_start
+from utils.transaction import read_only, read_only_transaction
+from utils.ratelimit import rate_limited
+from utils.coalesce import coalesced
+from utils.cache import cached
+from utils.snapshots import completed_fingerprint
 
 progress_bp = Blueprint("progress", __name__, url_prefix='/api/progress')
 
 
 @progress_bp.route("/best-lifts", methods=["GET"])
 @jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
+@cached('progress', validator=completed_fingerprint)
 def best_lifts():
     """Step 6: Progress dashboard - Best lifts"""
     user_id = int(get_jwt_identity())
     
-    # Get best weight for each exercise
-    results = (
-        db.session.query(
-            WorkoutSet.exercise_name,
-            func.max(WorkoutSet.weight).label("max_weight"),
-            func.max(WorkoutSet.reps).label("max_reps")
-        )
-        .join(WorkoutSession, WorkoutSession.id == WorkoutSet.session_id)
-        .filter(WorkoutSession.user_id == user_id)
-        .filter(WorkoutSession.completed == True)
-        .group_by(WorkoutSet.exercise_name)
-        .all()
-    )
+    # Records are updated when a workout is finished
+    records = PersonalRecord.query.filter_by(user_id=user_id).order_by(
+        PersonalRecord.exercise_name
+    ).all()
     
     data = [
         {
-            "exercise": r[0],
-            "max_weight": float(r[1]) if r[1] else 0,
-            "max_reps": int(r[2]) if r[2] else 0
+            "exercise": r.exercise_name,
+            "max_weight": r.best_weight,
+            "max_reps": r.best_weight_reps,
+            "estimated_1rm": r.best_e1rm,
+            "best_session_volume": r.best_session_volume
         }
-        for r in results
+        for r in records
     ]
     
     return jsonify({"best_lifts": data}), 200
@@ -41,19 +48,23 @@ def best_lifts():
 
 @progress_bp.route("/volume", methods=["GET"])
 @jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
+@cached('progress', validator=completed_fingerprint)
 def volume_graph():
     """Step 6: Progress dashboard - Volume tracking"""
     user_id = int(get_jwt_identity())
     
-    # Calculate total volume per day (weight × reps)
+    # Calculate total volume per day (weight × reps) from the session aggregates
     results = (
         db.session.query(
             func.date(WorkoutSession.started_at).label("date"),
-            func.sum(WorkoutSet.weight * WorkoutSet.reps).label("volume")
+            func.sum(WorkoutSession.total_volume).label("volume")
         )
-        .join(WorkoutSet, WorkoutSet.session_id == WorkoutSession.id)
         .filter(WorkoutSession.user_id == user_id)
         .filter(WorkoutSession.completed == True)
+        .filter(WorkoutSession.total_sets > 0)
         .group_by(func.date(WorkoutSession.started_at))
         .order_by(func.date(WorkoutSession.started_at))
         .all()
@@ -70,8 +81,93 @@ def volume_graph():
     return jsonify({"volume": data}), 200
 
 
+@progress_bp.route("/analytics", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
+def analytics():
+    """Rolling volume, workload ratio, estimated 1RM curves and weekly muscle sets"""
+    user_id = int(get_jwt_identity())
+    days = request.args.get("days", 180, type=int)
+    days = max(7, min(days, 730))
+    
+    return jsonify(user_analytics(user_id, days)), 200
+
+
+@progress_bp.route("/muscle-volume", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
+@cached('progress', validator=completed_fingerprint)
+def muscle_volume():
+    """Sets and volume per muscle group per week"""
+    user_id = int(get_jwt_identity())
+    weeks = max(1, min(request.args.get("weeks", 8, type=int), 104))
+    
+    current_week = week_start(datetime.utcnow().date())
+    first_week = current_week - timedelta(weeks=weeks - 1)
+    
+    # Served from the (user_id, muscle_group, week) index, no joins. week is
+    # derived from timestamp, so the timestamp bound changes nothing but lets
+    # Postgres skip the monthly partitions before the range
+    results = (
+        db.session.query(
+            WorkoutSet.week,
+            WorkoutSet.muscle_group,
+            func.count(WorkoutSet.id).label("sets"),
+            func.sum(WorkoutSet.weight * WorkoutSet.reps).label("volume")
+        )
+        .filter(WorkoutSet.user_id == user_id)
+        .filter(WorkoutSet.muscle_group.isnot(None))
+        .filter(WorkoutSet.week >= first_week)
+        .filter(WorkoutSet.timestamp >= datetime.combine(first_week, datetime.min.time()))
+        .group_by(WorkoutSet.week, WorkoutSet.muscle_group)
+        .all()
+    )
+    
+    if datetime.combine(first_week, datetime.min.time()) < archive_horizon():
+        # The range reaches back far enough that some of it may be archived
+        archived = {}
+        for workout_set in archived_sets(user_id, years=range(first_week.year, current_week.year + 1)):
+            week = week_start(workout_set.timestamp.date())
+            if workout_set.muscle_group and week >= first_week:
+                entry = archived.setdefault((week, workout_set.muscle_group), [0, 0])
+                entry[0] += 1
+                entry[1] += workout_set.reps * workout_set.weight
+        results = results + [(week, muscle_group, sets, volume) for (week, muscle_group), (sets, volume) in archived.items()]
+    
+    by_week = {}
+    for week, muscle_group, sets, volume in results:
+        entry = by_week.setdefault(week, {}).setdefault(muscle_group, {"sets": 0, "volume": 0})
+        entry["sets"] += int(sets)
+        entry["volume"] += float(volume) if volume else 0
+    
+    muscle_groups = [m for (m,) in db.session.query(Muscle.muscle_group).group_by(
+        Muscle.muscle_group
+    ).order_by(func.min(Muscle.position))] or MUSCLE_GROUPS
+    
+    data = []
+    for i in range(weeks):
+        week = first_week + timedelta(weeks=i)
+        data.append({
+            "week": week.isoformat(),
+            "muscles": {
+                muscle_group: by_week.get(week, {}).get(muscle_group, {"sets": 0, "volume": 0})
+                for muscle_group in muscle_groups
+            }
+        })
+    
+    return jsonify({"muscle_groups": muscle_groups, "weeks": data}), 200
+
+
 @progress_bp.route("/heatmap", methods=["GET"])
 @jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
+@cached('progress', validator=completed_fingerprint)
 def heatmap():
     """Step 6: Progress dashboard - Workout heatmap"""
     user_id = int(get_jwt_identity())
@@ -100,56 +196,62 @@ def heatmap():
     return jsonify({"heatmap": data}), 200
 
 
-@progress_bp.route("/stats", methods=["GET"])
-@jwt_required()
-def stats():
-    """Overall stats summary"""
-    user_id = int(get_jwt_identity())
-    
-    # Total workouts
-    total_workouts = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=True
-    ).count()
-    
-    # Total sets
-    total_sets = (
-        db.session.query(func.count(WorkoutSet.id))
-        .join(WorkoutSession)
+def stats_payload(user_id):
+    """Body of GET /api/progress/stats, shared with the bootstrap endpoint"""
+    # Total workouts and sets, from the sessions table alone
+    total_workouts, total_sets = (
+        db.session.query(func.count(WorkoutSession.id), func.sum(WorkoutSession.total_sets))
         .filter(WorkoutSession.user_id == user_id)
         .filter(WorkoutSession.completed == True)
-        .scalar()
+        .one()
     )
     
-    return jsonify({
+    return {
         "total_workouts": total_workouts,
         "total_sets": total_sets or 0
-    }), 200
+    }
 
 
-
-@progress_bp.route("/workout-history", methods=["GET"])
+@progress_bp.route("/stats", methods=["GET"])
 @jwt_required()
-def workout_history():
-    """Get detailed history of all completed workouts with set-wise breakdown"""
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
+@cached('progress', validator=completed_fingerprint)
+def stats():
+    """Overall stats summary"""
     user_id = int(get_jwt_identity())
     
-    # Get all completed sessions
-    sessions = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=True
-    ).order_by(WorkoutSession.ended_at.desc()).all()
+    return jsonify(stats_payload(user_id)), 200
+
+
+
+def workouts_payload(user_id, sessions, include_sets=True):
+    """Workout history entries for completed `sessions`, shared with GET /api/sync"""
+    # All sets of those sessions in one query, ordered by exercise and set number
+    sets_by_session = {}
+    hot_ids = [session.id for session in sessions if not session.archived]
+    if include_sets and hot_ids:
+        sets = WorkoutSet.query.filter(
+            WorkoutSet.session_id.in_(hot_ids)
+        ).order_by(WorkoutSet.session_id, WorkoutSet.exercise_name, WorkoutSet.set_number)
+        for workout_set in sets:
+            sets_by_session.setdefault(workout_set.session_id, []).append(workout_set)
+    
+    # Older sessions keep their sets in the archive; only the years listed are decompressed
+    archived = [session for session in sessions if session.archived]
+    if include_sets and archived:
+        for workout_set in sorted(
+            archived_sets(user_id, session_ids={s.id for s in archived}, years={s.started_at.year for s in archived}),
+            key=lambda s: (s.exercise_name, s.set_number)
+        ):
+            sets_by_session.setdefault(workout_set.session_id, []).append(workout_set)
     
     workouts = []
     for session in sessions:
-        # Get all sets in this session, ordered by exercise and set number
-        sets = WorkoutSet.query.filter_by(session_id=session.id).order_by(
-            WorkoutSet.exercise_name, WorkoutSet.set_number
-        ).all()
-        
         # Group sets by exercise with detailed breakdown
         exercises_summary = {}
-        for workout_set in sets:
+        for workout_set in sets_by_session.get(session.id, []):
             exercise_key = workout_set.exercise_id or workout_set.exercise_name
             exercise_name = workout_set.exercise_name
             
@@ -177,33 +279,86 @@ def workout_history():
                 workout_set.weight
             )
         
-        # Calculate totals
-        total_sets = len(sets)
-        total_volume = sum(s.reps * s.weight for s in sets)
-        total_exercises = len(exercises_summary)
-        
-        # Calculate duration
-        duration_minutes = 0
-        if session.started_at and session.ended_at:
-            duration = session.ended_at - session.started_at
-            duration_minutes = int(duration.total_seconds() / 60)
-        
         # Get split day name
         split_day_name = "Workout"
         if session.split_day:
             split_day_name = session.split_day.name
         
-        workouts.append({
+        workout = {
             "session_id": session.id,
             "date": session.ended_at.strftime("%b %d, %Y") if session.ended_at else "Unknown",
+            "ended_at": session.ended_at.isoformat() if session.ended_at else None,
             "day_name": split_day_name,
-            "duration_minutes": duration_minutes,
-            "exercises": list(exercises_summary.values()),
+            "duration_minutes": (session.duration_seconds or 0) // 60,
             "totals": {
-                "exercises": total_exercises,
-                "sets": total_sets,
-                "volume": total_volume
+                "exercises": session.exercise_count,
+                "sets": session.total_sets,
+                "volume": session.total_volume
             }
-        })
+        }
+        if include_sets:
+            workout["exercises"] = list(exercises_summary.values())
+        workouts.append(workout)
+    
+    return workouts
+
+
+@progress_bp.route("/workout-history", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
+@cached('progress', validator=completed_fingerprint)
+def workout_history():
+    """Get detailed history of all completed workouts with set-wise breakdown
+    
+    ?sets=false lists sessions with their totals only, straight from the sessions table.
+    ?limit=N returns only the N most recent workouts.
+    """
+    user_id = int(get_jwt_identity())
+    include_sets = request.args.get("sets", "true").lower() not in ("0", "false", "no")
+    limit = request.args.get("limit", type=int)
+    
+    # Get all completed sessions
+    sessions = WorkoutSession.query.options(joinedload(WorkoutSession.split_day)).filter_by(
+        user_id=user_id,
+        completed=True
+    ).order_by(WorkoutSession.ended_at.desc())
+    if limit:
+        sessions = sessions.limit(max(limit, 1))
+    sessions = sessions.all()
+    
+    return jsonify({"workouts": workouts_payload(user_id, sessions, include_sets)}), 200
+
+
+@progress_bp.route("/export", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+def export_history():
+    """Stream the full training history as ndjson, csv or parquet-lite"""
+    user_id = int(get_jwt_identity())
+    export_format = request.args.get("format", "ndjson")
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    chunk_writer, mimetype, extension = EXPORT_FORMATS[export_format]
+    
+    # Not @read_only: that transaction ends when this function returns, before
+    # the response streams, so the rows are read in one opened by the stream
+    def rows():
+        with read_only_transaction(replica=True, name='export_history'):
+            yield from export_rows(user_id)
+    
+    chunks = chunk_writer(rows())
+    headers = {
+        "Content-Disposition": f"attachment; filename=trackify-export.{extension}"
+    }
+    
+    # Compress as we go; Flask-Compress would buffer the whole stream
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
     
-    return jsonify({"workouts": workouts}), 200
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
@@ -1,12 +1,41 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Split, SplitDay, UserSplitAssignment
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import func
+from utils.muscles import muscle_mask, trains
+from utils.context import user_context
+from utils.transaction import read_only, unit_of_work
+from utils.changes import record_change
 
 splits_bp = Blueprint('splits', __name__, url_prefix='/api/splits')
 
 
+def _assign(user_id, split_id):
+    """Point the user's assignment at `split_id`, creating it if needed"""
+    ctx = user_context(user_id)
+    
+    # Check if user already has an assignment
+    assignment = ctx.assignment
+    if assignment:
+        assignment.split_id = split_id
+        assignment.current_position = 0
+    else:
+        assignment = UserSplitAssignment(
+            user_id=user_id,
+            split_id=split_id,
+            current_position=0
+        )
+        db.session.add(assignment)
+    
+    # The loaded split and days belong to the previous split
+    ctx.reset()
+    return assignment
+
+
 @splits_bp.route('', methods=['POST'])
 @jwt_required()
+@unit_of_work
 def create_split():
     """Step 2: Create your split - Choose days and assign muscle groups"""
     user_id = int(get_jwt_identity())
@@ -17,7 +46,7 @@ def create_split():
     if not name or not days:
         return jsonify({'message': 'name and days required'}), 400
 
-    split = Split(owner_id=user_id, name=name)
+    split = Split(owner_id=user_id, name=name, day_count=len(days))
     db.session.add(split)
     db.session.flush()
 
@@ -30,14 +59,11 @@ def create_split():
         )
         db.session.add(sd)
 
+    record_change(user_id, 'split', split.id)
+
     # Auto-assign this split to the user
-    assignment = UserSplitAssignment(
-        user_id=user_id,
-        split_id=split.id,
-        current_position=0
-    )
-    db.session.add(assignment)
-    db.session.commit()
+    assignment = _assign(user_id, split.id)
+    db.session.flush()
 
     return jsonify({
         'id': split.id,
@@ -46,55 +72,69 @@ def create_split():
     }), 201
 
 
-@splits_bp.route('', methods=['GET'])
-@jwt_required()
-def get_splits():
-    """Get all splits for the user + template splits"""
-    user_id = int(get_jwt_identity())
-    
+def split_queries(user_id):
+    """The user's own splits and the template splits, with days loaded eagerly"""
     # Get user's own splits
-    user_splits = Split.query.filter_by(owner_id=user_id, is_template=False).all()
+    user_splits = Split.query.options(selectinload(Split.days)).filter_by(owner_id=user_id, is_template=False)
     
     # Get template splits (public/shareable)
-    template_splits = Split.query.filter_by(is_template=True).all()
-    
-    result = []
-    
-    # Add user's splits
-    for split in user_splits:
-        result.append({
+    template_splits = Split.query.options(selectinload(Split.days)).filter_by(is_template=True)
+    return user_splits, template_splits
+
+
+def splits_payload(user_splits, template_splits):
+    """Body of GET /api/splits, shared with the bootstrap endpoint"""
+    return [
+        {
             'id': split.id,
             'name': split.name,
-            'is_template': False,
-            'is_mine': True,
+            'is_template': is_template,
+            'is_mine': not is_template,
             'days': [{
                 'id': day.id,
                 'position': day.position,
                 'name': day.name,
                 'muscle_groups': day.muscle_groups
             } for day in split.days]
-        })
+        }
+        for splits, is_template in ((user_splits, False), (template_splits, True))
+        for split in splits
+    ]
+
+
+@splits_bp.route('', methods=['GET'])
+@jwt_required()
+@read_only
+def get_splits():
+    """Get all splits for the user + template splits"""
+    user_id = int(get_jwt_identity())
     
-    # Add template splits
-    for split in template_splits:
-        result.append({
-            'id': split.id,
-            'name': split.name,
-            'is_template': True,
-            'is_mine': False,
-            'days': [{
-                'id': day.id,
-                'position': day.position,
-                'name': day.name,
-                'muscle_groups': day.muscle_groups
-            } for day in split.days]
-        })
+    user_splits, template_splits = split_queries(user_id)
+    
+    # Optional filter, e.g. ?trains=legs&min_days=2 for splits hitting legs twice per cycle
+    trained = request.args.get('trains')
+    if trained:
+        mask = muscle_mask(*trained.split(','))
+        if not mask:
+            return jsonify({'message': f'Unknown muscle group: {trained}'}), 400
+        matching = (
+            db.session.query(SplitDay.split_id)
+            .filter(trains(SplitDay.muscle_mask, mask))
+            .group_by(SplitDay.split_id)
+            .having(func.count(SplitDay.id) >= request.args.get('min_days', 1, type=int))
+        )
+        user_splits = user_splits.filter(Split.id.in_(matching))
+        template_splits = template_splits.filter(Split.id.in_(matching))
+    
+    user_splits = user_splits.all()
+    template_splits = template_splits.all()
     
-    return jsonify({'splits': result}), 200
+    return jsonify({'splits': splits_payload(user_splits, template_splits)}), 200
 
 
 @splits_bp.route('/assign', methods=['POST'])
 @jwt_required()
+@unit_of_work
 def assign_split():
     """Assign or switch to a different split"""
     user_id = int(get_jwt_identity())
@@ -104,21 +144,8 @@ def assign_split():
     if not split_id:
         return jsonify({'message': 'split_id required'}), 400
     
-    # Check if user already has an assignment
-    existing = UserSplitAssignment.query.filter_by(user_id=user_id).first()
-    
-    if existing:
-        existing.split_id = split_id
-        existing.current_position = 0
-    else:
-        existing = UserSplitAssignment(
-            user_id=user_id,
-            split_id=split_id,
-            current_position=0
-        )
-        db.session.add(existing)
-    
-    db.session.commit()
+    existing = _assign(user_id, split_id)
+    db.session.flush()
     return jsonify({
         'assignment_id': existing.id,
         'current_position': existing.current_position
@@ -127,6 +154,7 @@ def assign_split():
 
 @splits_bp.route('/copy/<int:split_id>', methods=['POST'])
 @jwt_required()
+@unit_of_work
 def copy_template_split(split_id):
     """Copy a template split to user's own splits"""
     user_id = int(get_jwt_identity())
@@ -140,7 +168,8 @@ def copy_template_split(split_id):
     new_split = Split(
         owner_id=user_id,
         name=template.name,
-        is_template=False
+        is_template=False,
+        day_count=len(template.days)
     )
     db.session.add(new_split)
     db.session.flush()
@@ -151,24 +180,14 @@ def copy_template_split(split_id):
             split_id=new_split.id,
             position=day.position,
             name=day.name,
-            muscle_groups=day.muscle_groups
+            muscle_mask=day.muscle_mask,
+            muscle_groups_extra=day.muscle_groups_extra
         )
         db.session.add(new_day)
+    record_change(user_id, 'split', new_split.id)
     
     # Auto-assign to user
-    assignment = UserSplitAssignment.query.filter_by(user_id=user_id).first()
-    if assignment:
-        assignment.split_id = new_split.id
-        assignment.current_position = 0
-    else:
-        assignment = UserSplitAssignment(
-            user_id=user_id,
-            split_id=new_split.id,
-            current_position=0
-        )
-        db.session.add(assignment)
-    
-    db.session.commit()
+    _assign(user_id, new_split.id)
     
     return jsonify({
         'id': new_split.id,
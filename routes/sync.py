@@ -0,0 +1,67 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import Split, WorkoutSession
+from sqlalchemy.orm import joinedload, selectinload
+from routes.progress import workouts_payload
+from routes.splits import splits_payload
+from utils.changes import DELETE, changes_since, current_seq
+from utils.transaction import read_only
+from utils.ratelimit import rate_limited
+from utils.coalesce import coalesced
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+
+@sync_bp.route('', methods=['GET'])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only
+def sync():
+    """Workout history changes since the client's last sync
+
+    ?since=<token> returns the completed workouts added or changed since the
+    token was handed out (in the /progress/workout-history shape), the ids
+    of workouts that are gone, and the user's changed splits. Without a
+    token, with one this server never issued, or with one older than the
+    pruned part of the change log, it returns everything with "full": true,
+    and the client replaces its copy.
+
+    Reads the primary: a lagging replica would hand out an older token than
+    the client already has, and answer it with a needless full resync.
+    """
+    user_id = int(get_jwt_identity())
+    since = request.args.get('since')
+    if since is not None and not since.isdigit():
+        return jsonify({'message': 'since must be a token returned by this endpoint'}), 400
+
+    # Read before the changes: anything committed meanwhile is sent again next time, never skipped
+    token, floor = current_seq(user_id)
+    full = since is None or not floor <= int(since) <= token
+
+    sessions = WorkoutSession.query.options(joinedload(WorkoutSession.split_day)).filter_by(
+        user_id=user_id,
+        completed=True
+    ).order_by(WorkoutSession.ended_at.desc())
+    splits = Split.query.options(selectinload(Split.days)).filter_by(owner_id=user_id, is_template=False)
+    session_changes = {}
+    if not full:
+        changes = changes_since(user_id, int(since))
+        session_changes = changes.get('session', {})
+        sessions = sessions.filter(WorkoutSession.id.in_(
+            [session_id for session_id, op in session_changes.items() if op != DELETE]
+        ))
+        splits = splits.filter(Split.id.in_(list(changes.get('split', {}))))
+    sessions = sessions.all()
+
+    # Cancelled sessions, and changed ones that aren't completed workouts; clients drop them if they have them
+    found = {session.id for session in sessions}
+    deleted = sorted(session_id for session_id in session_changes if session_id not in found)
+
+    return jsonify({
+        'token': str(token),
+        'full': full,
+        'workouts': workouts_payload(user_id, sessions),
+        'deleted': deleted,
+        'splits': splits_payload(splits.all(), [])
+    }), 200
@@ -1,44 +1,32 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, UserSplitAssignment, WorkoutSession, WorkoutSet, SplitDay
-from datetime import datetime, date
+import json
+import time
+
+from flask import Blueprint, Response, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from models import db, Exercise, WorkoutSession, WorkoutSet
+from sqlalchemy.sql import func
+from datetime import datetime
+from utils.post_workout import workout_finished
+from utils.records import beaten_records
+from utils.muscles import week_start
+from utils.suggestions import suggestions_for_day, SUGGESTION_LIMIT
+from utils.context import user_context
+from utils.workout_manager import WorkoutManager
+from utils.transaction import unit_of_work, read_only
+from utils.ratelimit import rate_limited, retry_later
+from utils.coalesce import coalesced
+from utils.archive import archived_sets
+from utils.live import issue_stream_ticket, publish, read_stream_ticket, subscribe, unsubscribe
+from utils.revocation import is_revoked
+from utils.changes import DELETE, record_change
 
 today_bp = Blueprint("today", __name__, url_prefix='/api/today')
 
 
-@today_bp.route("", methods=["GET"])
-@jwt_required()
-def get_today():
-    """Step 3: Today screen - Shows today's workout"""
-    user_id = int(get_jwt_identity())
-    
-    assignment = UserSplitAssignment.query.filter_by(user_id=user_id).first()
-    if not assignment:
-        return jsonify({"message": "No split assigned. Create a split first."}), 404
-    
+def today_payload(assignment, current_day, active_session):
+    """Body of GET /api/today, shared with the bootstrap endpoint"""
     split = assignment.split
-    if not split.days:
-        return jsonify({"message": "Split has no days configured"}), 400
-    
-    # Get current day based on position
-    current_day = None
-    for day in split.days:
-        if day.position == assignment.current_position:
-            current_day = day
-            break
-    
-    if not current_day:
-        current_day = split.days[0]
-        assignment.current_position = 0
-        db.session.commit()
-    
-    # Check if there's an active session
-    active_session = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=False
-    ).first()
-    
-    return jsonify({
+    return {
         "today": {
             "day_name": current_day.name,
             "muscle_groups": current_day.muscle_groups,
@@ -63,24 +51,71 @@ def get_today():
                 } for day in sorted(split.days, key=lambda d: d.position)]
             }
         }
+    }
+
+
+@today_bp.route("", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only
+def get_today():
+    """Step 3: Today screen - Shows today's workout"""
+    ctx = user_context()
+    
+    assignment = ctx.assignment
+    if not assignment:
+        return jsonify({"message": "No split assigned. Create a split first."}), 404
+    
+    split = assignment.split
+    if not split.days:
+        return jsonify({"message": "Split has no days configured"}), 400
+    
+    # Get current day based on position (an out-of-range position falls back to the first day)
+    return jsonify(today_payload(assignment, ctx.current_day, ctx.active_session)), 200
+
+
+@today_bp.route("/suggestions", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only
+def get_suggestions():
+    """Ranked exercises for today's muscles, with last used weight and reps"""
+    ctx = user_context()
+    
+    if not ctx.assignment:
+        return jsonify({"message": "No split assigned. Create a split first."}), 404
+    
+    current_day = ctx.current_day
+    if not current_day:
+        return jsonify({"message": "Split has no days configured"}), 400
+    
+    limit = min(max(request.args.get('limit', SUGGESTION_LIMIT, type=int), 1), 50)
+    
+    return jsonify({
+        "today": {
+            "day_name": current_day.name,
+            "muscle_groups": current_day.muscle_groups,
+            "split_day_id": current_day.id
+        },
+        "suggestions": suggestions_for_day(ctx.user_id, current_day, limit)
     }), 200
 
 
 @today_bp.route("/start", methods=["POST"])
 @jwt_required()
+@unit_of_work
 def start_workout():
     """Step 3: Start Workout"""
-    user_id = int(get_jwt_identity())
+    ctx = user_context()
     
-    assignment = UserSplitAssignment.query.filter_by(user_id=user_id).first()
+    assignment = ctx.assignment
     if not assignment:
         return jsonify({"message": "No split assigned"}), 404
     
     # Check if already has active session
-    active_session = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=False
-    ).first()
+    active_session = ctx.active_session
     
     if active_session:
         return jsonify({
@@ -89,26 +124,25 @@ def start_workout():
         }), 200
     
     # Get current day
-    split = assignment.split
-    current_day = None
-    for day in split.days:
-        if day.position == assignment.current_position:
-            current_day = day
-            break
+    current_day = ctx.current_day
     
     if not current_day:
         return jsonify({"message": "Invalid split configuration"}), 400
     
     # Create new session
     session = WorkoutSession(
-        user_id=user_id,
+        user_id=ctx.user_id,
         assignment_id=assignment.id,
         split_day_id=current_day.id,
         started_at=datetime.utcnow(),
         completed=False
     )
     db.session.add(session)
-    db.session.commit()
+    db.session.flush()
+    
+    # A concurrent start bumps the assignment's version first and makes this one fail with 409
+    assignment.active_session_id = session.id
+    ctx.set_active_session(session)
     
     return jsonify({
         "message": "Workout started",
@@ -119,6 +153,7 @@ def start_workout():
 
 @today_bp.route("/add-set", methods=["POST"])
 @jwt_required()
+@unit_of_work
 def add_set():
     """Step 4: During workout - Add sets"""
     user_id = int(get_jwt_identity())
@@ -133,72 +168,91 @@ def add_set():
         return jsonify({"message": "exercise_id (or exercise_name), reps, and weight required"}), 400
     
     # Get active session
-    session = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=False
-    ).first()
+    session = user_context().active_session
     
     if not session:
         return jsonify({"message": "No active workout session. Start a workout first."}), 404
     
     # If exercise_id provided, get the exercise name from database
+    muscle_group = None
     if exercise_id:
-        from models import Exercise
-        exercise = Exercise.query.get(exercise_id)
+        exercise = db.session.get(Exercise, exercise_id)
         if not exercise:
             return jsonify({"message": "Exercise not found"}), 404
         exercise_name = exercise.name
+        muscle_group = exercise.muscle_group
     
-    # Count existing sets for this exercise in this session
+    # Count existing sets (and their volume) for this exercise in this session
+    existing = db.session.query(
+        func.count(WorkoutSet.id),
+        func.coalesce(func.sum(WorkoutSet.reps * WorkoutSet.weight), 0)
+    ).filter(WorkoutSet.session_id == session.id)
     if exercise_id:
-        set_count = WorkoutSet.query.filter_by(
-            session_id=session.id,
-            exercise_id=exercise_id
-        ).count()
+        existing = existing.filter(WorkoutSet.exercise_id == exercise_id)
     else:
-        set_count = WorkoutSet.query.filter_by(
-            session_id=session.id,
-            exercise_name=exercise_name
-        ).count()
+        existing = existing.filter(WorkoutSet.exercise_name == exercise_name)
+    set_count, exercise_volume = existing.one()
     
+    now = datetime.utcnow()
     workout_set = WorkoutSet(
         session_id=session.id,
         exercise_id=exercise_id,
         exercise_name=exercise_name,
         set_number=set_count + 1,
         reps=int(reps),
-        weight=float(weight)
+        weight=float(weight),
+        timestamp=now,
+        user_id=user_id,
+        muscle_group=muscle_group,
+        week=week_start(now.date())
     )
     db.session.add(workout_set)
-    db.session.commit()
+    
+    # Keep the session's aggregates current; SQL expressions so concurrent sets don't overwrite each other
+    session.total_sets = WorkoutSession.total_sets + 1
+    session.total_volume = WorkoutSession.total_volume + workout_set.reps * workout_set.weight
+    if set_count == 0:
+        session.exercise_count = WorkoutSession.exercise_count + 1
+    
+    # Records only change when the workout is finished; this lets the client flag a PR live
+    new_records = beaten_records(
+        user_id, workout_set, exercise_volume + workout_set.reps * workout_set.weight
+    )
+    db.session.flush()
+    
+    set_payload = {
+        "id": workout_set.id,
+        "exercise_id": workout_set.exercise_id,
+        "exercise_name": workout_set.exercise_name,
+        "set_number": workout_set.set_number,
+        "reps": workout_set.reps,
+        "weight": workout_set.weight
+    }
+    publish(user_id, "set_added", {"session_id": session.id, "set": set_payload})
+    record_change(user_id, 'session', session.id)
     
     return jsonify({
         "message": "Set added",
-        "set": {
-            "id": workout_set.id,
-            "exercise_id": workout_set.exercise_id,
-            "exercise_name": workout_set.exercise_name,
-            "set_number": workout_set.set_number,
-            "reps": workout_set.reps,
-            "weight": workout_set.weight
-        }
+        "set": set_payload,
+        "personal_records": new_records
     }), 201
 
 
 @today_bp.route("/delete-set/<int:set_id>", methods=["DELETE"])
 @jwt_required()
+@unit_of_work
 def delete_set(set_id):
     """Delete a workout set"""
     user_id = int(get_jwt_identity())
     
     # Get the set
-    workout_set = WorkoutSet.query.get(set_id)
+    workout_set = WorkoutSet.query.filter_by(id=set_id).first()
     
     if not workout_set:
         return jsonify({"message": "Set not found"}), 404
     
     # Get the session to verify ownership
-    session = WorkoutSession.query.get(workout_set.session_id)
+    session = db.session.get(WorkoutSession, workout_set.session_id)
     
     if not session or session.user_id != user_id:
         return jsonify({"message": "Unauthorized"}), 403
@@ -210,10 +264,12 @@ def delete_set(set_id):
     exercise_id = workout_set.exercise_id
     exercise_name = workout_set.exercise_name
     deleted_set_number = workout_set.set_number
+    deleted_reps, deleted_weight = workout_set.reps, workout_set.weight
     
     # Delete the set
     db.session.delete(workout_set)
-    db.session.commit()
+    session.total_sets = WorkoutSession.total_sets - 1
+    session.total_volume = WorkoutSession.total_volume - workout_set.reps * workout_set.weight
     
     # Renumber remaining sets for this exercise
     if exercise_id:
@@ -230,47 +286,61 @@ def delete_set(set_id):
     for workout_set in remaining_sets:
         workout_set.set_number -= 1
     
-    db.session.commit()
+    # Set numbers are contiguous, so deleting set 1 with nothing after it removes the exercise
+    if deleted_set_number == 1 and not remaining_sets:
+        session.exercise_count = WorkoutSession.exercise_count - 1
+    
+    # Enough for clients to drop the set and renumber the ones after it
+    publish(user_id, "set_deleted", {
+        "session_id": session.id,
+        "set_id": set_id,
+        "exercise_id": exercise_id,
+        "exercise_name": exercise_name,
+        "set_number": deleted_set_number,
+        "reps": deleted_reps,
+        "weight": deleted_weight
+    })
+    record_change(user_id, 'session', session.id)
     
     return jsonify({"message": "Set deleted successfully"}), 200
 
 
 @today_bp.route("/finish", methods=["POST"])
 @jwt_required()
+@unit_of_work
 def finish_workout():
     """Step 5: Finish workout - Mark as completed and move to next day"""
-    user_id = int(get_jwt_identity())
+    ctx = user_context()
     
     # Get active session
-    session = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=False
-    ).first()
+    session = ctx.active_session
     
     if not session:
         return jsonify({"message": "No active workout session"}), 404
     
-    # Mark session as completed
-    session.completed = True
-    session.ended_at = datetime.utcnow()
-    
-    # Update assignment
-    assignment = session.assignment
-    assignment.last_completed_at = date.today()
-    
-    # Move to next day
-    split = assignment.split
-    total_days = len(split.days)
-    assignment.current_position = (assignment.current_position + 1) % total_days
-    
-    db.session.commit()
-    
-    # Get next day info
-    next_day = None
-    for day in split.days:
-        if day.position == assignment.current_position:
-            next_day = day
-            break
+    # Mark session as completed. The completed == False guard lets only one
+    # of several concurrent finishes (double tap, offline replay) through.
+    now = datetime.utcnow()
+    finished = db.session.execute(
+        db.update(WorkoutSession)
+        .where(WorkoutSession.id == session.id, WorkoutSession.completed == False)
+        .values(completed=True, ended_at=now, duration_seconds=int((now - session.started_at).total_seconds()))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not finished:
+        ctx.set_active_session(None)
+        return jsonify({"message": "Workout already finished"}), 409
+    
+    # Move to next day in one UPDATE on the assignment (loaded with its split by the context)
+    split = ctx.assignment.split
+    position = WorkoutManager.advance_position(ctx.assignment, end_session=True)
+    next_day = next((day for day in split.days if day.position == position), None)
+    
+    # Records, suggestions, snapshots and cache warming run in the background
+    workout_finished.enqueue(session_id=session.id)
+    publish(ctx.user_id, "session_finished", {"session_id": session.id})
+    record_change(ctx.user_id, 'session', session.id)
+    ctx.set_active_session(None)
     
     return jsonify({
         "message": "Workout completed!",
@@ -283,37 +353,58 @@ def finish_workout():
 
 @today_bp.route("/cancel", methods=["POST"])
 @jwt_required()
+@unit_of_work
 def cancel_workout():
     """Cancel active workout - Delete session and all sets without moving to next day"""
-    user_id = int(get_jwt_identity())
+    ctx = user_context()
     
     # Get active session
-    session = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=False
-    ).first()
+    session = ctx.active_session
     
     if not session:
         return jsonify({"message": "No active workout session"}), 404
     
     # Delete the session (cascade will delete all sets)
+    ctx.assignment.active_session_id = None
+    publish(ctx.user_id, "session_cancelled", {"session_id": session.id})
+    record_change(ctx.user_id, 'session', session.id, DELETE)
     db.session.delete(session)
-    db.session.commit()
+    ctx.set_active_session(None)
     
     return jsonify({
         "message": "Workout cancelled successfully"
     }), 200
 
 
+def _exercise_history_entry(session, sets):
+    return {
+        "date": session.ended_at.strftime("%b %d, %Y") if session.ended_at else "Unknown",
+        "timestamp": session.ended_at.isoformat() if session.ended_at else None,
+        "total_sets": len(sets),
+        "sets": [
+            {
+                "set_number": s.set_number,
+                "reps": s.reps,
+                "weight": s.weight,
+                "volume": s.reps * s.weight
+            } for s in sets
+        ],
+        "total_volume": sum(s.reps * s.weight for s in sets),
+        "max_weight": max(s.weight for s in sets)
+    }
+
+
 @today_bp.route("/exercise-history/<int:exercise_id>", methods=["GET"])
 @jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only(replica=True)
 def get_exercise_history(exercise_id):
     """Get past performance data for a specific exercise"""
     user_id = int(get_jwt_identity())
     
     # Get exercise details
-    from models import Exercise
-    exercise = Exercise.query.get(exercise_id)
+    exercise = db.session.get(Exercise, exercise_id)
     if not exercise:
         return jsonify({"message": "Exercise not found"}), 404
     
@@ -341,21 +432,26 @@ def get_exercise_history(exercise_id):
         ).order_by(WorkoutSet.set_number).all()
         
         if sets:
-            history.append({
-                "date": session.ended_at.strftime("%b %d, %Y") if session.ended_at else "Unknown",
-                "timestamp": session.ended_at.isoformat() if session.ended_at else None,
-                "total_sets": len(sets),
-                "sets": [
-                    {
-                        "set_number": s.set_number,
-                        "reps": s.reps,
-                        "weight": s.weight,
-                        "volume": s.reps * s.weight
-                    } for s in sets
-                ],
-                "total_volume": sum(s.reps * s.weight for s in sets),
-                "max_weight": max(s.weight for s in sets)
-            })
+            history.append(_exercise_history_entry(session, sets))
+    
+    # Not enough recent sessions: look back through the archive, newest year first
+    if len(history) < 3:
+        archived_sessions = {}
+        for session in WorkoutSession.query.filter_by(user_id=user_id, archived=True).order_by(
+            WorkoutSession.ended_at.desc()
+        ):
+            archived_sessions.setdefault(session.started_at.year, []).append(session)
+        
+        for year in sorted(archived_sessions, reverse=True):
+            sets_by_session = {}
+            for s in archived_sets(user_id, years=[year]):
+                if s.exercise_id == exercise_id or s.exercise_name.lower() == exercise.name.lower():
+                    sets_by_session.setdefault(s.session_id, []).append(s)
+            for session in archived_sessions[year]:
+                if session.id in sets_by_session and len(history) < 3:
+                    history.append(_exercise_history_entry(session, sets_by_session[session.id]))
+            if len(history) >= 3:
+                break
     
     return jsonify({
         "exercise_id": exercise_id,
@@ -364,21 +460,8 @@ def get_exercise_history(exercise_id):
     }), 200
 
 
-@today_bp.route("/session-summary", methods=["GET"])
-@jwt_required()
-def get_session_summary():
-    """Get summary of current workout session"""
-    user_id = int(get_jwt_identity())
-    
-    # Get active session
-    session = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=False
-    ).first()
-    
-    if not session:
-        return jsonify({"message": "No active workout session"}), 404
-    
+def session_summary_payload(session):
+    """Body of GET /api/today/session-summary, shared with the bootstrap endpoint"""
     # Get all sets in this session
     sets = WorkoutSet.query.filter_by(session_id=session.id).all()
     
@@ -390,6 +473,7 @@ def get_session_summary():
         
         if exercise_key not in exercises_summary:
             exercises_summary[exercise_key] = {
+                'exercise_id': workout_set.exercise_id,
                 'name': exercise_name,
                 'sets': [],
                 'total_sets': 0,
@@ -398,6 +482,7 @@ def get_session_summary():
             }
         
         exercises_summary[exercise_key]['sets'].append({
+            'id': workout_set.id,
             'set_number': workout_set.set_number,
             'reps': workout_set.reps,
             'weight': workout_set.weight
@@ -409,32 +494,46 @@ def get_session_summary():
             workout_set.weight
         )
     
-    # Calculate totals
-    total_sets = len(sets)
-    total_volume = sum(s.reps * s.weight for s in sets)
-    total_exercises = len(exercises_summary)
-    
     # Calculate duration
     duration_minutes = 0
     if session.started_at:
         duration = datetime.utcnow() - session.started_at
         duration_minutes = int(duration.total_seconds() / 60)
     
-    return jsonify({
+    return {
         "session_id": session.id,
         "started_at": session.started_at.isoformat() if session.started_at else None,
         "duration_minutes": duration_minutes,
         "exercises": list(exercises_summary.values()),
         "totals": {
-            "exercises": total_exercises,
-            "sets": total_sets,
-            "volume": total_volume
+            "exercises": session.exercise_count,
+            "sets": session.total_sets,
+            "volume": session.total_volume
         }
-    }), 200
+    }
+
+
+@today_bp.route("/session-summary", methods=["GET"])
+@jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only
+def get_session_summary():
+    """Get summary of current workout session"""
+    # Get active session
+    session = user_context().active_session
+    
+    if not session:
+        return jsonify({"message": "No active workout session"}), 404
+    
+    return jsonify(session_summary_payload(session)), 200
 
 
 @today_bp.route("/last-workout", methods=["GET"])
 @jwt_required()
+@rate_limited('reads')
+@coalesced
+@read_only
 def get_last_workout():
     """Get details of the last completed workout"""
     user_id = int(get_jwt_identity())
@@ -449,7 +548,10 @@ def get_last_workout():
         return jsonify({"message": "No completed workouts found"}), 404
     
     # Get all sets in this session
-    sets = WorkoutSet.query.filter_by(session_id=last_session.id).all()
+    if last_session.archived:
+        sets = archived_sets(user_id, session_ids=[last_session.id], years=[last_session.started_at.year])
+    else:
+        sets = WorkoutSet.query.filter_by(session_id=last_session.id).all()
     
     # Group sets by exercise
     exercises_summary = {}
@@ -459,6 +561,7 @@ def get_last_workout():
         
         if exercise_key not in exercises_summary:
             exercises_summary[exercise_key] = {
+                'exercise_id': workout_set.exercise_id,
                 'name': exercise_name,
                 'sets': [],
                 'total_sets': 0,
@@ -467,6 +570,7 @@ def get_last_workout():
             }
         
         exercises_summary[exercise_key]['sets'].append({
+            'id': workout_set.id,
             'set_number': workout_set.set_number,
             'reps': workout_set.reps,
             'weight': workout_set.weight
@@ -478,16 +582,7 @@ def get_last_workout():
             workout_set.weight
         )
     
-    # Calculate totals
-    total_sets = len(sets)
-    total_volume = sum(s.reps * s.weight for s in sets)
-    total_exercises = len(exercises_summary)
-    
-    # Calculate duration
-    duration_minutes = 0
-    if last_session.started_at and last_session.ended_at:
-        duration = last_session.ended_at - last_session.started_at
-        duration_minutes = int(duration.total_seconds() / 60)
+    duration_minutes = (last_session.duration_seconds or 0) // 60
     
     # Get split day name
     split_day_name = "Unknown"
@@ -503,8 +598,64 @@ def get_last_workout():
         "duration_minutes": duration_minutes,
         "exercises": list(exercises_summary.values()),
         "totals": {
-            "exercises": total_exercises,
-            "sets": total_sets,
-            "volume": total_volume
+            "exercises": last_session.exercise_count,
+            "sets": last_session.total_sets,
+            "volume": last_session.total_volume
         }
     }), 200
+
+
+STREAM_KEEPALIVE = 15  # seconds between comments that keep proxies from closing an idle stream
+
+
+@today_bp.route("/stream-ticket", methods=["POST"])
+@jwt_required()
+@rate_limited('reads')
+def stream_ticket():
+    """A short-lived ticket for opening GET /stream, which can't take the access token in a header"""
+    return jsonify({"ticket": issue_stream_ticket(get_jwt())}), 200
+
+
+@today_bp.route("/stream", methods=["GET"])
+def stream_session():
+    """Server-Sent Events: set_added, set_deleted, session_finished and session_cancelled as they commit.
+
+    Opened with ?ticket= from POST /stream-ticket (see utils/live.py). The
+    stream ends when the access token the ticket was issued for expires or
+    is revoked; the client reconnects with a new ticket. Each open stream
+    holds a worker thread, so streams are capped per user and per process.
+    """
+    claims = read_stream_ticket(request.args.get("ticket", ""))
+    if claims is None or is_revoked(None, claims):
+        return jsonify({"msg": "Invalid or expired stream ticket"}), 401
+    subscription = subscribe(int(claims["sub"]))
+    if subscription is None:
+        return retry_later("Too many open streams", 429, STREAM_KEEPALIVE)
+    expires_at = claims["exp"]
+    app = current_app._get_current_object()
+
+    def events():
+        # No session queries in here: the stream must not hold a pooled connection
+        try:
+            yield "retry: 3000\n\n"
+            while time.time() < expires_at:
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                message = subscription.get(timeout=min(STREAM_KEEPALIVE, max(expires_at - time.time(), 0)))
+                if message is None:
+                    # Signed out meanwhile; usually an in-memory Bloom filter check, see utils/revocation.py
+                    with app.app_context():
+                        if is_revoked(None, claims):
+                            break
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+            yield "event: expired\ndata: {}\n\n"
+        finally:
+            unsubscribe(subscription)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # let nginx-style proxies pass events through unbuffered
+    })
@@ -1,53 +1,11 @@
 """Seed default exercises into the database"""
 from app import create_app
 from models import db, Exercise
+from utils.cache import invalidate_catalog
+from utils.muscles import DEFAULT_EXERCISES
 
 app = create_app()
 
-# Default exercises organized by muscle group and specific muscle
-DEFAULT_EXERCISES = {
-    'chest': {
-        'upper_chest': ['Incline Barbell Press', 'Incline Dumbbell Press', 'Cable Fly'],
-        'middle_chest': ['Flat Barbell Bench Press', 'Flat Dumbbell Press', 'Pec-Dec Fly', 'Push-ups'],
-        'lower_chest': ['Decline Barbell Press', 'Decline Dumbbell Press', 'Dips']
-    },
-    'back': {
-        'lats': ['Pull-ups', 'Lat Pulldown', 'Dumbbell Row', 'One Arm Half-Kneeling Lat'],
-        'upper_back': ['Face Pulls', 'Reverse Fly', 'Seated Cable Row'],
-        'lower_back': ['Deadlift', 'Romanian Deadlift', 'Back Extensions', 'Good Mornings'],
-        'traps': ['Barbell Shrugs', 'Dumbbell Shrugs', 'Farmer Walks', 'Rack Pulls'],
-        'rhomboids': ['Bent Over Row', 'T-Bar Row', 'Chest Supported Row', 'Inverted Row']
-    },
-    'shoulders': {
-        'front_delt': ['Overhead Press', 'Front Raise', 'Arnold Press'],
-        'side_delt': ['Lateral Raise', 'Dumbbell Lateral Raise', 'Cable Lateral Raise', 'Upright Row'],
-        'rear_delt': ['Reverse Fly', 'Face Pulls', 'Bent Over Lateral Raise', 'Rear Delt Row']
-    },
-    'biceps': {
-        'short_head': ['Preacher Curl', 'Spider Curl', 'Concentration Curl'],
-        'long_head': ['Incline Dumbbell Curl', 'Drag Curl', 'Bayesian Curl'],
-        'brachialis': ['Hammer Curl', 'Reverse Curl', 'Cross Body Hammer Curl']
-    },
-    'triceps': {
-        'long_head': ['Overhead Extension', 'Skull Crushers', 'French Press'],
-        'lateral_head': ['Tricep Pushdown', 'Close Grip Bench Press', 'Diamond Push-ups'],
-        'medial_head': ['Reverse Grip Pushdown', 'Tricep Dips', 'Kickbacks']
-    },
-    'forearms': {
-        'forearms': ['Wrist Curl', 'Reverse Wrist Curl', 'Farmers Walk', 'Wrist Roller', 'Reverse Barbell Curl']
-    },
-    'legs': {
-        'quads': ['Squat', 'Smith Machine Squat', 'Leg Press', 'Leg Extension', 'Lunges'],
-        'hamstrings': ['Romanian Deadlift', 'Leg Curl', 'Good Mornings', 'Nordic Curls'],
-        'glutes': ['Hip Thrust', 'Bulgarian Split Squat', 'Glute Bridge', 'Cable Kickbacks'],
-        'calves': ['Standing Calf Raise', 'Seated Calf Raise', 'Calf Press']
-    },
-    'core': {
-        'abs': ['Crunches', 'Leg Raise', 'Cable Crunch', 'Ab Wheel', 'Plank'],
-        'obliques': ['Russian Twist', 'Side Plank', 'Woodchoppers', 'Bicycle Crunches']
-    }
-}
-
 def seed_exercises():
     with app.app_context():
         # Check if exercises already exist
@@ -73,6 +31,7 @@ def seed_exercises():
                     count += 1
         
         db.session.commit()
+        invalidate_catalog()
         print(f"✅ Successfully seeded {count} default exercises!")
 
 if __name__ == '__main__':
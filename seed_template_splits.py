@@ -85,7 +85,8 @@ def seed_templates():
             split = Split(
                 owner_id=None,  # No owner for templates
                 name=template_data['name'],
-                is_template=True
+                is_template=True,
+                day_count=len(template_data['days'])
             )
             db.session.add(split)
             db.session.flush()
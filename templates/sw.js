@@ -0,0 +1,105 @@
+// Service worker, served from /sw.js so it controls the whole site.
+//
+// Page shells and the CDN scripts are precached on install and served
+// stale-while-revalidate: from the cache at once, refreshed in the
+// background for the next visit. The API reads below are handled the same
+// way per user, revalidated with If-None-Match so an unchanged response
+// costs a bodiless 304. Any successful API write drops the cached reads.
+
+const VERSION = {{ version|tojson }};
+const SHELL_CACHE = `shells-${VERSION}`;
+const API_CACHE = `api-${VERSION}`;
+const SHELLS = {{ shells|tojson }};
+const ASSETS = {{ assets|tojson }}.map(url => new URL(url).href);  // as request.url spells them
+const API_READS = ['/api/splits', '/api/exercises/', '/api/progress/'];
+const NOT_CACHED = ['/api/progress/export'];
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(SHELL_CACHE);
+        await cache.addAll(SHELLS);
+        // Cross-origin scripts come back opaque, which addAll refuses; they are optional anyway
+        await Promise.all(ASSETS.map(url =>
+            fetch(url, { mode: 'no-cors' }).then(response => cache.put(url, response)).catch(() => {})
+        ));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        // Caches of earlier deploys
+        const names = await caches.keys();
+        await Promise.all(names.filter(name => name !== SHELL_CACHE && name !== API_CACHE).map(name => caches.delete(name)));
+        await self.clients.claim();
+    })());
+});
+
+function userOf(request) {
+    try {
+        const token = (request.headers.get('Authorization') || '').replace('Bearer ', '');
+        return JSON.parse(atob(token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/'))).sub;
+    } catch (error) {
+        return null;
+    }
+}
+
+function isApiRead(url) {
+    return API_READS.some(prefix => url.pathname.startsWith(prefix))
+        && !NOT_CACHED.some(prefix => url.pathname.startsWith(prefix));
+}
+
+// Answer from `cacheName` if possible while `revalidate` refreshes the entry for next time
+async function staleWhileRevalidate(event, cacheName, key, revalidate) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(key);
+    const fresh = revalidate(cached).then(async response => {
+        if (response.status === 304 && cached) return cached;
+        if (response.ok) await cache.put(key, response.clone());
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(fresh.catch(() => {}));
+        return cached;
+    }
+    return fresh;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (url.origin !== self.location.origin) {
+        if (request.method === 'GET' && ASSETS.includes(request.url)) {
+            event.respondWith(staleWhileRevalidate(event, SHELL_CACHE, request.url, () => fetch(request)));
+        }
+        return;
+    }
+
+    if (request.method !== 'GET') {
+        if (url.pathname.startsWith('/api/')) {
+            event.respondWith(fetch(request).then(async response => {
+                if (response.ok) await caches.delete(API_CACHE);
+                return response;
+            }));
+        }
+        return;
+    }
+
+    if (request.mode === 'navigate' && SHELLS.includes(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, SHELL_CACHE, url.pathname, () => fetch(request)));
+        return;
+    }
+
+    const user = userOf(request);
+    if (user && isApiRead(url)) {
+        // Keyed by user as well, so a shared browser never shows one account's data to another
+        const key = `${url.pathname}${url.search}${url.search ? '&' : '?'}sw-user=${encodeURIComponent(user)}`;
+        event.respondWith(staleWhileRevalidate(event, API_CACHE, key, cached => {
+            const headers = new Headers(request.headers);
+            const etag = cached && cached.headers.get('ETag');
+            if (etag) headers.set('If-None-Match', etag);
+            return fetch(request.url, { headers, credentials: request.credentials });
+        }));
+    }
+});
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Read by create_app (also when app.py is imported), so set before anything imports it
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'trackify-tests.db'))
+os.environ['JOB_WORKERS'] = '0'  # jobs only run when a test calls run_pending()
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+os.environ['LOGIN_ATTEMPTS_PER_MINUTE'] = '10000'
+os.environ['READ_RATE_BURST'] = '10000'
+os.environ['READ_RATE_PER_SECOND'] = '10000'
+
+from app import create_app  # noqa: E402
+from models import db, Exercise  # noqa: E402
+from utils.muscles import DEFAULT_EXERCISES  # noqa: E402
+from utils.jobs import job_runner  # noqa: E402
+import utils.cache  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    app = create_app()
+    app.config['TESTING'] = True
+    # Cached payloads are keyed by user id, which the next test's database reuses
+    utils.cache._cache = None
+    with app.app_context():
+        db.create_all()
+        for muscle_group, specifics in DEFAULT_EXERCISES.items():
+            for specific_muscle, names in specifics.items():
+                for name in names:
+                    db.session.add(Exercise(
+                        name=name, muscle_group=muscle_group, specific_muscle=specific_muscle, is_default=True
+                    ))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def token(client):
+    """Access token of a user with a three-day split assigned"""
+    client.post('/api/auth/signup', json={'email': 'lifter@example.com', 'password': 'pw', 'name': 'Lifter', 'mobile': '1'})
+    token = client.post('/api/auth/login', json={'email': 'lifter@example.com', 'password': 'pw'}).get_json()['access_token']
+    response = client.post('/api/splits', headers=auth(token), json={'name': 'PPL', 'days': [
+        {'name': 'Push', 'muscle_groups': 'Chest, Shoulders, Triceps'},
+        {'name': 'Pull', 'muscle_groups': 'Back, Biceps'},
+        {'name': 'Legs', 'muscle_groups': 'Legs, Core'},
+    ]})
+    assert response.status_code == 201, response.get_json()
+    return token
+
+
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def workout(client, token, sets):
+    """Start a workout, add (exercise_id, reps, weight) sets, finish it and run its jobs"""
+    assert client.post('/api/today/start', headers=auth(token)).status_code in (200, 201)
+    for exercise_id, reps, weight in sets:
+        response = client.post('/api/today/add-set', headers=auth(token),
+                               json={'exercise_id': exercise_id, 'reps': reps, 'weight': weight})
+        assert response.status_code == 201, response.get_json()
+    assert client.post('/api/today/finish', headers=auth(token)).status_code == 200
+    job_runner.run_pending()
@@ -0,0 +1,73 @@
+"""Concurrent finishes and split advances (see WorkoutManager.advance_position)"""
+import threading
+
+from conftest import auth
+from models import db, UserSplitAssignment, WorkoutSession
+from utils.workout_manager import WorkoutManager
+
+THREADS = 8
+
+
+def _assignment(app):
+    with app.app_context():
+        assignment = UserSplitAssignment.query.one()
+        db.session.expunge(assignment)
+        return assignment
+
+
+def _all_at_once(count, target):
+    """Run `target(index)` in `count` threads released together; returns their results"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        results[index] = target(index)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_finishes_complete_once_and_advance_once(app, client, token):
+    rounds = 4
+    for round_number in range(1, rounds + 1):
+        assert client.post('/api/today/start', headers=auth(token)).status_code == 201
+        client.post('/api/today/add-set', headers=auth(token), json={'exercise_id': 1, 'reps': 5, 'weight': 50})
+        before = _assignment(app)
+
+        codes = _all_at_once(THREADS, lambda _: app.test_client().post(
+            '/api/today/finish', headers=auth(token)
+        ).status_code)
+
+        # One finish wins; the others find no active session or lose the race
+        assert codes.count(200) == 1, codes
+        assert set(codes) <= {200, 404, 409}, codes
+
+        after = _assignment(app)
+        assert after.current_position == (before.current_position + 1) % 3
+        assert after.version == before.version + 1
+        assert after.active_session_id is None
+        with app.app_context():
+            sessions = WorkoutSession.query.all()
+            assert len(sessions) == round_number
+            assert all(session.completed and session.ended_at for session in sessions)
+            assert sum(session.total_sets for session in sessions) == round_number
+
+
+def test_concurrent_advances_each_count_once(app, token):
+    advances = 30
+    before = _assignment(app)
+
+    def advance(_):
+        with app.app_context():
+            WorkoutManager.move_to_next_day(before.user_id)
+
+    _all_at_once(advances, advance)
+
+    after = _assignment(app)
+    assert after.current_position == (before.current_position + advances) % 3
+    assert after.version == before.version + advances
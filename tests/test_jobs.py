@@ -0,0 +1,130 @@
+"""The durable job runner (utils/jobs.py), driven through run_pending()"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Job
+from utils.jobs import job, job_runner
+
+calls = []
+
+
+@job('test_ok')
+def ok_job(value):
+    calls.append(value)
+
+
+@job('test_flaky', max_attempts=3)
+def flaky_job():
+    calls.append('flaky')
+    raise RuntimeError('boom')
+
+
+@job('test_slow')
+def slow_job(seconds):
+    time.sleep(seconds)
+    calls.append('slow')
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def enqueue(app, handler, **payload):
+    with app.app_context():
+        record = handler.enqueue(**payload)
+        db.session.commit()
+        return record.id
+
+
+def job_row(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id)
+
+
+def test_enqueued_job_runs_once(app):
+    job_id = enqueue(app, ok_job, value=42)
+    assert job_runner.run_pending() == 1
+    assert job_runner.run_pending() == 0
+    assert calls == [42]
+    record = job_row(app, job_id)
+    assert (record.status, record.attempts, record.locked_by) == ('done', 1, None)
+
+
+def test_failing_job_backs_off_then_fails(app):
+    job_id = enqueue(app, flaky_job)
+    started = datetime.utcnow()
+    assert job_runner.run_pending() == 1
+
+    record = job_row(app, job_id)
+    assert (record.status, record.attempts) == ('pending', 1)
+    assert 'RuntimeError: boom' in record.last_error
+    # JOB_RETRY_BASE (10s) ± jitter before the second attempt
+    assert record.run_at >= started + timedelta(seconds=8)
+    assert job_runner.run_pending() == 0
+
+    for attempt in (2, 3):
+        with app.app_context():
+            db.session.execute(db.update(Job).where(Job.id == job_id).values(run_at=datetime.utcnow()))
+            db.session.commit()
+        assert job_runner.run_pending() == 1
+        assert job_row(app, job_id).attempts == attempt
+
+    record = job_row(app, job_id)
+    assert record.status == 'failed'
+    assert record.finished_at is not None
+    assert calls == ['flaky'] * 3
+    assert job_runner.run_pending() == 0
+
+
+def test_stale_jobs_are_requeued_or_failed(app):
+    ids = [enqueue(app, ok_job, value=1), enqueue(app, flaky_job)]
+    # As left by workers that died mid-run: the first may try again, the second is out of attempts
+    with app.app_context():
+        stale = datetime.utcnow() - timedelta(seconds=app.config['JOB_LOCK_TIMEOUT'] + 1)
+        db.session.execute(db.update(Job).where(Job.id == ids[0]).values(
+            status='running', attempts=1, locked_at=stale, locked_by='dead'))
+        db.session.execute(db.update(Job).where(Job.id == ids[1]).values(
+            status='running', attempts=3, locked_at=stale, locked_by='dead'))
+        db.session.commit()
+
+    assert job_runner.run_pending() == 1
+    assert calls == [1]
+    first, second = job_row(app, ids[0]), job_row(app, ids[1])
+    assert (first.status, first.attempts) == ('done', 2)
+    assert (second.status, second.locked_by) == ('failed', None)
+    assert 'heartbeat' in second.last_error
+
+
+def test_heartbeat_keeps_a_running_job_locked(app):
+    app.config.update(JOB_LOCK_TIMEOUT=0.3, JOB_HEARTBEAT_INTERVAL=0.05)
+    job_id = enqueue(app, slow_job, seconds=1)
+    with app.app_context():
+        claim = job_runner.claim_next()
+    worker = threading.Thread(target=job_runner.run_job, args=claim)
+    worker.start()
+
+    # Well past the lock timeout, but the heartbeat keeps the job with its worker
+    time.sleep(0.6)
+    with app.app_context():
+        assert job_runner.claim_next() is None
+    assert job_row(app, job_id).status == 'running'
+
+    worker.join()
+    assert calls == ['slow']
+    assert job_row(app, job_id).status == 'done'
+
+
+def test_lost_lock_does_not_overwrite_the_new_owner(app):
+    job_id = enqueue(app, ok_job, value=7)
+    with app.app_context():
+        job_id, token = job_runner.claim_next()
+        # Taken back and claimed again while the first worker was still running
+        db.session.execute(db.update(Job).where(Job.id == job_id).values(locked_by='other'))
+        db.session.commit()
+    job_runner.run_job(job_id, token)
+    record = job_row(app, job_id)
+    assert (record.status, record.locked_by) == ('running', 'other')
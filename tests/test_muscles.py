@@ -0,0 +1,17 @@
+"""Split day muscles survive the string <-> bitmask round trip (see utils/muscles.py)"""
+from utils.muscles import MUSCLE_BITS, format_muscles, parse_muscles
+
+
+def test_shared_specific_name_is_qualified_once_per_group():
+    mask, extra = parse_muscles('Long Head')
+    assert format_muscles(mask, extra) == 'Biceps Long Head, Triceps Long Head'
+
+    mask, extra = parse_muscles('Triceps Long Head, Mobility')
+    assert mask == MUSCLE_BITS[('triceps', 'long_head')]
+    assert format_muscles(mask, extra) == 'Triceps Long Head, Mobility'
+
+
+def test_formatted_muscles_parse_back_to_the_same_mask():
+    for mask in [0, *MUSCLE_BITS.values(), sum(MUSCLE_BITS.values()),
+                 MUSCLE_BITS[('biceps', 'long_head')] | MUSCLE_BITS[('biceps', 'short_head')]]:
+        assert parse_muscles(format_muscles(mask)) == (mask, None)
@@ -0,0 +1,112 @@
+"""Statements and commits per request, counted at the engine (see utils/transaction.py)"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from conftest import auth, workout
+from models import db
+import utils.cache
+
+READS = [
+    '/api/today',
+    '/api/today/session-summary',
+    '/api/today/last-workout',
+    '/api/today/suggestions',
+    '/api/splits',
+    '/api/progress/stats',
+    '/api/progress/best-lifts',
+    '/api/progress/workout-history',
+    '/api/bootstrap?include=today,session,splits,stats,suggestions',
+]
+
+
+@contextmanager
+def counting(app):
+    counts = {'statements': [], 'commits': 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counts['statements'].append(statement.lstrip().split(None, 1)[0].upper())
+
+    def commit(conn):
+        counts['commits'] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'commit', commit)
+    try:
+        yield counts
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        event.remove(engine, 'commit', commit)
+
+
+def measure(app, client, token, method, url, **kwargs):
+    utils.cache._cache = None  # count the work, not a cache hit
+    with counting(app) as counts:
+        response = getattr(client, method)(url, headers=auth(token), **kwargs)
+    assert response.status_code < 400, (url, response.get_json())
+    return response, counts
+
+
+@pytest.fixture
+def history(client, token):
+    workout(client, token, [(1, 5, 50), (1, 5, 55), (2, 8, 20)])
+    # Revocation sync and other first-request work out of the way
+    client.get('/api/today', headers=auth(token))
+
+
+def _measure_reads(app, client, token):
+    """Statement counts of READS, taken during a workout in progress"""
+    client.post('/api/today/start', headers=auth(token))
+    for exercise_id in (1, 2):
+        client.post('/api/today/add-set', headers=auth(token), json={'exercise_id': exercise_id, 'reps': 5, 'weight': 50})
+    counts = {url: measure(app, client, token, 'get', url)[1] for url in READS}
+    client.post('/api/today/cancel', headers=auth(token))
+    return counts
+
+
+def test_reads_run_a_constant_number_of_statements_and_never_write(app, client, token, history):
+    small = _measure_reads(app, client, token)
+    for _ in range(4):
+        workout(client, token, [(1, 5, 60), (2, 8, 25), (3, 10, 10), (3, 10, 10)])
+    large = _measure_reads(app, client, token)
+
+    for url in READS:
+        assert len(large[url]['statements']) == len(small[url]['statements']), (url, small[url], large[url])
+        assert large[url]['commits'] == 0, url
+        assert not {'INSERT', 'UPDATE', 'DELETE'} & set(large[url]['statements']), (url, large[url])
+
+
+def test_writes_commit_once(app, client, token, history):
+    _, counts = measure(app, client, token, 'post', '/api/today/start')
+    assert counts['commits'] == 1
+
+    set_ids = []
+    for exercise_id in (1, 1, 2):
+        response, counts = measure(app, client, token, 'post', '/api/today/add-set',
+                                   json={'exercise_id': exercise_id, 'reps': 5, 'weight': 50})
+        assert counts['commits'] == 1
+        set_ids.append(response.get_json()['set']['id'])
+
+    # Delete and renumber in one transaction
+    _, counts = measure(app, client, token, 'delete', f'/api/today/delete-set/{set_ids[0]}')
+    assert counts['commits'] == 1
+
+    _, counts = measure(app, client, token, 'post', '/api/today/finish')
+    assert counts['commits'] == 1
+
+    _, counts = measure(app, client, token, 'post', '/api/splits', json={'name': 'UL', 'days': [
+        {'name': 'Upper', 'muscle_groups': 'Chest, Back'}, {'name': 'Lower', 'muscle_groups': 'Legs'}
+    ]})
+    assert counts['commits'] == 1
+
+
+def test_rejected_write_commits_nothing(app, client, token, history):
+    _, counts = measure(app, client, token, 'post', '/api/today/start')
+    with counting(app) as counts:
+        response = client.post('/api/today/add-set', headers=auth(token),
+                               json={'exercise_id': 999999, 'reps': 5, 'weight': 50})
+    assert response.status_code == 404
+    assert counts['commits'] == 0
@@ -0,0 +1,52 @@
+"""Personal records only count finished workouts (see utils/records.py)"""
+from conftest import auth, workout
+from models import db, Exercise
+
+BENCH = 'Incline Barbell Press'  # exercise 1 in the seeded catalog
+
+
+def best_lifts(client, token):
+    return {
+        lift['exercise']: lift for lift in
+        client.get('/api/progress/best-lifts', headers=auth(token)).get_json()['best_lifts']
+    }
+
+
+def add_set(client, token, exercise_id, reps, weight):
+    response = client.post('/api/today/add-set', headers=auth(token),
+                           json={'exercise_id': exercise_id, 'reps': reps, 'weight': weight})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['personal_records']
+
+
+def test_open_and_cancelled_sessions_do_not_count(client, token):
+    workout(client, token, [(1, 5, 100)])
+    assert best_lifts(client, token)[BENCH]['max_weight'] == 100
+
+    client.post('/api/today/start', headers=auth(token))
+    assert add_set(client, token, 1, 5, 120) == ['weight', 'e1rm', 'volume']
+    # The same weight again beats the earlier set only on volume, which was already flagged
+    assert add_set(client, token, 1, 5, 120) == []
+    assert best_lifts(client, token)[BENCH]['max_weight'] == 100
+
+    client.post('/api/today/cancel', headers=auth(token))
+    assert best_lifts(client, token)[BENCH]['max_weight'] == 100
+
+
+def test_finish_keeps_the_better_values(client, token):
+    workout(client, token, [(1, 5, 100)] * 4)
+    workout(client, token, [(1, 15, 95)])
+    lift = best_lifts(client, token)[BENCH]
+    assert (lift['max_weight'], lift['max_reps']) == (100, 5)
+    assert lift['estimated_1rm'] == 142.5
+    assert lift['best_session_volume'] == 2000
+
+
+def test_records_are_keyed_by_exercise_id(app, client, token):
+    workout(client, token, [(1, 5, 100)])
+    with app.app_context():
+        db.session.get(Exercise, 1).name = 'Incline Press'
+        db.session.commit()
+    workout(client, token, [(1, 5, 110)])
+    assert list(best_lifts(client, token)) == ['Incline Press']
+    assert best_lifts(client, token)['Incline Press']['max_weight'] == 110
@@ -0,0 +1,46 @@
+"""Delta sync tokens and change log pruning (utils/changes.py)"""
+from datetime import datetime, timedelta
+
+from conftest import auth, workout
+from models import db
+from utils.changes import prune_changes
+
+
+def sync(client, token, since=None):
+    query = f'?since={since}' if since is not None else ''
+    response = client.get(f'/api/sync{query}', headers=auth(token))
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_incremental_sync_until_pruned(app, client, token):
+    workout(client, token, [(1, 5, 100)])
+    first = sync(client, token)
+    assert first['full'] and len(first['workouts']) == 1
+
+    workout(client, token, [(1, 5, 110)])
+    delta = sync(client, token, first['token'])
+    assert not delta['full'] and len(delta['workouts']) == 1
+    assert int(delta['token']) > int(first['token'])
+
+    # Nothing is pruned yet that the latest token needs
+    with app.app_context():
+        assert prune_changes(datetime.utcnow() - timedelta(days=1)) == 0
+        db.session.commit()
+    assert not sync(client, token, delta['token'])['full']
+
+    with app.app_context():
+        assert prune_changes(datetime.utcnow() + timedelta(seconds=1)) > 0
+        db.session.commit()
+    # The old token may have missed deletions; the latest one has seen everything that was pruned
+    stale = sync(client, token, first['token'])
+    assert stale['full'] and len(stale['workouts']) == 2
+    current = sync(client, token, delta['token'])
+    assert not current['full'] and current['workouts'] == []
+
+
+def test_unknown_tokens_get_a_full_resync(client, token):
+    workout(client, token, [(1, 5, 100)])
+    latest = int(sync(client, token)['token'])
+    assert sync(client, token, latest + 100)['full']
+    assert client.get('/api/sync?since=abc', headers=auth(token)).status_code == 400
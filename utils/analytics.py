@@ -0,0 +1,241 @@
+"""Vectorized training analytics over a user's completed set history.
+
+The history is loaded once into columnar NumPy arrays and every metric is
+computed from those arrays, instead of one SQL aggregate per chart.
+"""
+from datetime import date
+
+import numpy as np
+from flask import current_app
+
+from models import db, WorkoutSet, WorkoutSession
+from utils.archive import read_archive
+from utils.cache import get_cache
+from utils.snapshots import completed_fingerprint, exercise_catalog, load_snapshot, snapshots_enabled
+
+EPOCH = date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+class SetHistory:
+    """Columnar view of a user's completed sets"""
+
+    def __init__(self, day, exercise, reps, weight, muscle, exercise_names, muscle_names):
+        self.day = day                      # int32 days since 1970-01-01
+        self.exercise = exercise            # int32 index into exercise_names
+        self.reps = reps                    # int32
+        self.weight = weight                # float64
+        self.muscle = muscle                # int32 index into muscle_names, -1 if unknown
+        self.exercise_names = exercise_names
+        self.muscle_names = muscle_names
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def volume(self):
+        return self.reps * self.weight
+
+
+def _factorize(values):
+    uniques, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+def load_history(user_id):
+    """One query, one pass: completed sets as columnar arrays, archived years included"""
+    rows = (
+        db.session.query(
+            WorkoutSet.timestamp, WorkoutSet.exercise_name, WorkoutSet.reps,
+            WorkoutSet.weight, WorkoutSet.muscle_group
+        )
+        .join(WorkoutSession, WorkoutSession.id == WorkoutSet.session_id)
+        .filter(WorkoutSession.user_id == user_id)
+        .filter(WorkoutSession.completed == True)
+        .all()
+    )
+
+    # Archived sets come back as arrays already, so they skip the row loop
+    archived = read_archive(user_id)
+
+    if not rows and archived is None:
+        empty = np.array([], dtype=np.int32)
+        return SetHistory(empty, empty, empty, np.array([], dtype=np.float64), empty, [], [])
+
+    timestamps, names, reps, weights, muscles = zip(*rows) if rows else ((), (), (), (), ())
+    day = np.fromiter((ts.toordinal() for ts in timestamps), dtype=np.int32, count=len(rows)) - EPOCH_ORDINAL
+    reps = np.array(reps, dtype=np.int32)
+    weights = np.array(weights, dtype=np.float64)
+    names, muscles = list(names), list(muscles)
+    if archived is not None:
+        day = np.concatenate([(archived['timestamp'] // 86_400_000_000).astype(np.int32), day])
+        reps = np.concatenate([archived['reps'], reps])
+        weights = np.concatenate([archived['weight'], weights])
+        names = archived['exercise_name'].tolist() + names
+        muscles = archived['muscle_group'].tolist() + muscles
+
+    exercise, exercise_names = _factorize(names)
+    muscle, muscle_names = _factorize([m or '' for m in muscles])
+    if '' in muscle_names:
+        # Legacy name-only sets have no catalog entry and therefore no muscle
+        unknown = muscle_names.index('')
+        muscle_names.pop(unknown)
+        muscle = np.where(muscle == unknown, -1, np.where(muscle > unknown, muscle - 1, muscle)).astype(np.int32)
+
+    return SetHistory(day, exercise, reps, weights, muscle, exercise_names, muscle_names)
+
+
+def snapshot_history(user_id, fingerprint):
+    """Same as load_history, read from the user's memory-mapped snapshot (see utils.snapshots)"""
+    records, meta = load_snapshot(user_id, fingerprint)
+    if not len(records):
+        empty = np.array([], dtype=np.int32)
+        return SetHistory(empty, empty, empty, np.array([], dtype=np.float64), empty, [], [])
+
+    # Only the distinct ids are resolved to names; the columns themselves stay arrays
+    ids, codes = np.unique(records['exercise_id'], return_inverse=True)
+    catalog = exercise_catalog(ids)
+    names, muscles = [], []
+    for exercise_id in ids.tolist():
+        if exercise_id < 0:
+            names.append(meta['names'][-exercise_id - 1])
+            muscles.append('')
+        else:
+            name, muscle_group = catalog.get(exercise_id, (str(exercise_id), None))
+            names.append(name)
+            muscles.append(muscle_group or '')
+
+    exercise_codes, exercise_names = _factorize(names)
+    muscle_codes, muscle_names = _factorize(muscles)
+    muscle_codes = muscle_codes.astype(np.int32)
+    if '' in muscle_names:
+        unknown = muscle_names.index('')
+        muscle_names.pop(unknown)
+        muscle_codes = np.where(muscle_codes == unknown, -1, np.where(muscle_codes > unknown, muscle_codes - 1, muscle_codes))
+
+    day = (records['timestamp'] // 86_400).astype(np.int32)
+    return SetHistory(
+        day, exercise_codes[codes].astype(np.int32), records['reps'].astype(np.int32),
+        records['weight'].astype(np.float64), muscle_codes[codes].astype(np.int32), exercise_names, muscle_names
+    )
+
+
+def estimate_1rm(weight, reps):
+    """Vectorized counterpart of utils.records.estimate_1rm"""
+    reps = reps.astype(np.float64)
+    if current_app.config.get('E1RM_FORMULA', 'epley') == 'brzycki':
+        e1rm = np.where(reps < 37, weight * 36 / np.maximum(37 - reps, 1), weight * (1 + reps / 30))
+    else:
+        e1rm = weight * (1 + reps / 30)
+    return np.where(reps <= 1, weight, e1rm)
+
+
+def _iso_dates(days):
+    """Days since 1970-01-01 -> list of YYYY-MM-DD strings"""
+    return np.asarray(days, dtype='datetime64[D]').astype(str).tolist()
+
+
+def daily_volume(history, start, end):
+    """Volume per calendar day for days in [start, end]"""
+    mask = (history.day >= start) & (history.day <= end)
+    return np.bincount(history.day[mask] - start, weights=history.volume[mask], minlength=end - start + 1)
+
+
+def rolling_sum(values, window):
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    out = csum[1:].copy()
+    out[window:] -= csum[1:-window]
+    return out
+
+
+def e1rm_curves(history):
+    """Best estimated 1RM per exercise per training day"""
+    if not len(history):
+        return {}
+
+    e1rm = estimate_1rm(history.weight, history.reps)
+    order = np.lexsort((history.day, history.exercise))
+    exercise, day, e1rm = history.exercise[order], history.day[order], e1rm[order]
+
+    # Start of each (exercise, day) group in the sorted arrays
+    boundaries = np.flatnonzero(np.diff(exercise) | np.diff(day)) + 1
+    starts = np.concatenate(([0], boundaries))
+    best = np.maximum.reduceat(e1rm, starts)
+
+    curves = {}
+    dates = _iso_dates(day[starts])
+    for ex, d, value in zip(exercise[starts].tolist(), dates, np.round(best, 2).tolist()):
+        curves.setdefault(history.exercise_names[ex], []).append({"date": d, "e1rm": value})
+    return curves
+
+
+def weekly_muscle_sets(history, start_week, end_week):
+    """Sets per muscle group per ISO week (weeks start on Monday)"""
+    # 1970-01-01 was a Thursday, so shift by 3 days to align weeks to Monday
+    week = (history.day + 3) // 7
+    mask = (history.muscle >= 0) & (week >= start_week) & (week <= end_week)
+    n_weeks = end_week - start_week + 1
+    n_muscles = len(history.muscle_names)
+    counts = np.bincount(
+        history.muscle[mask] * n_weeks + (week[mask] - start_week),
+        minlength=n_muscles * n_weeks
+    ).reshape(n_muscles, n_weeks)
+
+    weeks = _iso_dates(np.arange(start_week, end_week + 1) * 7 - 3)
+    return [
+        {"week": week_start, "sets": {
+            muscle: int(counts[m, i]) for m, muscle in enumerate(history.muscle_names) if counts[m, i]
+        }}
+        for i, week_start in enumerate(weeks)
+    ]
+
+
+def compute_analytics(history, days=180, today=None):
+    today = (today or date.today())
+    end = (today - EPOCH).days
+    start = end - days + 1
+
+    # Pad the volume series so the 28-day window is full on the first day shown
+    volume = daily_volume(history, start - 27, end)
+    acute = rolling_sum(volume, 7)[27:]
+    chronic = rolling_sum(volume, 28)[27:]
+
+    # Acute:chronic workload ratio on weekly averages
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(chronic > 0, (acute / 7) / (chronic / 28), 0.0)
+
+    dates = _iso_dates(np.arange(start, end + 1))
+    start_week, end_week = (start + 3) // 7, (end + 3) // 7
+
+    return {
+        "days": days,
+        "rolling_volume": [
+            {"date": d, "volume": round(float(v), 2), "volume_7d": round(float(a), 2), "volume_28d": round(float(c), 2)}
+            for d, v, a, c in zip(dates, volume[27:], acute, chronic)
+        ],
+        "acwr": [
+            {"date": d, "ratio": round(float(r), 3)} for d, r in zip(dates, ratio)
+        ],
+        "e1rm": e1rm_curves(history),
+        "muscle_weekly_sets": weekly_muscle_sets(history, start_week, end_week)
+    }
+
+
+def _fingerprint(user_id):
+    # Completed history only changes when a session is finished or imported
+    return completed_fingerprint(user_id)
+
+
+def user_analytics(user_id, days=180):
+    """Analytics for a user, served from the cache while the history fingerprint is unchanged"""
+    fingerprint = tuple(_fingerprint(user_id))
+    key = f'analytics:{user_id}:{days}:{date.today()}:{fingerprint}'
+
+    def compute():
+        if snapshots_enabled():
+            history = snapshot_history(user_id, fingerprint)
+        else:
+            history = load_history(user_id)
+        return compute_analytics(history, days)
+
+    return get_cache().get_or_compute(key, compute, current_app.config.get('ANALYTICS_CACHE_TTL', 3600))
@@ -0,0 +1,208 @@
+"""Cold storage for old workout history.
+
+Sets of completed sessions that ended more than ARCHIVE_AFTER_MONTHS ago
+are moved out of workout_sets into one compressed blob per user and year
+(set_archives). Each blob holds columnar NumPy arrays, so a whole year
+decompresses straight into arrays. The sessions stay in workout_sessions
+with `archived` set, and their totals keep serving the session-level
+endpoints.
+
+Readers that need individual sets call `archived_sets` / `read_archive`
+only when the sessions or the date range they need reach into the
+archive, so recent-history requests never decompress anything.
+"""
+import io
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from models import db, SetArchive, WorkoutSession, WorkoutSet
+from utils.jobs import job
+from utils.muscles import week_start
+
+ArchivedSet = namedtuple('ArchivedSet', [
+    'session_id', 'exercise_id', 'exercise_name', 'set_number', 'reps', 'weight', 'timestamp', 'muscle_group'
+])
+
+EPOCH = datetime(1970, 1, 1)
+COLUMNS = ['session_id', 'exercise_id', 'exercise_name', 'set_number', 'reps', 'weight', 'timestamp', 'muscle_group']
+
+
+def archive_horizon():
+    """Sessions that ended before this may have been archived"""
+    return datetime.utcnow() - timedelta(days=30 * current_app.config.get('ARCHIVE_AFTER_MONTHS', 12))
+
+
+def _factorize(values):
+    uniques, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return codes.astype(np.int32), uniques
+
+
+def pack(columns):
+    """Compress a dict of column arrays (as returned by `unpack`) into bytes"""
+    exercise_codes, exercise_names = _factorize(columns['exercise_name'])
+    muscle_codes, muscle_names = _factorize([m or '' for m in columns['muscle_group']])
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        session_id=np.asarray(columns['session_id'], dtype=np.int32),
+        exercise_id=np.asarray(columns['exercise_id'], dtype=np.int32),   # -1 for name-only sets
+        exercise=exercise_codes, exercise_names=exercise_names,
+        set_number=np.asarray(columns['set_number'], dtype=np.int16),
+        reps=np.asarray(columns['reps'], dtype=np.int32),
+        weight=np.asarray(columns['weight'], dtype=np.float64),
+        timestamp=np.asarray(columns['timestamp'], dtype=np.int64),       # microseconds since 1970-01-01 UTC
+        muscle=muscle_codes, muscle_names=muscle_names,                   # '' for unknown
+    )
+    return buffer.getvalue()
+
+
+def unpack(data):
+    """Decompress an archive blob into a dict of column arrays"""
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        muscle_names = arrays['muscle_names'].astype(object)
+        muscle_names[muscle_names == ''] = None
+        return {
+            'session_id': arrays['session_id'],
+            'exercise_id': arrays['exercise_id'],
+            'exercise_name': arrays['exercise_names'].astype(object)[arrays['exercise']],
+            'set_number': arrays['set_number'],
+            'reps': arrays['reps'],
+            'weight': arrays['weight'],
+            'timestamp': arrays['timestamp'],
+            'muscle_group': muscle_names[arrays['muscle']],
+        }
+
+
+def _columns_from_rows(rows):
+    session_id, exercise_id, name, set_number, reps, weight, timestamp, muscle = zip(*rows)
+    return {
+        'session_id': np.array(session_id, dtype=np.int32),
+        'exercise_id': np.array([-1 if e is None else e for e in exercise_id], dtype=np.int32),
+        'exercise_name': np.array(name, dtype=object),
+        'set_number': np.array(set_number, dtype=np.int16),
+        'reps': np.array(reps, dtype=np.int32),
+        'weight': np.array(weight, dtype=np.float64),
+        'timestamp': np.array([(t - EPOCH) // timedelta(microseconds=1) for t in timestamp], dtype=np.int64),
+        'muscle_group': np.array(muscle, dtype=object),
+    }
+
+
+def _concat(parts):
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    merged = {column: np.concatenate([p[column] for p in parts]) for column in COLUMNS}
+    order = np.lexsort((merged['timestamp'], merged['session_id']))
+    return {column: values[order] for column, values in merged.items()}
+
+
+def read_archive(user_id, years=None):
+    """The user's archived sets (optionally only `years`) as one dict of column arrays, or None"""
+    query = db.session.query(SetArchive.data).filter(SetArchive.user_id == user_id)
+    if years is not None:
+        if not years:
+            return None
+        query = query.filter(SetArchive.year.in_(sorted(years)))
+    return _concat([unpack(data) for (data,) in query.order_by(SetArchive.year)])
+
+
+def archived_sets(user_id, session_ids=None, years=None, exercise_names=None):
+    """Archived sets as ArchivedSet rows, in the order they were done within each session"""
+    columns = read_archive(user_id, years)
+    if columns is None:
+        return []
+
+    mask = np.ones(len(columns['session_id']), dtype=bool)
+    if session_ids is not None:
+        mask &= np.isin(columns['session_id'], list(session_ids))
+    if exercise_names is not None:
+        mask &= np.isin(columns['exercise_name'].astype(str), list(exercise_names))
+
+    timestamps = (EPOCH + timedelta(microseconds=int(t)) for t in columns['timestamp'][mask])
+    return [
+        ArchivedSet(session_id, None if exercise_id < 0 else exercise_id, name, set_number, reps, weight, timestamp, muscle)
+        for session_id, exercise_id, name, set_number, reps, weight, timestamp, muscle in zip(
+            columns['session_id'][mask].tolist(), columns['exercise_id'][mask].tolist(),
+            columns['exercise_name'][mask].tolist(), columns['set_number'][mask].tolist(),
+            columns['reps'][mask].tolist(), columns['weight'][mask].tolist(),
+            timestamps, columns['muscle_group'][mask].tolist()
+        )
+    ]
+
+
+def archive_user(user_id, before=None):
+    """Move the sets of the user's completed sessions that ended before `before` into the archive.
+
+    Returns the number of sets archived. Runs in the caller's transaction.
+    """
+    before = before or archive_horizon()
+    sessions = db.session.query(WorkoutSession.id, WorkoutSession.started_at).filter(
+        WorkoutSession.user_id == user_id,
+        WorkoutSession.completed == True,
+        WorkoutSession.archived == False,
+        WorkoutSession.ended_at < before
+    ).all()
+
+    by_year = {}
+    for session_id, started_at in sessions:
+        by_year.setdefault(started_at.year, []).append(session_id)
+
+    archived = 0
+    for year, session_ids in sorted(by_year.items()):
+        rows = db.session.query(
+            WorkoutSet.session_id, WorkoutSet.exercise_id, WorkoutSet.exercise_name, WorkoutSet.set_number,
+            WorkoutSet.reps, WorkoutSet.weight, WorkoutSet.timestamp, WorkoutSet.muscle_group
+        ).filter(
+            WorkoutSet.user_id == user_id, WorkoutSet.session_id.in_(session_ids)
+        ).order_by(WorkoutSet.session_id, WorkoutSet.timestamp, WorkoutSet.id).all()
+
+        if rows:
+            archive = SetArchive.query.filter_by(user_id=user_id, year=year).with_for_update().first()
+            if archive is None:
+                archive = SetArchive(user_id=user_id, year=year)
+                db.session.add(archive)
+            columns = _concat([unpack(archive.data) if archive.data else None, _columns_from_rows(rows)])
+            archive.data = pack(columns)
+            archive.set_count = len(columns['session_id'])
+            archived += len(rows)
+
+            db.session.execute(
+                db.delete(WorkoutSet).where(WorkoutSet.user_id == user_id, WorkoutSet.session_id.in_(session_ids))
+                .execution_options(synchronize_session=False)
+            )
+
+        db.session.execute(
+            db.update(WorkoutSession).where(WorkoutSession.id.in_(session_ids)).values(archived=True)
+            .execution_options(synchronize_session=False)
+        )
+    return archived
+
+
+def restore_user(user_id):
+    """Move all of the user's archived sets back into workout_sets (e.g. before a downgrade)"""
+    restored = 0
+    for archive in SetArchive.query.filter_by(user_id=user_id).all():
+        rows = archived_sets(user_id, years=[archive.year])
+        if rows:
+            db.session.execute(db.insert(WorkoutSet), [
+                {**row._asdict(), 'user_id': user_id, 'week': week_start(row.timestamp.date())}
+                for row in rows
+            ])
+        db.session.delete(archive)
+        restored += len(rows)
+
+    db.session.execute(
+        db.update(WorkoutSession).where(WorkoutSession.user_id == user_id, WorkoutSession.archived == True)
+        .values(archived=False).execution_options(synchronize_session=False)
+    )
+    return restored
+
+
+@job('archive_history')
+def archive_history(user_id):
+    archive_user(user_id)
@@ -0,0 +1,311 @@
+"""Two-tier cache for computed payloads.
+
+Lookups go to an in-process TTL + LRU tier first, then to an optional
+shared tier (CACHE_SHARED_TIER, an import path of a SharedTier
+implementation), and only then compute the value.
+
+Invalidation is by version rather than by deleting keys: every key embeds
+the current version of its user, and `invalidate_user` bumps that version.
+unit_of_work does this after every committed write, so a user never reads
+their own stale data from the process they wrote through. Versions live
+in the shared tier when there is one, so with several workers configure a
+shared tier; without one, other processes see the change once their entry
+expires, and the process keeps versions only for its most recently bumped
+users. Data shared by every user (the default exercise catalog) has its own
+version under CATALOG_SCOPE, bumped by `invalidate_catalog`.
+
+Entries in the shared tier are stored as JSON, never pickled, so whoever
+can write to the shared tier can't run code in the workers. Values must be
+JSON-serializable or be passed with an `encode`/`decode` pair.
+
+To avoid stampedes when a popular entry expires, each reader may refresh
+it early with a probability that rises as expiry approaches and with how
+long the value took to compute (XFetch), so usually a single request
+recomputes while the others keep getting the cached value.
+"""
+import base64
+import json
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from werkzeug.utils import import_string
+
+from utils.replica import RoutingSession
+
+Entry = namedtuple('Entry', ['value', 'expires_at', 'delta'])  # delta: seconds the value took to compute
+
+EARLY_REFRESH_BETA = 1.0
+
+
+class LocalTier:
+    """In-process TTL + LRU tier"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedTier:
+    """Interface of a cache shared between processes (e.g. backed by Redis or memcached)"""
+
+    def get(self, key):
+        """Bytes stored under `key`, or None"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """Store bytes under `key` for `ttl` seconds"""
+        raise NotImplementedError
+
+    def incr(self, key):
+        """Atomically add 1 to the integer under `key` (missing counts as 0) and return it"""
+        raise NotImplementedError
+
+
+class MemorySharedTier(SharedTier):
+    """SharedTier kept in this process, for development and smoke tests"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._values.get(key, (None, None))
+            if expires_at is not None and expires_at <= time.time():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._values.get(key, (0, None))[0] or 0) + 1
+            self._values[key] = (str(value).encode(), None)
+            return value
+
+
+class Cache:
+    def __init__(self, max_entries=1024, shared=None, max_versions=None):
+        self.local = LocalTier(max_entries)
+        self.shared = shared
+        # Local versions, LRU-bounded. Versions come from one increasing clock,
+        # and an evicted scope reads as the highest version evicted so far, so
+        # it can never match an entry cached under an older version of it.
+        self.max_versions = max_versions or max_entries
+        self._versions = OrderedDict()
+        self._version_clock = 0
+        self._version_floor = 0
+        self._versions_lock = threading.Lock()
+        self._counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'early_refreshes': 0, 'invalidations': 0}
+
+    def _count(self, name):
+        # Plain increments; metrics don't need to be exact under contention
+        self._counters[name] += 1
+
+    @staticmethod
+    def _refresh_early(entry):
+        # XFetch: -log(u) is exponential, so the chance rises as expiry nears and with compute time
+        return time.time() - entry.delta * EARLY_REFRESH_BETA * math.log(random.random() or 1e-12) >= entry.expires_at
+
+    def version(self, scope):
+        if self.shared is not None:
+            value = self.shared.get(f'version:{scope}')
+            return int(value) if value else 0
+        with self._versions_lock:
+            if scope not in self._versions:
+                return self._version_floor
+            self._versions.move_to_end(scope)
+            return self._versions[scope]
+
+    def bump(self, scope):
+        self._count('invalidations')
+        if self.shared is not None:
+            return self.shared.incr(f'version:{scope}')
+        with self._versions_lock:
+            self._version_clock += 1
+            self._versions[scope] = self._version_clock
+            self._versions.move_to_end(scope)
+            while len(self._versions) > self.max_versions:
+                _, evicted = self._versions.popitem(last=False)
+                self._version_floor = max(self._version_floor, evicted)
+            return self._version_clock
+
+    @staticmethod
+    def _load(data, decode):
+        try:
+            value, expires_at, delta = json.loads(data)
+            return Entry(decode(value), expires_at, delta)
+        except (ValueError, TypeError):
+            return None  # written by an older release or not by us; recompute
+
+    def get_or_compute(self, key, compute, ttl, cacheable=None, encode=None, decode=None):
+        """The cached value for `key`, computing and storing it on a miss.
+
+        Values for which `cacheable(value)` is false are returned but not stored.
+        `encode` and `decode` convert values to and from JSON-serializable
+        data for the shared tier.
+        """
+        entry = self.local.get(key)
+        if entry is not None and not self._refresh_early(entry):
+            self._count('local_hits')
+            return entry.value
+
+        if entry is None and self.shared is not None:
+            data = self.shared.get(key)
+            entry = self._load(data, decode or (lambda value: value)) if data is not None else None
+            if entry is not None and entry.expires_at > time.time() and not self._refresh_early(entry):
+                self.local.set(key, entry)
+                self._count('shared_hits')
+                return entry.value
+
+        self._count('early_refreshes' if entry is not None else 'misses')
+        started = time.time()
+        value = compute()
+        if cacheable is not None and not cacheable(value):
+            return value
+        now = time.time()
+        entry = Entry(value, now + ttl, now - started)
+        self.local.set(key, entry)
+        if self.shared is not None:
+            data = [encode(value) if encode else value, entry.expires_at, entry.delta]
+            self.shared.set(key, json.dumps(data, separators=(',', ':')).encode(), ttl)
+        return value
+
+    def metrics(self):
+        return {**self._counters, 'evictions': self.local.evictions, 'local_entries': len(self.local)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide Cache, configured from the app on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            shared_path = current_app.config.get('CACHE_SHARED_TIER')
+            _cache = Cache(
+                max_entries=current_app.config.get('CACHE_MAX_ENTRIES', 1024),
+                shared=import_string(shared_path)() if shared_path else None
+            )
+        return _cache
+
+
+CATALOG_SCOPE = 'catalog'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Make every cached entry of the user's data stale"""
+    get_cache().bump(user_scope(user_id))
+
+
+def invalidate_catalog():
+    """Make every cached entry built from the default exercise catalog stale, for all users"""
+    get_cache().bump(CATALOG_SCOPE)
+
+
+def invalidate_user_on_commit(session, user_id):
+    """invalidate_user once `session` commits, for writers outside unit_of_work (jobs, scripts)"""
+    session.info.setdefault('invalidate_users', set()).add(user_id)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _invalidate_committed(session):
+    for user_id in session.info.pop('invalidate_users', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop('invalidate_users', None)
+
+
+def _encode_response(value):
+    body, status, headers = value
+    return [base64.b64encode(body).decode('ascii'), status, headers]
+
+
+def _decode_response(data):
+    body, status, headers = data
+    return base64.b64decode(body), status, [tuple(header) for header in headers]
+
+
+def cached(namespace, ttl=None, validator=None, scope=None):
+    """Cache a jwt_required GET view's 200 responses per user, path and query args.
+
+    `validator`, called with the user id, returns a cheap value that changes
+    whenever the underlying data does (e.g. a fingerprint query); it becomes
+    part of the key, so writes from other processes are noticed too.
+    `scope` names a version shared by all users (e.g. CATALOG_SCOPE) that is
+    also part of the key, for views that read data no single user owns.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            user_id = get_jwt_identity()
+            key = (
+                f'{namespace}:{request.path}?{sorted(request.args.items(multi=True))}'
+                f':{user_id}:{cache.version(user_scope(user_id))}'
+            )
+            if scope is not None:
+                key += f':{cache.version(scope)}'
+            if validator is not None:
+                key += f':{validator(int(user_id))}'
+
+            def compute():
+                response = make_response(view(*args, **kwargs))
+                if response.is_streamed:
+                    return response
+                return response.get_data(), response.status_code, list(response.headers)
+
+            result = cache.get_or_compute(
+                key, compute, ttl or current_app.config.get('CACHE_DEFAULT_TTL', 60),
+                cacheable=lambda value: isinstance(value, tuple) and value[1] == 200,
+                encode=_encode_response, decode=_decode_response
+            )
+            if not isinstance(result, tuple):
+                return result
+            body, status, headers = result
+            return current_app.response_class(body, status=status, headers=headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,95 @@
+"""Per-user change log behind the delta sync endpoint (GET /api/sync).
+
+Writers call `record_change` in their transaction for every session or
+split they create, modify or delete. Each transaction takes the next value
+of the user's `users.change_seq` with a single UPDATE, and all of its
+change_log rows carry that number. The UPDATE locks the user's row until
+commit, so a user's sequence numbers become visible in the order they were
+handed out: once a reader sees change_seq = N, every change up to N is
+committed. That makes N a safe sync token.
+
+Sets are logged as a change to their session; sync returns a changed
+session together with all of its sets.
+
+`prune_changes` (prune_changes.py, run daily) deletes old entries and
+raises the user's `change_log_floor` to the highest seq it deleted. A
+token below the floor may have missed deletions, so sync answers it with
+a full resync instead.
+"""
+from sqlalchemy import event
+
+from models import db, ChangeLog, User
+from utils.replica import RoutingSession
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+def _transaction_seq(user_id):
+    seqs = db.session.info.setdefault('change_seqs', {})
+    if user_id not in seqs:
+        seqs[user_id] = db.session.execute(
+            db.update(User)
+            .where(User.id == user_id)
+            .values(change_seq=User.change_seq + 1)
+            .returning(User.change_seq)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+    return seqs[user_id]
+
+
+def record_changes(user_id, entity, entity_ids, op=UPSERT):
+    """Log `op` on each of `entity_ids` ('session' or 'split') in the current transaction"""
+    entity_ids = list(entity_ids)
+    if not entity_ids:
+        return
+    seq = _transaction_seq(user_id)
+    db.session.execute(db.insert(ChangeLog), [
+        {'user_id': user_id, 'seq': seq, 'entity': entity, 'entity_id': entity_id, 'op': op}
+        for entity_id in entity_ids
+    ])
+
+
+def record_change(user_id, entity, entity_id, op=UPSERT):
+    record_changes(user_id, entity, [entity_id], op)
+
+
+def current_seq(user_id):
+    """(latest seq, lowest token still served incrementally) of the user's change log"""
+    return tuple(db.session.query(User.change_seq, User.change_log_floor).filter_by(id=user_id).one())
+
+
+def prune_changes(before):
+    """Delete change_log entries created before `before`; returns how many were deleted"""
+    pruned = (
+        db.select(db.func.max(ChangeLog.seq))
+        .where(ChangeLog.user_id == User.id, ChangeLog.created_at < before)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(User)
+        .where(pruned > User.change_log_floor)
+        .values(change_log_floor=pruned)
+        .execution_options(synchronize_session=False)
+    )
+    floor = db.select(User.change_log_floor).where(User.id == ChangeLog.user_id).scalar_subquery()
+    return db.session.execute(
+        db.delete(ChangeLog).where(ChangeLog.seq <= floor).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def changes_since(user_id, since):
+    """{entity: {entity_id: op}} with the latest op of everything changed after `since`"""
+    rows = db.session.query(ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op).filter(
+        ChangeLog.user_id == user_id, ChangeLog.seq > since
+    ).order_by(ChangeLog.seq, ChangeLog.id)
+    latest = {}
+    for entity, entity_id, op in rows:
+        latest.setdefault(entity, {})[entity_id] = op
+    return latest
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_seqs(session):
+    session.info.pop('change_seqs', None)
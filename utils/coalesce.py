@@ -0,0 +1,57 @@
+"""Single-flight coalescing of identical GETs.
+
+When a user fires the same GET (same path and query string) while an
+earlier one is still running, the later requests wait for the first and
+get a copy of its response instead of running the handler again. Nothing
+is cached: once the first request finishes, the next one runs normally.
+Streamed responses can't be copied, so waiting requests run the handler
+themselves, as they do if the first request fails.
+"""
+import threading
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+WAIT_TIMEOUT = 30  # seconds a duplicate waits before running on its own
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None  # (body, status, headers) once finished
+
+
+def coalesced(view):
+    """Share one execution of a jwt_required GET view between a user's concurrent identical requests"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+
+        key = (get_jwt_identity(), request.full_path)
+        with _inflight_lock:
+            call = _inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _inflight[key] = _Call()
+
+        if not leader:
+            if call.done.wait(WAIT_TIMEOUT) and call.response is not None:
+                body, status, headers = call.response
+                return current_app.response_class(body, status=status, headers=headers)
+            return view(*args, **kwargs)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+            if not response.is_streamed:
+                call.response = (response.get_data(), response.status_code, list(response.headers))
+            return response
+        finally:
+            with _inflight_lock:
+                del _inflight[key]
+            call.done.set()
+    return wrapper
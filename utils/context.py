@@ -0,0 +1,75 @@
+"""Per-request view of the signed-in user's workout state.
+
+Nearly every today/splits handler needs the user's split assignment and
+their active session. `user_context()` loads each of them lazily, at most
+once per request, and keeps them on `flask.g` for the rest of the request.
+"""
+from functools import cached_property
+
+from flask import g, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.orm import joinedload
+
+from models import db, Split, UserSplitAssignment, WorkoutSession
+
+
+class UserContext:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    @cached_property
+    def assignment(self):
+        """The user's split assignment with split and days loaded, or None"""
+        return UserSplitAssignment.query.options(
+            joinedload(UserSplitAssignment.split).selectinload(Split.days)
+        ).filter_by(user_id=self.user_id).first()
+
+    @cached_property
+    def active_session(self):
+        """The user's unfinished workout session, or None"""
+        # Found through the assignment's pointer, never by scanning sessions
+        if 'assignment' in self.__dict__:
+            if not self.assignment or not self.assignment.active_session_id:
+                return None
+            session = db.session.get(WorkoutSession, self.assignment.active_session_id)
+            return session if session and not session.completed else None
+        
+        return WorkoutSession.query.join(
+            UserSplitAssignment, UserSplitAssignment.active_session_id == WorkoutSession.id
+        ).filter(
+            UserSplitAssignment.user_id == self.user_id,
+            WorkoutSession.completed == False
+        ).first()
+
+    @property
+    def current_day(self):
+        """The split day at the assignment's position, or the first day if out of range"""
+        if not self.assignment:
+            return None
+        days = self.assignment.split.days
+        for day in days:
+            if day.position == self.assignment.current_position:
+                return day
+        return days[0] if days else None
+
+    def set_active_session(self, session):
+        """Record a session started or ended by the current request"""
+        self.active_session = session
+
+    def reset(self):
+        """Forget loaded state, e.g. after the assignment is switched to another split"""
+        self.__dict__.pop('assignment', None)
+        self.__dict__.pop('active_session', None)
+
+
+def user_context(user_id=None):
+    """The context for `user_id` (default: the JWT identity), shared within a request"""
+    if user_id is None:
+        user_id = int(get_jwt_identity())
+    if not has_request_context():
+        return UserContext(user_id)
+
+    ctx = g.get('user_context')
+    if ctx is None or ctx.user_id != user_id:
+        ctx = g.user_context = UserContext(user_id)
+    return ctx
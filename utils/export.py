@@ -0,0 +1,167 @@
+"""Streaming export of a user's completed training history"""
+import csv
+import heapq
+import io
+import json
+import zlib
+
+from models import db, WorkoutSet, WorkoutSession, SplitDay
+from utils.archive import archived_sets
+
+# Rows fetched per server-side cursor round trip
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    'session_id', 'day_name', 'started_at', 'ended_at', 'exercise_id',
+    'exercise_name', 'set_number', 'reps', 'weight', 'timestamp'
+]
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def export_rows(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield one tuple per completed set, ordered by session start.
+
+    Live sets stream from a server-side cursor; archived ones are merged in
+    from the user's archive.
+    """
+    return heapq.merge(
+        _archived_rows(user_id), _live_rows(user_id, batch_size),
+        key=lambda row: (row[2] or '', row[0])
+    )
+
+
+def _archived_rows(user_id):
+    sessions = {
+        session_id: (day_name, started_at, ended_at)
+        for session_id, day_name, started_at, ended_at in db.session.execute(
+            db.select(WorkoutSession.id, SplitDay.name, WorkoutSession.started_at, WorkoutSession.ended_at)
+            .outerjoin(SplitDay, SplitDay.id == WorkoutSession.split_day_id)
+            .where(WorkoutSession.user_id == user_id, WorkoutSession.archived == True)
+        )
+    }
+    if not sessions:
+        return
+
+    # Archives are per year of session start, so going year by year keeps the order
+    # while holding only one year's sets in memory
+    by_year = {}
+    for session_id, (_, started_at, _) in sessions.items():
+        by_year.setdefault(started_at.year, set()).add(session_id)
+
+    for year, session_ids in sorted(by_year.items()):
+        rows = []
+        for s in archived_sets(user_id, session_ids=session_ids, years={year}):
+            day_name, started_at, ended_at = sessions[s.session_id]
+            rows.append((
+                s.session_id, day_name, _iso(started_at), _iso(ended_at), s.exercise_id,
+                s.exercise_name, s.set_number, s.reps, s.weight, _iso(s.timestamp)
+            ))
+        rows.sort(key=lambda row: (row[2] or '', row[0]))
+        yield from rows
+
+
+def _live_rows(user_id, batch_size):
+    query = (
+        db.select(
+            WorkoutSession.id,
+            SplitDay.name,
+            WorkoutSession.started_at,
+            WorkoutSession.ended_at,
+            WorkoutSet.exercise_id,
+            WorkoutSet.exercise_name,
+            WorkoutSet.set_number,
+            WorkoutSet.reps,
+            WorkoutSet.weight,
+            WorkoutSet.timestamp
+        )
+        .join(WorkoutSet, WorkoutSet.session_id == WorkoutSession.id)
+        .outerjoin(SplitDay, SplitDay.id == WorkoutSession.split_day_id)
+        .where(WorkoutSession.user_id == user_id)
+        .where(WorkoutSession.completed == True)
+        .order_by(WorkoutSession.started_at, WorkoutSession.id, WorkoutSet.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    # yield_per implies stream_results, so psycopg2 uses a named cursor
+    # and only one batch of rows is held in memory at a time
+    result = db.session.execute(query)
+    try:
+        for row in result:
+            yield (
+                row[0], row[1], _iso(row[2]), _iso(row[3]), row[4],
+                row[5], row[6], row[7], row[8], _iso(row[9])
+            )
+    finally:
+        result.close()
+
+
+def ndjson_chunks(rows, batch_size=EXPORT_BATCH_SIZE):
+    """One JSON object per line"""
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(dict(zip(EXPORT_COLUMNS, row))))
+        if len(buffer) >= batch_size:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def csv_chunks(rows, batch_size=EXPORT_BATCH_SIZE):
+    """CSV with a header row"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % batch_size == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+
+def parquet_lite_chunks(rows, batch_size=EXPORT_BATCH_SIZE):
+    """Columnar row groups, one JSON object per line.
+
+    The first line carries the schema; every following line is a row group
+    holding one array per column, which is cheap to load into a dataframe.
+    """
+    yield json.dumps({'schema': EXPORT_COLUMNS, 'row_group_size': batch_size}) + '\n'
+
+    columns = [[] for _ in EXPORT_COLUMNS]
+    group = 0
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+        if len(columns[0]) >= batch_size:
+            yield json.dumps({'row_group': group, 'num_rows': len(columns[0]),
+                              'columns': dict(zip(EXPORT_COLUMNS, columns))}) + '\n'
+            columns = [[] for _ in EXPORT_COLUMNS]
+            group += 1
+    if columns[0]:
+        yield json.dumps({'row_group': group, 'num_rows': len(columns[0]),
+                          'columns': dict(zip(EXPORT_COLUMNS, columns))}) + '\n'
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a chunk stream incrementally without buffering the whole body"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# format -> (chunk generator, mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_chunks, 'application/x-ndjson', 'ndjson'),
+    'csv': (csv_chunks, 'text/csv', 'csv'),
+    'parquet-lite': (parquet_lite_chunks, 'application/x-ndjson', 'plite.ndjson'),
+}
@@ -0,0 +1,281 @@
+"""Bulk import of workout history from CSV, NDJSON or JSON files"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from models import db, Exercise, UserSplitAssignment, WorkoutSession, WorkoutSet
+from utils.records import rebuild_records
+from utils.suggestions import refresh_suggestions
+from utils.muscles import week_start
+from utils.changes import record_changes
+
+# Sets written per executemany / COPY batch
+IMPORT_BATCH_SIZE = 5000
+
+# Oldest history accepted; manage_partitions.py keeps partitions for this window
+IMPORT_MAX_AGE_YEARS = 20
+
+# Accepted header names -> canonical field. Our own export format imports cleanly.
+FIELD_ALIASES = {
+    'date': 'date', 'timestamp': 'date', 'started_at': 'date', 'performed_at': 'date',
+    'exercise': 'exercise', 'exercise_name': 'exercise', 'name': 'exercise',
+    'exercise_id': 'exercise_id',
+    'reps': 'reps',
+    'weight': 'weight',
+    'set_number': 'set_number', 'set': 'set_number',
+    'day': 'day', 'day_name': 'day',
+    'session': 'session', 'session_id': 'session',
+}
+
+SET_COLUMNS = [
+    'session_id', 'exercise_id', 'exercise_name', 'set_number', 'reps', 'weight', 'timestamp',
+    'user_id', 'muscle_group', 'week'
+]
+
+
+class HistoryImportError(Exception):
+    """Raised when an import cannot proceed at all"""
+
+
+def _normalize(record):
+    row = {}
+    for key, value in record.items():
+        field = FIELD_ALIASES.get(str(key).strip().lower())
+        if field and field not in row and value not in (None, ''):
+            row[field] = value
+    return row
+
+
+def iter_records(stream, file_format):
+    """Yield raw dict records from a binary stream without loading it whole"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if file_format == 'csv':
+        yield from csv.DictReader(text)
+        return
+
+    first = text.read(1)
+    while first and first.isspace():
+        first = text.read(1)
+
+    if first == '[':
+        # Plain JSON arrays have to be parsed in one go
+        yield from json.loads(first + text.read())
+        return
+
+    # NDJSON: one object per line
+    pending = first
+    for line in text:
+        line = (pending + line).strip()
+        pending = ''
+        if line:
+            yield json.loads(line)
+
+
+def detect_format(filename=None, content_type=None, explicit=None):
+    if explicit:
+        return 'csv' if explicit == 'csv' else 'json'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    if content_type and 'csv' in content_type:
+        return 'csv'
+    return 'json'
+
+
+class HistoryImporter:
+    """Parses records, synthesizes completed sessions and bulk loads their sets"""
+
+    def __init__(self, user_id, on_progress=None, batch_size=IMPORT_BATCH_SIZE):
+        self.user_id = user_id
+        self.on_progress = on_progress or (lambda stage, done, total: None)
+        self.batch_size = batch_size
+        self.errors = []
+        self.skipped = 0
+        self.unmatched_exercises = set()
+        self.muscle_groups = {}
+        now = datetime.utcnow()
+        self.earliest = now - timedelta(days=365 * IMPORT_MAX_AGE_YEARS)
+        self.latest = now + timedelta(days=1)  # room for clients ahead of UTC
+
+    def _build_exercise_lookup(self):
+        rows = db.session.query(Exercise.id, Exercise.name, Exercise.muscle_group).filter(
+            db.or_(Exercise.is_default == True, Exercise.created_by == self.user_id)
+        ).order_by(Exercise.is_default).all()
+        self.muscle_groups = {ex_id: muscle_group for ex_id, _, muscle_group in rows}
+        # Custom exercises come first, so defaults win on duplicate names
+        lookup = {name.lower(): (ex_id, name) for ex_id, name, _ in rows}
+        return lookup, {ex_id: name for ex_id, name, _ in rows}
+
+    def _parse_row(self, row, exercises_by_name, exercises_by_id):
+        if 'date' not in row:
+            raise ValueError('date is required')
+        if 'exercise' not in row and 'exercise_id' not in row:
+            raise ValueError('exercise or exercise_id is required')
+        if 'reps' not in row or 'weight' not in row:
+            raise ValueError('reps and weight are required')
+
+        timestamp = datetime.fromisoformat(str(row['date']).strip().replace('Z', '+00:00'))
+        if timestamp.tzinfo:
+            timestamp = timestamp.replace(tzinfo=None) - timestamp.utcoffset()
+        if not self.earliest <= timestamp <= self.latest:
+            raise ValueError(f'date must be within the last {IMPORT_MAX_AGE_YEARS} years and not in the future')
+
+        exercise_id = None
+        exercise_name = None
+        if 'exercise_id' in row and int(row['exercise_id']) in exercises_by_id:
+            exercise_id = int(row['exercise_id'])
+            exercise_name = exercises_by_id[exercise_id]
+        elif 'exercise' in row:
+            exercise_name = str(row['exercise']).strip()
+            match = exercises_by_name.get(exercise_name.lower())
+            if match:
+                exercise_id, exercise_name = match
+            else:
+                self.unmatched_exercises.add(exercise_name)
+        else:
+            raise ValueError(f"unknown exercise_id {row['exercise_id']}")
+
+        set_number = int(row['set_number']) if 'set_number' in row else None
+        session_key = (str(row.get('session') or timestamp.date().isoformat()), str(row.get('day') or ''))
+
+        return session_key, (
+            timestamp, exercise_id, exercise_name[:120], set_number,
+            int(row['reps']), float(row['weight'])
+        )
+
+    def _resolve_days(self):
+        assignment = UserSplitAssignment.query.filter_by(user_id=self.user_id).first()
+        if not assignment or not assignment.split.days:
+            raise HistoryImportError('Assign a split before importing history')
+        days = sorted(assignment.split.days, key=lambda d: d.position)
+        return assignment, days, {day.name.lower(): day.id for day in days}
+
+    def _insert_sessions(self, assignment, days, days_by_name, sessions):
+        """Insert one completed session per group and return their ids in order"""
+        rows = []
+        for idx, ((_, day_name), sets) in enumerate(sessions):
+            timestamps = [s[0] for s in sets]
+            split_day_id = days_by_name.get(day_name.lower()) or days[idx % len(days)].id
+            rows.append({
+                'user_id': self.user_id,
+                'assignment_id': assignment.id,
+                'split_day_id': split_day_id,
+                'started_at': min(timestamps),
+                'ended_at': max(timestamps),
+                'completed': True,
+                'total_sets': len(sets),
+                'total_volume': sum(s[4] * s[5] for s in sets),
+                'exercise_count': len({s[1] or s[2].lower() for s in sets}),
+                'duration_seconds': int((max(timestamps) - min(timestamps)).total_seconds()),
+            })
+
+        ids = []
+        for start in range(0, len(rows), self.batch_size):
+            result = db.session.execute(
+                db.insert(WorkoutSession).returning(WorkoutSession.id, sort_by_parameter_order=True),
+                rows[start:start + self.batch_size]
+            )
+            ids.extend(result.scalars().all())
+            self.on_progress('sessions', len(ids), len(rows))
+        return ids
+
+    def _set_rows(self, sessions, session_ids):
+        for session_id, (_, sets) in zip(session_ids, sessions):
+            counters = {}
+            for timestamp, exercise_id, exercise_name, set_number, reps, weight in sorted(sets, key=lambda s: s[0]):
+                key = exercise_id or exercise_name.lower()
+                counters[key] = set_number or counters.get(key, 0) + 1
+                yield (
+                    session_id, exercise_id, exercise_name, counters[key], reps, weight, timestamp,
+                    self.user_id, self.muscle_groups.get(exercise_id), week_start(timestamp.date())
+                )
+
+    def _copy_sets(self, rows, total):
+        """Postgres fast path: stream sets through COPY in batches"""
+        cursor = db.session.connection().connection.cursor()
+        done = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        statement = f"COPY workout_sets ({', '.join(SET_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+        def flush():
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+            buffer.seek(0)
+            buffer.truncate()
+
+        for row in rows:
+            writer.writerow(['' if v is None else v for v in row])
+            done += 1
+            if done % self.batch_size == 0:
+                flush()
+                self.on_progress('sets', done, total)
+        flush()
+        self.on_progress('sets', done, total)
+
+    def _insert_sets(self, rows, total):
+        done = 0
+        batch = []
+        for row in rows:
+            batch.append(dict(zip(SET_COLUMNS, row)))
+            if len(batch) >= self.batch_size:
+                db.session.execute(db.insert(WorkoutSet), batch)
+                done += len(batch)
+                batch = []
+                self.on_progress('sets', done, total)
+        if batch:
+            db.session.execute(db.insert(WorkoutSet), batch)
+            done += len(batch)
+        self.on_progress('sets', done, total)
+
+    def run(self, records):
+        """Import an iterable of raw records in the caller's transaction; the caller commits"""
+        assignment, days, days_by_name = self._resolve_days()
+        exercises_by_name, exercises_by_id = self._build_exercise_lookup()
+
+        grouped = {}
+        total_sets = 0
+        for line_no, record in enumerate(records, start=1):
+            try:
+                session_key, parsed = self._parse_row(_normalize(record), exercises_by_name, exercises_by_id)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.skipped += 1
+                if len(self.errors) < 20:
+                    self.errors.append({'row': line_no, 'error': str(e)})
+                continue
+            grouped.setdefault(session_key, []).append(parsed)
+            total_sets += 1
+            if total_sets % self.batch_size == 0:
+                self.on_progress('parsed', total_sets, None)
+
+        if not grouped:
+            raise HistoryImportError('No valid rows found')
+
+        sessions = sorted(grouped.items(), key=lambda item: min(s[0] for s in item[1]))
+        session_ids = self._insert_sessions(assignment, days, days_by_name, sessions)
+        record_changes(self.user_id, 'session', session_ids)
+
+        # Months without a partition yet land in the default partition; manage_partitions.py
+        # creates partitions for the whole import window, so that's only until its next run
+        set_rows = self._set_rows(sessions, session_ids)
+        if db.session.get_bind().dialect.name == 'postgresql':
+            self._copy_sets(set_rows, total_sets)
+        else:
+            self._insert_sets(set_rows, total_sets)
+
+        # Imported sets can beat any record, so rebuild them once here
+        rebuild_records(self.user_id)
+        refresh_suggestions(self.user_id)
+
+        last_date = max(s[0] for _, sets in sessions for s in sets).date()
+        if not assignment.last_completed_at or assignment.last_completed_at < last_date:
+            assignment.last_completed_at = last_date
+
+        return {
+            'sessions': len(session_ids),
+            'sets': total_sets,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'unmatched_exercises': sorted(self.unmatched_exercises)
+        }
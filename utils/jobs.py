@@ -0,0 +1,257 @@
+"""Durable background jobs backed by the jobs table.
+
+Jobs are rows in the same database, so enqueueing is part of the caller's
+transaction and pending work survives restarts. Each web process runs a
+small thread pool that picks up jobs as soon as a request enqueues them;
+`python worker.py` drains the same table from a dedicated process.
+
+A claimed job carries a lock token, and its worker refreshes `locked_at`
+every JOB_HEARTBEAT_INTERVAL seconds while the handler runs. Only jobs
+without a heartbeat for JOB_LOCK_TIMEOUT seconds (their worker died) are
+taken back, and the old worker can no longer finish them.
+"""
+import logging
+import os
+import random
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import g, has_request_context
+
+from models import db, Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def job(name, max_attempts=5):
+    """Register a function as the handler for jobs called `name`"""
+    def decorator(func):
+        _handlers[name] = (func, max_attempts)
+        func.enqueue = lambda delay=None, **payload: enqueue(name, delay=delay, **payload)
+        return func
+    return decorator
+
+
+def enqueue(name, delay=None, **payload):
+    """Add a job to the current transaction; it runs once the caller commits"""
+    if name not in _handlers:
+        raise KeyError(f"No job handler registered for '{name}'")
+
+    record = Job(
+        name=name,
+        payload=payload,
+        status='pending',
+        attempts=0,
+        max_attempts=_handlers[name][1],
+        run_at=datetime.utcnow() + (delay or timedelta(0))
+    )
+    db.session.add(record)
+    if has_request_context():
+        g.jobs_enqueued = True
+    return record
+
+
+class JobRunner:
+    def __init__(self, app=None):
+        self.app = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('JOB_WORKERS', int(os.getenv('JOB_WORKERS', 2)))
+        app.config.setdefault('JOB_POLL_INTERVAL', 5)        # seconds between idle polls
+        app.config.setdefault('JOB_RETRY_BASE', 10)          # first retry delay in seconds
+        # Running jobs without a heartbeat for JOB_LOCK_TIMEOUT seconds are taken back
+        app.config.setdefault('JOB_LOCK_TIMEOUT', int(os.getenv('JOB_LOCK_TIMEOUT', 600)))
+        app.config.setdefault('JOB_HEARTBEAT_INTERVAL', int(os.getenv('JOB_HEARTBEAT_INTERVAL', 30)))
+        app.extensions['jobs'] = self
+
+        @app.after_request
+        def wake_job_runner(response):
+            if g.get('jobs_enqueued'):
+                self.wake()
+            return response
+
+    def wake(self):
+        """Start the in-process dispatcher if needed and poke it"""
+        if self.app.config['JOB_WORKERS'] <= 0:
+            return
+        self._ensure_started()
+        self._wakeup.set()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so check the pid as well
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.app.config['JOB_WORKERS'], thread_name_prefix='job'
+            )
+            self._slots = threading.Semaphore(self.app.config['JOB_WORKERS'])
+            threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True).start()
+
+    def _dispatch_loop(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.app.config['JOB_POLL_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                self.dispatch(self._executor, self._slots)
+            except Exception:
+                logger.exception('Job dispatcher failed')
+
+    def dispatch(self, executor, slots):
+        """Claim as many due jobs as there are free workers and submit them"""
+        while slots.acquire(blocking=False):
+            with self.app.app_context():
+                claim = self.claim_next()
+            if claim is None:
+                slots.release()
+                return
+
+            def run(claim=claim):
+                try:
+                    self.run_job(*claim)
+                finally:
+                    slots.release()
+                    self._wakeup.set()
+            executor.submit(run)
+
+    def claim_next(self):
+        """Atomically move one due job from pending to running; returns (job id, lock token) or None"""
+        now = datetime.utcnow()
+
+        # Take back jobs whose worker died mid-run; a crash counts as an attempt
+        stale = now - timedelta(seconds=self.app.config['JOB_LOCK_TIMEOUT'])
+        lost = (Job.status == 'running', Job.locked_at < stale)
+        db.session.execute(
+            db.update(Job)
+            .where(*lost, Job.attempts >= Job.max_attempts)
+            .values(status='failed', locked_at=None, locked_by=None, finished_at=now,
+                    last_error='Worker stopped sending heartbeats')
+        )
+        db.session.execute(
+            db.update(Job)
+            .where(*lost)
+            .values(status='pending', locked_at=None, locked_by=None)
+        )
+
+        candidates = db.session.execute(
+            db.select(Job.id)
+            .where(Job.status == 'pending', Job.run_at <= now)
+            .order_by(Job.run_at)
+            .limit(5)
+        ).scalars().all()
+
+        for job_id in candidates:
+            token = uuid.uuid4().hex
+            claimed = db.session.execute(
+                db.update(Job)
+                .where(Job.id == job_id, Job.status == 'pending')
+                .values(status='running', locked_at=now, locked_by=token, attempts=Job.attempts + 1)
+            ).rowcount
+            if claimed:
+                db.session.commit()
+                return job_id, token
+
+        db.session.commit()
+        return None
+
+    def _heartbeat(self, job_id, token, stop):
+        """Keep the lock of a running job fresh until `stop` is set"""
+        while not stop.wait(self.app.config['JOB_HEARTBEAT_INTERVAL']):
+            try:
+                with self.app.app_context():
+                    db.session.execute(
+                        db.update(Job).where(Job.id == job_id, Job.locked_by == token)
+                        .values(locked_at=datetime.utcnow())
+                    )
+                    db.session.commit()
+            except Exception:
+                logger.exception('Heartbeat of job %s failed', job_id)
+
+    def _release(self, job_id, token, **values):
+        """Record the outcome, unless the lock was lost and another worker owns the job now"""
+        released = db.session.execute(
+            db.update(Job).where(Job.id == job_id, Job.locked_by == token)
+            .values(locked_at=None, locked_by=None, **values)
+        ).rowcount
+        db.session.commit()
+        if not released:
+            logger.warning('Job %s lost its lock while running; leaving it to its new owner', job_id)
+
+    def run_job(self, job_id, token):
+        with self.app.app_context():
+            record = db.session.get(Job, job_id)
+            name, payload, attempts, max_attempts = record.name, record.payload or {}, record.attempts, record.max_attempts
+            db.session.rollback()
+
+            stop = threading.Event()
+            threading.Thread(
+                target=self._heartbeat, args=(job_id, token, stop), name=f'job-{job_id}-heartbeat', daemon=True
+            ).start()
+            try:
+                handler = _handlers[name][0]
+                handler(**payload)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                error = traceback.format_exc()
+                logger.warning('Job %s (%s) failed on attempt %s', job_id, name, attempts)
+
+                values = {'last_error': error[-4000:]}
+                if attempts >= max_attempts:
+                    values.update(status='failed', finished_at=datetime.utcnow())
+                else:
+                    # Exponential backoff with jitter
+                    delay = self.app.config['JOB_RETRY_BASE'] * 2 ** (attempts - 1)
+                    delay *= random.uniform(0.8, 1.2)
+                    values.update(status='pending', run_at=datetime.utcnow() + timedelta(seconds=delay))
+                self._release(job_id, token, **values)
+                return False
+            finally:
+                stop.set()
+
+            self._release(job_id, token, status='done', finished_at=datetime.utcnow())
+            return True
+
+    def run_forever(self, workers=None):
+        """Blocking worker loop used by worker.py"""
+        workers = workers or max(self.app.config['JOB_WORKERS'], 1)
+        slots = threading.Semaphore(workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') as executor:
+            self._executor = executor
+            while not self._stopping.is_set():
+                self.dispatch(executor, slots)
+                self._wakeup.wait(self.app.config['JOB_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+    def run_pending(self):
+        """Run every due job in the calling thread and return how many ran"""
+        count = 0
+        while True:
+            with self.app.app_context():
+                claim = self.claim_next()
+            if claim is None:
+                return count
+            self.run_job(*claim)
+            count += 1
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+
+job_runner = JobRunner()
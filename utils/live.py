@@ -0,0 +1,200 @@
+"""Live workout-session events for the SSE stream (GET /api/today/stream).
+
+Handlers call `publish` inside their transaction. Events are delivered
+only once that transaction commits, to every open stream of the user:
+
+- memory backend: the session's after_commit hook hands them to this
+  process's Broker. Enough for a single web process.
+- postgres backend: `pg_notify` is sent in the transaction itself, so
+  Postgres delivers it on commit to every process, where a listener
+  thread feeds the local Broker.
+
+Each stream has a bounded queue. A stream that falls behind is marked
+overflowed and told to resync (refetch the summary) instead of blocking
+publishers or growing without bound.
+
+EventSource can't send an Authorization header, and URLs end up in proxy
+and access logs, so streams are opened with a stream ticket rather than
+the access token: signed, good for LIVE_STREAM_TICKET_SECONDS and only
+accepted by the stream endpoint.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import NullPool
+
+from models import db
+from utils.replica import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'session_events'
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, user_id, maxsize=QUEUE_SIZE):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def get(self, timeout):
+        """The next event dict, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    """In-process fan-out of events to the user's subscriptions"""
+
+    def __init__(self):
+        self._subscriptions = {}  # user_id -> set of Subscription
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, maxsize=QUEUE_SIZE, per_user=None, total=None):
+        """A new Subscription, or None if the user or the process already has as many as allowed"""
+        subscription = Subscription(user_id, maxsize)
+        with self._lock:
+            subscriptions = self._subscriptions.get(user_id, set())
+            if per_user is not None and len(subscriptions) >= per_user:
+                return None
+            if total is not None and sum(map(len, self._subscriptions.values())) >= total:
+                return None
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def deliver(self, user_id, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                subscription.overflowed = True
+
+
+broker = Broker()
+
+
+class PostgresListener(threading.Thread):
+    """LISTENs on CHANNEL with its own connection and passes notifications to the broker"""
+
+    def __init__(self, url):
+        super().__init__(name='live-events-listener', daemon=True)
+        # Unpooled: the connection is held for the life of the process and must not use up a pool slot
+        self.engine = create_engine(url, poolclass=NullPool)
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception('Live event listener lost its connection, reconnecting')
+                time.sleep(1)
+
+    def _listen(self):
+        connection = self.engine.raw_connection()
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            dbapi_connection.cursor().execute(f'LISTEN {CHANNEL}')
+            while True:
+                if select.select([dbapi_connection], [], [], 30) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    message = json.loads(dbapi_connection.notifies.pop(0).payload)
+                    broker.deliver(message['user_id'], message)
+        finally:
+            connection.close()
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _backend():
+    return current_app.config.get('LIVE_EVENTS_BACKEND') or (
+        'postgres' if db.engine.dialect.name == 'postgresql' else 'memory'
+    )
+
+
+def subscribe(user_id):
+    """A Subscription for a new stream of the user, or None when the stream limits are reached.
+
+    Every stream ties up a worker thread for as long as it is open, so
+    LIVE_STREAMS_PER_USER and LIVE_STREAMS_MAX (per process, keep it below
+    the worker's thread count) leave threads for ordinary requests.
+    """
+    global _listener
+    if _backend() == 'postgres':
+        with _listener_lock:
+            if _listener is None:
+                _listener = PostgresListener(db.engine.url)
+                _listener.start()
+    config = current_app.config
+    return broker.subscribe(
+        user_id,
+        per_user=config.get('LIVE_STREAMS_PER_USER', 2),
+        total=config.get('LIVE_STREAMS_MAX', 8)
+    )
+
+
+def _ticket_serializer():
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt='live-stream-ticket')
+
+
+def issue_stream_ticket(claims):
+    """A stream ticket for the access token with `claims`"""
+    return _ticket_serializer().dumps({'sub': claims['sub'], 'jti': claims['jti'], 'exp': claims['exp']})
+
+
+def read_stream_ticket(ticket):
+    """The access token claims (sub, jti, exp) a ticket was issued for, or None if it is invalid or too old"""
+    try:
+        claims = _ticket_serializer().loads(ticket, max_age=current_app.config.get('LIVE_STREAM_TICKET_SECONDS', 60))
+    except BadSignature:  # also raised when expired
+        return None
+    return {**claims, 'type': 'access'}
+
+
+def unsubscribe(subscription):
+    broker.unsubscribe(subscription)
+
+
+def publish(user_id, event_type, data):
+    """Send an event to the user's streams once the current transaction commits"""
+    message = {'user_id': user_id, 'type': event_type, 'data': data}
+    if _backend() == 'postgres':
+        db.session.execute(text('SELECT pg_notify(:channel, :payload)'), {
+            'channel': CHANNEL, 'payload': json.dumps(message)
+        })
+    else:
+        db.session.info.setdefault('live_events', []).append(message)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _deliver_committed(session):
+    for message in session.info.pop('live_events', ()):
+        broker.deliver(message['user_id'], message)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _drop_rolled_back(session):
+    session.info.pop('live_events', None)
@@ -0,0 +1,201 @@
+"""Muscle taxonomy shared by the exercise catalog, splits and progress queries"""
+import re
+from datetime import timedelta
+
+# Default exercises organized by muscle group and specific muscle
+DEFAULT_EXERCISES = {
+    'chest': {
+        'upper_chest': ['Incline Barbell Press', 'Incline Dumbbell Press', 'Cable Fly'],
+        'middle_chest': ['Flat Barbell Bench Press', 'Flat Dumbbell Press', 'Pec-Dec Fly', 'Push-ups'],
+        'lower_chest': ['Decline Barbell Press', 'Decline Dumbbell Press', 'Dips']
+    },
+    'back': {
+        'lats': ['Pull-ups', 'Lat Pulldown', 'Dumbbell Row', 'One Arm Half-Kneeling Lat'],
+        'upper_back': ['Face Pulls', 'Reverse Fly', 'Seated Cable Row'],
+        'lower_back': ['Deadlift', 'Romanian Deadlift', 'Back Extensions', 'Good Mornings'],
+        'traps': ['Barbell Shrugs', 'Dumbbell Shrugs', 'Farmer Walks', 'Rack Pulls'],
+        'rhomboids': ['Bent Over Row', 'T-Bar Row', 'Chest Supported Row', 'Inverted Row']
+    },
+    'shoulders': {
+        'front_delt': ['Overhead Press', 'Front Raise', 'Arnold Press'],
+        'side_delt': ['Lateral Raise', 'Dumbbell Lateral Raise', 'Cable Lateral Raise', 'Upright Row'],
+        'rear_delt': ['Reverse Fly', 'Face Pulls', 'Bent Over Lateral Raise', 'Rear Delt Row']
+    },
+    'biceps': {
+        'short_head': ['Preacher Curl', 'Spider Curl', 'Concentration Curl'],
+        'long_head': ['Incline Dumbbell Curl', 'Drag Curl', 'Bayesian Curl'],
+        'brachialis': ['Hammer Curl', 'Reverse Curl', 'Cross Body Hammer Curl']
+    },
+    'triceps': {
+        'long_head': ['Overhead Extension', 'Skull Crushers', 'French Press'],
+        'lateral_head': ['Tricep Pushdown', 'Close Grip Bench Press', 'Diamond Push-ups'],
+        'medial_head': ['Reverse Grip Pushdown', 'Tricep Dips', 'Kickbacks']
+    },
+    'forearms': {
+        'forearms': ['Wrist Curl', 'Reverse Wrist Curl', 'Farmers Walk', 'Wrist Roller', 'Reverse Barbell Curl']
+    },
+    'legs': {
+        'quads': ['Squat', 'Smith Machine Squat', 'Leg Press', 'Leg Extension', 'Lunges'],
+        'hamstrings': ['Romanian Deadlift', 'Leg Curl', 'Good Mornings', 'Nordic Curls'],
+        'glutes': ['Hip Thrust', 'Bulgarian Split Squat', 'Glute Bridge', 'Cable Kickbacks'],
+        'calves': ['Standing Calf Raise', 'Seated Calf Raise', 'Calf Press']
+    },
+    'core': {
+        'abs': ['Crunches', 'Leg Raise', 'Cable Crunch', 'Ab Wheel', 'Plank'],
+        'obliques': ['Russian Twist', 'Side Plank', 'Woodchoppers', 'Bicycle Crunches']
+    }
+}
+
+
+def iter_muscles():
+    """(muscle_group, specific_muscle) pairs in catalog order"""
+    for muscle_group, specific_muscles in DEFAULT_EXERCISES.items():
+        for specific_muscle in specific_muscles:
+            yield muscle_group, specific_muscle
+
+
+MUSCLE_GROUPS = list(DEFAULT_EXERCISES)
+
+
+def week_start(day):
+    """Monday of the week containing `day`"""
+    return day - timedelta(days=day.weekday())
+
+
+# Bit index of each (muscle_group, specific_muscle) pair, stored in
+# split_days.muscle_mask, exercise_suggestions.muscle_mask and muscles.position.
+# Pinned rather than derived from the catalog's order: a pair keeps its index
+# forever, new muscles take the next free one and removed ones leave a gap.
+MUSCLE_POSITIONS = {
+    ('chest', 'upper_chest'): 0,
+    ('chest', 'middle_chest'): 1,
+    ('chest', 'lower_chest'): 2,
+    ('back', 'lats'): 3,
+    ('back', 'upper_back'): 4,
+    ('back', 'lower_back'): 5,
+    ('back', 'traps'): 6,
+    ('back', 'rhomboids'): 7,
+    ('shoulders', 'front_delt'): 8,
+    ('shoulders', 'side_delt'): 9,
+    ('shoulders', 'rear_delt'): 10,
+    ('biceps', 'short_head'): 11,
+    ('biceps', 'long_head'): 12,
+    ('biceps', 'brachialis'): 13,
+    ('triceps', 'long_head'): 14,
+    ('triceps', 'lateral_head'): 15,
+    ('triceps', 'medial_head'): 16,
+    ('forearms', 'forearms'): 17,
+    ('legs', 'quads'): 18,
+    ('legs', 'hamstrings'): 19,
+    ('legs', 'glutes'): 20,
+    ('legs', 'calves'): 21,
+    ('core', 'abs'): 22,
+    ('core', 'obliques'): 23,
+}
+_unassigned = set(iter_muscles()) - set(MUSCLE_POSITIONS)
+if _unassigned:
+    raise RuntimeError(f'No bit assigned to catalog muscles {sorted(_unassigned)}; add them to MUSCLE_POSITIONS')
+
+MUSCLE_BITS = {pair: 1 << idx for pair, idx in MUSCLE_POSITIONS.items()}
+
+GROUP_MASKS = {}
+for (muscle_group, _), bit in MUSCLE_BITS.items():
+    GROUP_MASKS[muscle_group] = GROUP_MASKS.get(muscle_group, 0) | bit
+
+SPECIFIC_MASKS = {}
+QUALIFIED_MASKS = {}
+for (muscle_group, specific_muscle), bit in MUSCLE_BITS.items():
+    # long_head exists under both biceps and triceps
+    SPECIFIC_MASKS[specific_muscle] = SPECIFIC_MASKS.get(specific_muscle, 0) | bit
+    # 'biceps_long_head' names exactly one of them
+    QUALIFIED_MASKS[f'{muscle_group}_{specific_muscle}'] = bit
+
+# Specific muscles whose name is used in more than one group, formatted with their group
+AMBIGUOUS_MUSCLES = {name for name, mask in SPECIFIC_MASKS.items() if mask & (mask - 1)}
+
+# Common names used in split days that are not taxonomy keys
+MUSCLE_ALIASES = {
+    'arms': GROUP_MASKS['biceps'] | GROUP_MASKS['triceps'] | GROUP_MASKS['forearms'],
+    'delts': GROUP_MASKS['shoulders'],
+    'abdominals': GROUP_MASKS['core'],
+    'lat': SPECIFIC_MASKS['lats'],
+    'quad': SPECIFIC_MASKS['quads'],
+    'hamstring': SPECIFIC_MASKS['hamstrings'],
+    'glute': SPECIFIC_MASKS['glutes'],
+    'calf': SPECIFIC_MASKS['calves'],
+    'trap': SPECIFIC_MASKS['traps'],
+    'ab': SPECIFIC_MASKS['abs'],
+}
+
+
+def _token_mask(token):
+    key = token.strip().lower().replace('-', ' ').replace(' ', '_')
+    for candidate in (key, key.rstrip('s')):
+        mask = (
+            GROUP_MASKS.get(candidate) or SPECIFIC_MASKS.get(candidate)
+            or QUALIFIED_MASKS.get(candidate) or MUSCLE_ALIASES.get(candidate)
+        )
+        if mask:
+            return mask
+    return 0
+
+
+def parse_muscles(value):
+    """'Chest, Upper Back, Mobility' -> (bitmask, 'Mobility')
+
+    A name shared by several groups ('Long Head') means all of them; qualify
+    it with the group ('Triceps Long Head') to mean one.
+
+    Tokens outside the taxonomy can't be encoded and are returned as a
+    comma separated remainder so nothing the user typed is lost.
+    """
+    mask = 0
+    extra = []
+    for token in re.split(r'[,&/+]|\band\b', value or ''):
+        if not token.strip():
+            continue
+        token_mask = _token_mask(token)
+        if token_mask:
+            mask |= token_mask
+        else:
+            extra.append(token.strip())
+    return mask, ', '.join(extra) or None
+
+
+def _title(name):
+    return name.replace('_', ' ').title()
+
+
+def format_muscles(mask, extra=None):
+    """Inverse of parse_muscles: whole groups by name, otherwise their specific muscles.
+
+    A specific muscle whose name other groups share is qualified with its
+    group ('Biceps Long Head'), so parsing the result gives back `mask`.
+    """
+    names = []
+    for muscle_group, group_mask in GROUP_MASKS.items():
+        if mask & group_mask == group_mask:
+            names.append(_title(muscle_group))
+            continue
+        for (group, specific_muscle), bit in MUSCLE_BITS.items():
+            if group == muscle_group and mask & bit:
+                if specific_muscle in AMBIGUOUS_MUSCLES:
+                    names.append(_title(f'{group}_{specific_muscle}'))
+                else:
+                    names.append(_title(specific_muscle))
+    if extra:
+        names.append(extra)
+    return ', '.join(names) or None
+
+
+def muscle_mask(*names):
+    """Bitmask for muscle group / specific muscle names, e.g. muscle_mask('legs')"""
+    mask = 0
+    for name in names:
+        mask |= _token_mask(name)
+    return mask
+
+
+def trains(column, mask):
+    """SQL predicate: the muscle bitmask column overlaps `mask`"""
+    return column.op('&')(mask) != 0
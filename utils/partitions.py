@@ -0,0 +1,93 @@
+"""Monthly range partitions of workout_sets on Postgres.
+
+workout_sets is partitioned by month on `timestamp` (migration
+5d1f8a3b7e20), with a default partition catching anything outside the
+months that exist. Partitions are created by manage_partitions.py, run
+daily: the months ahead for new sets, and the months back for imported
+history (the importer only accepts dates in that window). Creating a
+partition takes DDL and moves rows out of the default partition, so it
+never happens in a request. On other databases the table is a plain table
+and everything here is a no-op.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+PARTITIONED_TABLE = 'workout_sets'
+DEFAULT_PARTITION = 'workout_sets_default'
+PARTITION_MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARTITIONED_TABLE}_{month:%Y_%m}'
+
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid))"
+    ), {'table': PARTITIONED_TABLE}).scalar()
+
+
+def existing_partitions(connection):
+    return {name for (name,) in connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {'table': PARTITIONED_TABLE})}
+
+
+def create_partition(connection, month):
+    """Attach the partition for `month`, moving any of its rows out of the default partition"""
+    name = partition_name(month)
+    bounds = {'start': month, 'end': add_months(month, 1)}
+    connection.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    # ATTACH fails while the default partition still holds rows for this month
+    connection.execute(text(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :start AND "timestamp" < :end RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved'
+    ), bounds)
+    connection.execute(text(
+        f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+    return name
+
+
+def ensure_partitions(connection, first=None, last=None, months_ahead=PARTITION_MONTHS_AHEAD, months_back=0):
+    """Create the monthly partitions from `first` through `last`.
+
+    `first` defaults to this month minus `months_back`, `last` to this month plus `months_ahead`.
+
+    Returns the names of the partitions created.
+    """
+    if not is_partitioned(connection):
+        return []
+
+    # Serialize concurrent callers (importer, cron) for the rest of the transaction
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:table))"), {'table': PARTITIONED_TABLE})
+
+    today = month_start(datetime.utcnow())
+    month = month_start(first or add_months(today, -months_back))
+    last = month_start(last or add_months(today, months_ahead))
+
+    existing = existing_partitions(connection)
+    created = []
+    while month <= last:
+        if partition_name(month) not in existing:
+            created.append(create_partition(connection, month))
+        month = add_months(month, 1)
+    return created
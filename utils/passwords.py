@@ -0,0 +1,75 @@
+"""Password hashing with configurable cost.
+
+PASSWORD_HASH_METHOD takes a werkzeug method string, e.g. "scrypt:16384:8:1"
+or "pbkdf2:sha256:300000". Stored hashes made with other parameters are
+still accepted and are rehashed on the next successful login
+(`needs_rehash`), so the cost can be changed without resetting passwords.
+
+Hashing and verification run on a small shared thread pool (hashlib
+releases the GIL while hashing), so a burst of signups or logins is capped
+at PASSWORD_VERIFY_WORKERS cores instead of occupying every request thread.
+When the pool's queue is full `hash_password` and `verify_password` raise
+VerifierBusy rather than queueing forever.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt'
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+class VerifierBusy(Exception):
+    """Too many password hashes or checks are already queued"""
+
+
+def hash_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD
+
+
+@lru_cache(maxsize=8)
+def _stored_prefix(method):
+    # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"); hash once to see them
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """True if `password_hash` was made with parameters other than the configured ones"""
+    return password_hash.split('$', 1)[0] != _stored_prefix(hash_method())
+
+
+def _pool():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = current_app.config.get('PASSWORD_VERIFY_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            # Running plus waiting checks
+            _slots = threading.BoundedSemaphore(workers * current_app.config.get('PASSWORD_VERIFY_QUEUE', 8))
+    return _executor, _slots
+
+
+def _run(fn, *args, timeout):
+    executor, slots = _pool()
+    if not slots.acquire(timeout=timeout):
+        raise VerifierBusy()
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password, timeout=5):
+    """generate_password_hash on the pool. Raises VerifierBusy if no slot frees up within `timeout` seconds."""
+    return _run(generate_password_hash, password, hash_method(), timeout=timeout)
+
+
+def verify_password(password_hash, password, timeout=5):
+    """check_password_hash on the pool. Raises VerifierBusy if no slot frees up within `timeout` seconds."""
+    return _run(check_password_hash, password_hash, password, timeout=timeout)
@@ -0,0 +1,30 @@
+"""Deferred work that runs after a workout is finished"""
+from models import db, WorkoutSession
+from utils.analytics import user_analytics
+from utils.cache import invalidate_user_on_commit
+from utils.jobs import job
+from utils.records import record_session
+from utils.snapshots import append_session, snapshots_enabled
+from utils.suggestions import refresh_suggestions
+
+
+@job('workout_finished')
+def workout_finished(session_id):
+    """Post-workout processing, kept off the finish request path.
+
+    Safe to retry: the records upsert keeps the better values and the other
+    steps recompute from the committed history.
+    """
+    session = db.session.get(WorkoutSession, session_id)
+    if not session or not session.completed:
+        return
+
+    record_session(session.user_id, session.id)
+    refresh_suggestions(session.user_id)
+    if snapshots_enabled():
+        append_session(session)
+    # Best lifts and suggestions changed after the finish request was cached
+    invalidate_user_on_commit(db.session, session.user_id)
+
+    # Warm the dashboard's analytics; its key follows the completed history, not the cache version
+    user_analytics(session.user_id)
@@ -0,0 +1,99 @@
+"""Token bucket rate limiting.
+
+Each key (a login email, a user id) gets a bucket of `capacity` tokens
+refilled at `rate` tokens per second. Limits are configured per scope in
+RATE_LIMITS as (capacity, tokens per second).
+
+Buckets are kept by a store. The default MemoryStore holds them in this
+process, so with several workers the effective limit is per worker. To
+share buckets between workers, point RATE_LIMIT_STORE at a class
+("package.module:Class") with the same `take` method backed by shared
+storage.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt_identity
+from werkzeug.utils import import_string
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class MemoryStore:
+    """Buckets in this process's memory"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def _refill(self, key, now, capacity, rate):
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        return min(capacity, tokens + (now - updated) * rate)
+
+    def take(self, key, tokens, capacity, rate):
+        """Consume `tokens` from `key`'s bucket. Returns 0 if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            available = self._refill(key, now, capacity, rate)
+            if available < tokens:
+                self._buckets[key] = (available, now)
+                return (tokens - available) / rate
+            self._buckets[key] = (available - tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now, capacity, rate)
+        return 0
+
+    def _prune(self, now, capacity, rate):
+        # Buckets that have refilled completely carry no state
+        for key in [k for k in self._buckets if self._refill(k, now, capacity, rate) >= capacity]:
+            del self._buckets[key]
+        # Still over: forget the oldest keys, which only makes the limit more lenient
+        while len(self._buckets) > self.max_keys:
+            del self._buckets[next(iter(self._buckets))]
+
+
+class TokenBucket:
+    def __init__(self, capacity, rate, store=None):
+        self.capacity = capacity
+        self.rate = rate
+        self.store = store or MemoryStore()
+
+    def take(self, key, tokens=1):
+        """Returns 0 if allowed, else seconds until `tokens` would be available"""
+        return self.store.take(key, tokens, self.capacity, self.rate)
+
+
+def bucket(scope):
+    """The app's TokenBucket for a RATE_LIMITS scope, e.g. 'login' or 'reads'"""
+    with _buckets_lock:
+        if scope not in _buckets:
+            capacity, rate = current_app.config['RATE_LIMITS'][scope]
+            store_path = current_app.config.get('RATE_LIMIT_STORE')
+            store = import_string(store_path)() if store_path else MemoryStore()
+            _buckets[scope] = TokenBucket(capacity, rate, store)
+        return _buckets[scope]
+
+
+def retry_later(message, status, seconds):
+    response = jsonify({'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(seconds)))
+    return response
+
+
+def rate_limited(scope):
+    """Limit a jwt_required view per user with the `scope` bucket, answering 429 when it's empty"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            wait = bucket(scope).take(f'{scope}:{get_jwt_identity()}')
+            if wait:
+                return retry_later('too many requests', 429, wait)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,223 @@
+"""Personal records from finished workouts.
+
+Records are folded in by the workout_finished job once a workout is
+finished, so sets from a session that is still open or gets cancelled
+never count. They are keyed by
+exercise id (by name only for sets logged without one) and written with
+an INSERT ... ON CONFLICT DO UPDATE that keeps the better of the stored
+and the new values, so concurrent finishes can't overwrite each other.
+"""
+import itertools
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, case, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, PersonalRecord, RepRecord, WorkoutSet, WorkoutSession
+from utils.archive import archived_sets
+from utils.cache import invalidate_user_on_commit
+from utils.jobs import job
+
+
+def epley(weight, reps):
+    if reps <= 1:
+        return weight
+    return weight * (1 + reps / 30)
+
+
+def brzycki(weight, reps):
+    if reps <= 1:
+        return weight
+    # The formula breaks down past ~36 reps; fall back to Epley there
+    if reps >= 37:
+        return epley(weight, reps)
+    return weight * 36 / (37 - reps)
+
+
+E1RM_FORMULAS = {'epley': epley, 'brzycki': brzycki}
+
+
+def estimate_1rm(weight, reps):
+    """Estimated one rep max using the configured formula (E1RM_FORMULA)"""
+    formula = E1RM_FORMULAS[current_app.config.get('E1RM_FORMULA', 'epley')]
+    return round(formula(weight, reps), 2)
+
+
+def _exercise_key(exercise_id, exercise_name):
+    return exercise_id or exercise_name
+
+
+def _fold(sets):
+    """Records from (exercise_id, exercise_name, session_id, reps, weight, timestamp) rows
+
+    Returns ({exercise key: personal record values}, {(exercise key, weight): rep record values}).
+    """
+    best, session_volumes, reps_at_weight = {}, {}, {}
+    for exercise_id, name, session_id, reps, weight, timestamp in sets:
+        key = _exercise_key(exercise_id, name)
+        e1rm = estimate_1rm(weight, reps)
+        r = best.setdefault(key, {
+            'exercise_id': exercise_id, 'best_weight': 0, 'best_weight_reps': 0,
+            'best_e1rm': 0, 'best_e1rm_weight': 0, 'best_e1rm_reps': 0,
+            'best_session_volume': 0, 'best_session_id': None
+        })
+        # The latest name wins if an exercise was renamed
+        r['exercise_name'] = name
+        if (weight, reps) > (r['best_weight'], r['best_weight_reps']):
+            r['best_weight'], r['best_weight_reps'] = weight, reps
+        if e1rm > r['best_e1rm']:
+            r['best_e1rm'], r['best_e1rm_weight'], r['best_e1rm_reps'] = e1rm, weight, reps
+        session_volumes[(key, session_id)] = session_volumes.get((key, session_id), 0) + reps * weight
+        if (key, weight) not in reps_at_weight or reps > reps_at_weight[(key, weight)][2]:
+            reps_at_weight[(key, weight)] = (exercise_id, name, reps, timestamp)
+
+    for (key, session_id), volume in session_volumes.items():
+        if volume > best[key]['best_session_volume']:
+            best[key]['best_session_volume'] = volume
+            best[key]['best_session_id'] = session_id
+    return best, reps_at_weight
+
+
+def _insert(model):
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model)
+
+
+def _upsert(model, rows, columns, updates):
+    """Insert `rows`, merging into existing records with `updates(new, old)` on conflict.
+
+    Rows with an exercise id conflict on the id; the rest on the exercise
+    name, through the partial unique index over rows without an id.
+    """
+    by_id = [row for row in rows if row['exercise_id'] is not None]
+    by_name = [row for row in rows if row['exercise_id'] is None]
+    for batch, key, where in (
+        (by_id, 'exercise_id', None),
+        (by_name, 'exercise_name', model.exercise_id.is_(None)),
+    ):
+        if not batch:
+            continue
+        statement = _insert(model)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', key, *columns],
+            index_where=where,
+            set_=updates(statement.excluded, model.__table__.c)
+        )
+        db.session.execute(statement, batch)
+
+
+def _personal_record_updates(new, old):
+    heavier = or_(
+        new.best_weight > old.best_weight,
+        and_(new.best_weight == old.best_weight, new.best_weight_reps > old.best_weight_reps)
+    )
+    stronger = new.best_e1rm > old.best_e1rm
+    bigger = new.best_session_volume > old.best_session_volume
+    return {
+        'exercise_name': new.exercise_name,
+        'best_weight': case((heavier, new.best_weight), else_=old.best_weight),
+        'best_weight_reps': case((heavier, new.best_weight_reps), else_=old.best_weight_reps),
+        'best_e1rm': case((stronger, new.best_e1rm), else_=old.best_e1rm),
+        'best_e1rm_weight': case((stronger, new.best_e1rm_weight), else_=old.best_e1rm_weight),
+        'best_e1rm_reps': case((stronger, new.best_e1rm_reps), else_=old.best_e1rm_reps),
+        'best_session_volume': case((bigger, new.best_session_volume), else_=old.best_session_volume),
+        'best_session_id': case((bigger, new.best_session_id), else_=old.best_session_id),
+        'updated_at': new.updated_at,
+    }
+
+
+def _rep_record_updates(new, old):
+    more = new.reps > old.reps
+    return {
+        'exercise_name': new.exercise_name,
+        'reps': case((more, new.reps), else_=old.reps),
+        'achieved_at': case((more, new.achieved_at), else_=old.achieved_at),
+    }
+
+
+def _save(user_id, best, reps_at_weight):
+    now = datetime.utcnow()
+    _upsert(PersonalRecord, [
+        {'user_id': user_id, 'updated_at': now, **values} for values in best.values()
+    ], [], _personal_record_updates)
+    _upsert(RepRecord, [
+        {'user_id': user_id, 'exercise_id': exercise_id, 'exercise_name': name,
+         'weight': weight, 'reps': reps, 'achieved_at': timestamp}
+        for (_, weight), (exercise_id, name, reps, timestamp) in reps_at_weight.items()
+    ], ['weight'], _rep_record_updates)
+
+
+def _set_rows():
+    return db.session.query(
+        WorkoutSet.exercise_id, WorkoutSet.exercise_name, WorkoutSet.session_id,
+        WorkoutSet.reps, WorkoutSet.weight, WorkoutSet.timestamp
+    )
+
+
+def record_session(user_id, session_id):
+    """Fold a finished session's sets into the user's records (run again, it changes nothing)"""
+    _save(user_id, *_fold(_set_rows().filter(WorkoutSet.session_id == session_id)))
+
+
+def beaten_records(user_id, workout_set, session_volume):
+    """Record types a just-added set beats so far ('weight', 'reps', 'e1rm', 'volume').
+
+    Compares against the stored records, which only cover finished workouts,
+    and the earlier sets of the same exercise in this session; nothing is
+    written. `session_volume` is the exercise's volume in this session
+    including the new set. The first time an exercise is ever done sets the
+    baseline and is not reported.
+    """
+    if workout_set.exercise_id:
+        key = {'exercise_id': workout_set.exercise_id}
+    else:
+        key = {'exercise_id': None, 'exercise_name': workout_set.exercise_name}
+    record = PersonalRecord.query.filter_by(user_id=user_id, **key).first()
+    if not record:
+        return []
+
+    weight, reps = workout_set.weight, workout_set.reps
+    earlier = db.session.query(WorkoutSet.weight, WorkoutSet.reps).filter(
+        WorkoutSet.session_id == workout_set.session_id,
+        WorkoutSet.set_number < workout_set.set_number
+    ).filter_by(**key).all()
+
+    beaten = []
+    if weight > max([record.best_weight] + [w for w, _ in earlier]):
+        beaten.append('weight')
+    rep_record = RepRecord.query.filter_by(user_id=user_id, weight=weight, **key).first()
+    if rep_record and reps > max([rep_record.reps] + [r for w, r in earlier if w == weight]):
+        beaten.append('reps')
+    if estimate_1rm(weight, reps) > max([record.best_e1rm] + [estimate_1rm(w, r) for w, r in earlier]):
+        beaten.append('e1rm')
+    # Volume keeps climbing set by set; only the set that overtakes the best counts
+    if session_volume - weight * reps <= record.best_session_volume < session_volume:
+        beaten.append('volume')
+    return beaten
+
+
+def rebuild_records(user_id):
+    """Recompute the user's records from all of their finished workouts.
+
+    Used after bulk imports and to repair drift (rebuild_records.py).
+    """
+    PersonalRecord.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    RepRecord.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+    query = _set_rows().join(WorkoutSession, WorkoutSession.id == WorkoutSet.session_id).filter(
+        WorkoutSession.user_id == user_id,
+        WorkoutSession.completed == True
+    )
+    # Records cover the archived years too; only completed sessions are archived
+    archived = (
+        (s.exercise_id, s.exercise_name, s.session_id, s.reps, s.weight, s.timestamp)
+        for s in archived_sets(user_id)
+    )
+    _save(user_id, *_fold(itertools.chain(archived, query.yield_per(5000))))
+
+
+@job('rebuild_personal_records')
+def rebuild_personal_records(user_id):
+    rebuild_records(user_id)
+    invalidate_user_on_commit(db.session, user_id)
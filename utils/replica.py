@@ -0,0 +1,51 @@
+"""Read-replica routing.
+
+When DATABASE_REPLICA_URL is set, requests marked with
+`read_only(replica=True)` run their queries against the replica engine.
+Everything else, and every flush, goes to the primary. A user who wrote
+within the last REPLICA_STALENESS_WINDOW seconds reads from the primary,
+so they see their own writes even if the replica is lagging.
+"""
+import threading
+import time
+
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+# user_id -> monotonic time of the user's last committed write in this process
+_last_write = {}
+_last_write_lock = threading.Lock()
+LAST_WRITE_MAX_ENTRIES = 10000
+
+
+def note_write(user_id):
+    """Remember that `user_id` just committed, so their next reads stay on the primary"""
+    now = time.monotonic()
+    with _last_write_lock:
+        _last_write[user_id] = now
+        if len(_last_write) > LAST_WRITE_MAX_ENTRIES:
+            # Entries past the staleness window no longer affect routing
+            cutoff = now - current_app.config['REPLICA_STALENESS_WINDOW']
+            for stale in [uid for uid, at in _last_write.items() if at < cutoff]:
+                del _last_write[stale]
+
+
+def replica_available():
+    return REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {})
+
+
+def replica_is_fresh_for(user_id):
+    """True unless the user wrote recently enough that the replica may not have it yet"""
+    last = _last_write.get(user_id)
+    return last is None or time.monotonic() - last > current_app.config['REPLICA_STALENESS_WINDOW']
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica during requests routed there"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('read_replica'):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,129 @@
+"""Token revocation without a database lookup per request.
+
+Revoked token ids (jti) are stored in revoked_tokens and mirrored into an
+in-memory Bloom filter in each process. Checking an access token is a few
+hash computations: a token the filter has never seen is accepted straight
+away, and only the rare "maybe revoked" answer (a revoked token or a false
+positive) is confirmed against the database. Refresh tokens are always
+checked against the database, because rotation has to be exact and
+refreshes are infrequent.
+
+Each process picks up revocations made elsewhere every
+REVOCATION_SYNC_SECONDS, and rebuilds its filter from the unexpired rows
+every REVOCATION_REBUILD_SECONDS so expired entries drop out. The rebuild
+also deletes rows whose token has expired: those tokens fail validation
+on their own, so the row is no longer needed.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db, RevokedToken
+
+BLOOM_BITS = 1 << 20    # 128 KiB, ~1% false positives at 100k revoked tokens
+BLOOM_HASHES = 7
+PRUNE_GRACE = timedelta(minutes=5)  # kept a little past expiry, for clock skew between hosts
+
+
+class BloomFilter:
+    def __init__(self, bits=BLOOM_BITS, hashes=BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray(bits // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """This process's Bloom filter of revoked jtis, kept in step with revoked_tokens"""
+
+    def __init__(self):
+        self._filter = BloomFilter()
+        self._last_id = 0
+        self._next_sync = 0.0
+        self._next_rebuild = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, jti):
+        with self._lock:
+            self._filter.add(jti)
+
+    def might_contain(self, jti):
+        self._sync()
+        return jti in self._filter
+
+    def _sync(self):
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        with self._lock:
+            if now < self._next_sync:
+                return
+            rebuild = now >= self._next_rebuild
+            utcnow = datetime.utcnow()
+            # Own connection, so the check never joins (or ends) the request's transaction
+            query = db.select(RevokedToken.id, RevokedToken.jti).where(RevokedToken.expires_at > utcnow)
+            if not rebuild:
+                query = query.where(RevokedToken.id > self._last_id)
+            with db.engine.begin() as connection:
+                if rebuild:
+                    connection.execute(db.delete(RevokedToken).where(RevokedToken.expires_at < utcnow - PRUNE_GRACE))
+                rows = connection.execute(query).all()
+
+            bloom = BloomFilter() if rebuild else self._filter
+            for row_id, jti in rows:
+                bloom.add(jti)
+                self._last_id = max(self._last_id, row_id)
+            self._filter = bloom
+
+            config = current_app.config
+            self._next_sync = now + config.get('REVOCATION_SYNC_SECONDS', 30)
+            if rebuild:
+                self._next_rebuild = now + config.get('REVOCATION_REBUILD_SECONDS', 3600)
+
+
+revocations = RevocationList()
+
+
+def _in_database(jti):
+    with db.engine.connect() as connection:
+        return connection.execute(db.select(RevokedToken.id).where(RevokedToken.jti == jti)).first() is not None
+
+
+def is_revoked(jwt_header, jwt_payload):
+    """Flask-JWT-Extended token_in_blocklist_loader"""
+    jti = jwt_payload['jti']
+    if jwt_payload.get('type') == 'refresh':
+        return _in_database(jti)
+    return revocations.might_contain(jti) and _in_database(jti)
+
+
+def revoke(jwt_payload, user_id):
+    """Add the token to revoked_tokens in the caller's transaction.
+
+    A concurrent revocation of the same token (e.g. the same refresh token
+    used twice) fails the flush with an IntegrityError.
+    """
+    db.session.add(RevokedToken(
+        jti=jwt_payload['jti'],
+        token_type=jwt_payload.get('type', 'access'),
+        user_id=user_id,
+        expires_at=datetime.utcfromtimestamp(jwt_payload['exp'])
+    ))
+    db.session.flush()
+    # Effective in this process right away; other processes pick it up on their next sync
+    revocations.add(jwt_payload['jti'])
@@ -0,0 +1,191 @@
+"""Memory-mapped per-user snapshots of completed set history.
+
+With SNAPSHOT_DIR set, each user's completed sets are kept on local disk
+as a flat array of fixed-width records (SET_DTYPE) that analytics reads
+through `numpy.memmap` instead of querying every set again. A JSON
+sidecar holds the record count, the names of name-only exercises and the
+history fingerprint the file matches.
+
+The workout_finished job appends the finished session. Any other change
+to completed history (imports, a missed append) shows up as a fingerprint
+mismatch on the next read, and the snapshot is rebuilt from the database.
+The files are a per-host cache and can be deleted at any time.
+"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from models import db, Exercise, WorkoutSession, WorkoutSet
+from utils.archive import read_archive
+
+# 18 bytes per set, no padding
+SET_DTYPE = np.dtype([('exercise_id', '<i4'), ('reps', '<u2'), ('weight', '<f4'), ('timestamp', '<i8')])
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def snapshots_enabled():
+    return bool(current_app.config.get('SNAPSHOT_DIR'))
+
+
+def completed_fingerprint(user_id, exclude_session_id=None):
+    """(completed session count, latest ended_at) - changes whenever completed history does"""
+    query = db.session.query(
+        db.func.count(WorkoutSession.id), db.func.max(WorkoutSession.ended_at)
+    ).filter(
+        WorkoutSession.user_id == user_id,
+        WorkoutSession.completed == True
+    )
+    if exclude_session_id is not None:
+        query = query.filter(WorkoutSession.id != exclude_session_id)
+    count, last_ended = query.one()
+    return count, last_ended
+
+
+def _encode_fingerprint(fingerprint):
+    count, last_ended = fingerprint
+    return [count, last_ended.isoformat() if last_ended else None]
+
+
+def _paths(user_id):
+    directory = current_app.config['SNAPSHOT_DIR']
+    base = os.path.join(directory, str(user_id))
+    return base + '.sets', base + '.json', base + '.lock'
+
+
+@contextmanager
+def _locked(user_id):
+    """Serialize writers for one user across threads and processes"""
+    os.makedirs(current_app.config['SNAPSHOT_DIR'], exist_ok=True)
+    with open(_paths(user_id)[2], 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_meta(user_id):
+    try:
+        with open(_paths(user_id)[1]) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_meta(user_id, meta):
+    path = _paths(user_id)[1]
+    with open(path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(path + '.tmp', path)
+
+
+def _to_records(exercise_ids, names, reps, weights, timestamps, name_only):
+    """Pack columns into SET_DTYPE records. Name-only sets get negative ids into `name_only`."""
+    ids = np.empty(len(exercise_ids), dtype=np.int32)
+    for i, (exercise_id, name) in enumerate(zip(exercise_ids, names)):
+        if exercise_id is not None and exercise_id >= 0:
+            ids[i] = exercise_id
+        else:
+            if name not in name_only:
+                name_only.append(name)
+            ids[i] = -(name_only.index(name) + 1)
+
+    records = np.empty(len(ids), dtype=SET_DTYPE)
+    records['exercise_id'] = ids
+    records['reps'] = np.clip(np.asarray(reps, dtype=np.int64), 0, np.iinfo(np.uint16).max)
+    records['weight'] = weights
+    records['timestamp'] = timestamps
+    return records
+
+
+def _epoch_seconds(values):
+    return np.fromiter(((t - EPOCH) // timedelta(seconds=1) for t in values), dtype=np.int64, count=len(values))
+
+
+def rebuild_snapshot(user_id):
+    """Write the user's snapshot from the database (archived years included) and return its meta"""
+    fingerprint = completed_fingerprint(user_id)
+    rows = (
+        db.session.query(WorkoutSet.exercise_id, WorkoutSet.exercise_name, WorkoutSet.reps, WorkoutSet.weight, WorkoutSet.timestamp)
+        .join(WorkoutSession, WorkoutSession.id == WorkoutSet.session_id)
+        .filter(WorkoutSession.user_id == user_id, WorkoutSession.completed == True)
+        .order_by(WorkoutSet.timestamp)
+        .all()
+    )
+    exercise_ids, names, reps, weights, timestamps = zip(*rows) if rows else ((), (), (), (), ())
+
+    name_only = []
+    parts = [_to_records(exercise_ids, names, reps, weights, _epoch_seconds(timestamps), name_only)]
+    archived = read_archive(user_id)
+    if archived is not None:
+        parts.insert(0, _to_records(
+            archived['exercise_id'].tolist(), archived['exercise_name'].tolist(), archived['reps'],
+            archived['weight'], archived['timestamp'] // 1_000_000, name_only
+        ))
+    records = np.concatenate(parts)
+
+    data_path = _paths(user_id)[0]
+    with _locked(user_id):
+        with open(data_path + '.tmp', 'wb') as f:
+            f.write(records.tobytes())
+        os.replace(data_path + '.tmp', data_path)
+        meta = {'count': len(records), 'names': name_only, 'fingerprint': _encode_fingerprint(fingerprint)}
+        _write_meta(user_id, meta)
+    return meta
+
+
+def append_session(session):
+    """Append a just-finished session's sets to the user's snapshot, if it has one"""
+    user_id = session.user_id
+    with _locked(user_id):
+        meta = _read_meta(user_id)
+        if meta is None:
+            return  # built on first read
+        before = completed_fingerprint(user_id, exclude_session_id=session.id)
+        if meta['fingerprint'] != _encode_fingerprint(before):
+            # Something else changed completed history since the snapshot was written
+            os.remove(_paths(user_id)[1])
+            return
+
+        rows = db.session.query(
+            WorkoutSet.exercise_id, WorkoutSet.exercise_name, WorkoutSet.reps, WorkoutSet.weight, WorkoutSet.timestamp
+        ).filter(WorkoutSet.session_id == session.id).order_by(WorkoutSet.timestamp).all()
+        if rows:
+            exercise_ids, names, reps, weights, timestamps = zip(*rows)
+            records = _to_records(exercise_ids, names, reps, weights, _epoch_seconds(timestamps), meta['names'])
+            with open(_paths(user_id)[0], 'ab') as f:
+                f.write(records.tobytes())
+            meta['count'] += len(records)
+
+        # The sidecar is replaced after the data is written, so readers never map a partial record
+        meta['fingerprint'] = _encode_fingerprint(completed_fingerprint(user_id))
+        _write_meta(user_id, meta)
+
+
+def load_snapshot(user_id, fingerprint):
+    """The user's set records as a read-only memmap plus the sidecar meta, rebuilding if stale"""
+    meta = _read_meta(user_id)
+    if meta is None or meta['fingerprint'] != _encode_fingerprint(fingerprint):
+        meta = rebuild_snapshot(user_id)
+
+    if not meta['count']:
+        return np.empty(0, dtype=SET_DTYPE), meta
+    return np.memmap(_paths(user_id)[0], dtype=SET_DTYPE, mode='r', shape=(meta['count'],)), meta
+
+
+def exercise_catalog(exercise_ids):
+    """exercise id -> (name, muscle_group) for the ids present in a snapshot"""
+    ids = [int(i) for i in exercise_ids if i >= 0]
+    if not ids:
+        return {}
+    return {
+        exercise_id: (name, muscle_group)
+        for exercise_id, name, muscle_group in db.session.query(Exercise.id, Exercise.name, Exercise.muscle_group)
+        .filter(Exercise.id.in_(ids))
+    }
@@ -0,0 +1,138 @@
+"""Per-user exercise suggestions for today's split day.
+
+Each user's recent history is folded into the exercise_suggestions table
+once per finished workout (and import), so serving suggestions is a single
+indexed read plus the catalog entries for muscles the user hasn't trained
+yet. Reads never build the index; rebuild_suggestions.py backfills users
+who trained before it existed.
+"""
+from datetime import datetime, timedelta
+
+from models import db, Exercise, ExerciseSuggestion, WorkoutSession, WorkoutSet
+from utils.muscles import MUSCLE_BITS, MUSCLE_POSITIONS, trains
+
+# History older than this doesn't influence suggestions
+SUGGESTION_WINDOW_DAYS = 180
+# A session this many days old counts half as much as one done today
+SUGGESTION_HALF_LIFE_DAYS = 21
+SUGGESTION_LIMIT = 12
+
+
+def refresh_suggestions(user_id):
+    """Rebuild the user's suggestion index from their completed sets"""
+    now = datetime.utcnow()
+    rows = (
+        db.session.query(
+            WorkoutSet.exercise_id, WorkoutSet.exercise_name, WorkoutSet.session_id,
+            WorkoutSet.timestamp, WorkoutSet.reps, WorkoutSet.weight
+        )
+        .join(WorkoutSession, WorkoutSession.id == WorkoutSet.session_id)
+        .filter(WorkoutSession.user_id == user_id)
+        .filter(WorkoutSession.completed == True)
+        .filter(WorkoutSet.timestamp >= now - timedelta(days=SUGGESTION_WINDOW_DAYS))
+        .order_by(WorkoutSet.timestamp)
+    )
+
+    entries = {}
+    for exercise_id, name, session_id, timestamp, reps, weight in rows.yield_per(5000):
+        entry = entries.setdefault(name, {
+            'exercise_id': exercise_id, 'score': 0.0, 'times_performed': 0, 'session_id': None
+        })
+        if entry['session_id'] != session_id:
+            age_days = (now - timestamp).total_seconds() / 86400
+            entry['score'] += 0.5 ** (age_days / SUGGESTION_HALF_LIFE_DAYS)
+            entry['times_performed'] += 1
+            entry.update(session_id=session_id, last_weight=weight, last_reps=reps, last_performed_at=timestamp)
+        elif (weight, reps) > (entry['last_weight'], entry['last_reps']):
+            # Keep the top set of the most recent session
+            entry.update(last_weight=weight, last_reps=reps)
+        entry['exercise_id'] = entry['exercise_id'] or exercise_id
+
+    exercise_ids = {e['exercise_id'] for e in entries.values() if e['exercise_id']}
+    muscles = {
+        ex_id: (muscle_group, specific_muscle)
+        for ex_id, muscle_group, specific_muscle in db.session.query(
+            Exercise.id, Exercise.muscle_group, Exercise.specific_muscle
+        ).filter(Exercise.id.in_(exercise_ids))
+    } if exercise_ids else {}
+
+    ExerciseSuggestion.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    if entries:
+        db.session.execute(db.insert(ExerciseSuggestion), [
+            {
+                'user_id': user_id,
+                'exercise_id': e['exercise_id'],
+                'exercise_name': name,
+                'muscle_group': muscles.get(e['exercise_id'], (None, None))[0],
+                'specific_muscle': muscles.get(e['exercise_id'], (None, None))[1],
+                'muscle_mask': MUSCLE_BITS.get(muscles.get(e['exercise_id']), 0),
+                'score': round(e['score'], 4),
+                'times_performed': e['times_performed'],
+                'last_weight': e['last_weight'],
+                'last_reps': e['last_reps'],
+                'last_performed_at': e['last_performed_at'],
+                'updated_at': now,
+            }
+            for name, e in entries.items()
+        ])
+
+
+def suggestions_for_day(user_id, split_day, limit=SUGGESTION_LIMIT):
+    """Ranked exercises for the muscles `split_day` trains.
+
+    Exercises from the user's own history come first, ordered by how often
+    and how recently they were done. The rest of the list is filled from
+    the catalog, starting with muscles the history doesn't cover yet.
+    """
+    mask = split_day.muscle_mask
+    if not mask:
+        return []
+
+    history = ExerciseSuggestion.query.filter(
+        ExerciseSuggestion.user_id == user_id,
+        trains(ExerciseSuggestion.muscle_mask, mask)
+    ).order_by(ExerciseSuggestion.score.desc()).limit(limit).all()
+
+    suggestions = [{
+        'id': s.exercise_id,
+        'name': s.exercise_name,
+        'muscle_group': s.muscle_group,
+        'specific_muscle': s.specific_muscle,
+        'last_weight': s.last_weight,
+        'last_reps': s.last_reps,
+        'last_performed_at': s.last_performed_at.isoformat() if s.last_performed_at else None,
+        'times_performed': s.times_performed,
+        'source': 'history'
+    } for s in history]
+
+    if len(suggestions) < limit:
+        positions = {pair: MUSCLE_POSITIONS[pair] for pair, bit in MUSCLE_BITS.items() if mask & bit}
+        covered = {s.muscle_mask for s in history}
+        seen = {s.exercise_name.lower() for s in history}
+        catalog = Exercise.query.filter(
+            Exercise.specific_muscle.in_({specific for _, specific in positions}),
+            db.or_(Exercise.is_default == True, Exercise.created_by == user_id)
+        ).all()
+        catalog = [
+            ex for ex in catalog
+            if (ex.muscle_group, ex.specific_muscle) in positions and ex.name.lower() not in seen
+        ]
+        catalog.sort(key=lambda ex: (
+            MUSCLE_BITS[(ex.muscle_group, ex.specific_muscle)] in covered,
+            positions[(ex.muscle_group, ex.specific_muscle)],
+            ex.is_default,
+            ex.name
+        ))
+        for ex in catalog[:limit - len(suggestions)]:
+            suggestions.append({
+                'id': ex.id,
+                'name': ex.name,
+                'muscle_group': ex.muscle_group,
+                'specific_muscle': ex.specific_muscle,
+                'last_weight': None,
+                'last_reps': None,
+                'last_performed_at': None,
+                'times_performed': 0,
+                'source': 'catalog'
+            })
+    return suggestions
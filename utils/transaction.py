@@ -0,0 +1,87 @@
+"""One transaction per request for route handlers.
+
+Handlers decorated with `unit_of_work` never commit themselves: they add,
+change and flush (when they need generated ids) and the decorator commits
+exactly once after a successful response, or rolls back on an error
+response or exception. `read_only` handlers never commit at all, and
+with `replica=True` they read from the replica when one is configured
+(see utils/replica.py). Streamed responses outlive their handler, so their
+generators open the same transaction with `read_only_transaction` instead.
+"""
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from models import db
+from utils.cache import invalidate_user
+from utils.replica import note_write, replica_available, replica_is_fresh_for
+
+logger = logging.getLogger(__name__)
+
+
+def _current_user_id():
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # Handler isn't behind jwt_required (signup, login)
+        return None
+    return int(identity) if identity else None
+
+
+def unit_of_work(view):
+    """Commit once after `view` returns a non-error response, otherwise roll back"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code < 400:
+                db.session.commit()
+                # GETs only write derived data (e.g. the suggestion index), which doesn't need to stay on the primary
+                user_id = _current_user_id()
+                if user_id is not None and request.method != 'GET':
+                    note_write(user_id)
+                    invalidate_user(user_id)
+            else:
+                db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+        return response
+    return wrapper
+
+
+@contextmanager
+def read_only_transaction(replica=False, name=None):
+    """Read-only transaction around the block, rolled back when it exits (see `read_only`)"""
+    g.read_only = True
+    if replica and replica_available():
+        user_id = _current_user_id()
+        g.read_replica = user_id is None or replica_is_fresh_for(user_id)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Sent as BEGIN READ ONLY, so it costs no extra round trip
+        db.session.connection(execution_options={'postgresql_readonly': True})
+    try:
+        yield
+        if db.session.new or db.session.dirty or db.session.deleted:
+            logger.warning('Read-only handler %s left unsaved changes; discarding them', name)
+    finally:
+        db.session.rollback()
+
+
+def read_only(view=None, *, replica=False):
+    """Run the view in a read-only transaction that is rolled back when it returns.
+
+    With `replica=True` the view reads from the replica, unless there is none
+    or the user wrote too recently for the replica to be trusted.
+    """
+    if view is None:
+        return lambda view: read_only(view, replica=replica)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with read_only_transaction(replica, view.__name__):
+            return view(*args, **kwargs)
+    return wrapper
@@ -1,4 +1,5 @@
-from models import db, UserSplitAssignment, WorkoutSession
+from models import db, UserSplitAssignment
+from utils.context import user_context
 from datetime import date
 
 
@@ -6,40 +7,59 @@ class WorkoutManager:
     @staticmethod
     def get_current_day(user_id):
         """Get the current day for a user's split"""
-        assignment = UserSplitAssignment.query.filter_by(user_id=user_id).first()
-        if not assignment:
-            return None
+        return user_context(user_id).current_day
+    
+    @staticmethod
+    def advance_position(assignment, end_session=False):
+        """Move the assignment to the next day of its split in a single UPDATE.
         
+        The new position is computed by the database, so concurrent callers
+        each advance exactly once instead of overwriting each other. With
+        `end_session` the active session pointer is cleared in the same
+        statement. Returns the new position, or None if the split has no
+        days or the assignment was switched to another split in the meantime.
+        """
         split = assignment.split
-        if not split.days:
+        if not split.day_count:
             return None
         
-        for day in split.days:
-            if day.position == assignment.current_position:
-                return day
+        values = {
+            'current_position': (UserSplitAssignment.current_position + 1) % split.day_count,
+            'last_completed_at': date.today(),
+            'version': UserSplitAssignment.version + 1
+        }
+        if end_session:
+            values['active_session_id'] = None
         
-        return split.days[0]
+        row = db.session.execute(
+            db.update(UserSplitAssignment)
+            .where(
+                UserSplitAssignment.id == assignment.id,
+                UserSplitAssignment.split_id == split.id
+            )
+            .values(**values)
+            .returning(UserSplitAssignment.current_position)
+            .execution_options(synchronize_session=False)
+        ).first()
+        
+        # The loaded row is now behind the database
+        db.session.expire(assignment, list(values))
+        return row.current_position if row else None
     
     @staticmethod
     def move_to_next_day(user_id):
         """Move user to the next day in their split"""
-        assignment = UserSplitAssignment.query.filter_by(user_id=user_id).first()
+        ctx = user_context(user_id)
+        assignment = ctx.assignment
         if not assignment:
             return None
         
-        split = assignment.split
-        total_days = len(split.days)
-        
-        assignment.current_position = (assignment.current_position + 1) % total_days
-        assignment.last_completed_at = date.today()
+        WorkoutManager.advance_position(assignment)
         db.session.commit()
         
-        return WorkoutManager.get_current_day(user_id)
+        return ctx.current_day
     
     @staticmethod
     def get_active_session(user_id):
         """Get active workout session for user"""
-        return WorkoutSession.query.filter_by(
-            user_id=user_id,
-            completed=False
-        ).first()
+        return user_context(user_id).active_session
@@ -0,0 +1,25 @@
+"""
+Background job worker
+Drains the jobs table outside the web processes: python worker.py [--once]
+"""
+import argparse
+import logging
+
+from app import create_app
+from utils.jobs import job_runner
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run background jobs')
+    parser.add_argument('--once', action='store_true', help='run due jobs and exit')
+    parser.add_argument('--workers', type=int, help='number of worker threads')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        print(f"✅ Ran {job_runner.run_pending()} jobs")
+    else:
+        print("👷 Worker started, waiting for jobs...")
+        job_runner.run_forever(args.workers)